@@ -1,16 +1,29 @@
 from __future__ import annotations
 
+import csv
+import io
+import json
+import secrets
+import zlib
 from datetime import datetime
 from pathlib import Path
 from typing import List
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Body, Query, status
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile, Body, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from pydantic import ValidationError
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from . import schemas
+from .catalog_cache import CatalogCache, catalog_versions
+from .columnar import columnar_media_type, columnar_response, model_columns
+from .audit import log_action
+from .auth_cache import token_cache, user_cache
 from .config import get_settings
-from .db import Base, engine, get_db
+from .db import SessionLocal, get_async_db, get_db
 from .models import (
     Acquisition,
     AcquisitionChannel,
@@ -19,32 +32,40 @@ from .models import (
     Bridge,
     Cable,
     CableStateVersion,
+    ChannelMappingTemplate,
     KCalibration,
     RawFile,
     Sensor,
     SensorInstallation,
+    StorageScrubFinding,
+    StorageScrubRun,
     StrandType,
     WeighingAttachment,
     WeighingCampaign,
     WeighingMeasurement,
     CableConfigSnapshot,
     User,
-    AuditLog,
 )
-from .security import hash_password, verify_password, create_access_token, decode_token
+from .profiling import ProfileStore, ProfilingRoute
+from .startup import lazy_import
+from .security import hash_password, verify_password, create_access_token
+from .services import business
 from .services.business import (
+    ALERT_PCT_FU,
     effective_fu,
     select_cable_state_version,
     select_k_for_timestamp,
     validate_installations_no_overlap,
     validate_k_no_overlap,
 )
-from .services.ingestion import normalize_from_raw, register_raw_file
+from .services.catalog_import import CatalogImportError, import_catalog, parse_csv_bundle
+from .storage import compression_for, write_stored
 from .utils import save_upload
 
-router = APIRouter()
-Base.metadata.create_all(bind=engine)
+router = APIRouter(route_class=ProfilingRoute)
 settings = get_settings()
+catalog_cache = CatalogCache(catalog_versions())
+profile_store = ProfileStore(Path(settings.data_root) / "profiles", keep=settings.profile_keep)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
@@ -60,18 +81,25 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = decode_token(token)
+        payload = token_cache.decode(token)
         user_id: int = int(payload.get("sub"))
         if user_id is None:
             raise credentials_exception
     except Exception:
         raise credentials_exception
-    user = db.get(User, user_id)
+    user = user_cache.get(user_id, lambda uid: db.get(User, uid))
     if not user:
         raise credentials_exception
     return user
 
 
+def require_ops_access(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> None:
+    """Operational endpoints (/metrics, /pool-stats, /startup): OPS_TOKEN as bearer, or an admin token."""
+    if settings.ops_token and secrets.compare_digest(token.encode(), settings.ops_token.encode()):
+        return
+    ensure_admin(get_current_user(token, db))
+
+
 def require_roles(*roles):
     def checker(user: User = Depends(get_current_user)) -> User:
         if user.role not in roles:
@@ -81,12 +109,6 @@ def require_roles(*roles):
     return checker
 
 
-def log_action(db: Session, entity: str, entity_id: int, action: str, user_id: int, notes: str | None = None):
-    log = AuditLog(entity=entity, entity_id=entity_id, action=action, performed_by=user_id, notes=notes)
-    db.add(log)
-    db.commit()
-
-
 def get_user(db: Session, username: str) -> User | None:
     return db.query(User).filter(User.username == username).first()
 
@@ -111,12 +133,25 @@ def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), curr
         password_hash=hash_password(payload.password),
     )
     db.add(user)
+    db.flush()
+    log_action(db, "user", user.id, "create", current_user.id)
     db.commit()
     db.refresh(user)
-    log_action(db, "user", user.id, "create", current_user.id)
     return user
 
 
+def _create_placeholder_cables(db: Session, bridge_id: int, first: int, last: int, user_id: int, notes: str) -> None:
+    """Inserts cables T-<first>..T-<last> with one multi-row INSERT (no per-row ORM flush) and audits them."""
+    width = max(2, len(str(last)))
+    rows = [
+        {"bridge_id": bridge_id, "nombre_en_puente": f"T-{idx:0{width}d}", "created_by_user_id": user_id}
+        for idx in range(first, last + 1)
+    ]
+    # Sin sort_by_parameter_order: los ids solo se auditan y así SQLite también usa una única sentencia
+    for (cable_id,) in db.execute(insert(Cable).returning(Cable.id), rows):
+        log_action(db, "cable", cable_id, "create_placeholder", user_id, notes=notes)
+
+
 @router.post("/bridges", response_model=schemas.BridgeOut)
 def create_bridge(payload: schemas.BridgeCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     bridge = Bridge(
@@ -127,26 +162,23 @@ def create_bridge(payload: schemas.BridgeCreate, db: Session = Depends(get_db),
         created_by_user_id=user.id,
     )
     db.add(bridge)
-    db.commit()
-    db.refresh(bridge)
+    db.flush()
     log_action(db, "bridge", bridge.id, "create", user.id)
 
     # Crear tirantes placeholder si se solicitó
     if payload.num_tirantes and payload.num_tirantes > 0:
-        width = max(2, len(str(payload.num_tirantes)))
-        for idx in range(1, payload.num_tirantes + 1):
-            name = f"T-{idx:0{width}d}"
-            cable = Cable(bridge_id=bridge.id, nombre_en_puente=name, created_by_user_id=user.id)
-            db.add(cable)
-            db.flush()
-            log_action(db, "cable", cable.id, "create_placeholder", user.id, notes="auto-generated")
-        db.commit()
+        _create_placeholder_cables(db, bridge.id, 1, payload.num_tirantes, user.id, "auto-generated")
+    db.commit()
+    db.refresh(bridge)
+    catalog_cache.invalidate("bridges", "cables")
     return bridge
 
 
 @router.get("/bridges", response_model=List[schemas.BridgeOut])
-def list_bridges(db: Session = Depends(get_db)):
-    return db.query(Bridge).order_by(Bridge.nombre).all()
+def list_bridges(request: Request, db: Session = Depends(get_db)):
+    return catalog_cache.respond(
+        "bridges", request, lambda: db.query(Bridge).order_by(Bridge.nombre).all(), schemas.BridgeOut
+    )
 
 
 @router.put("/bridges/{bridge_id}", response_model=schemas.BridgeOut)
@@ -178,18 +210,14 @@ def update_bridge(
                 detail="No se puede reducir num_tirantes. Elimina tirantes en el paso 2 antes de disminuir la cantidad.",
             )
         if target > current_count:
-            width = max(2, len(str(target)))
-            for idx in range(current_count + 1, target + 1):
-                name = f"T-{idx:0{width}d}"
-                cable = Cable(bridge_id=bridge.id, nombre_en_puente=name, created_by_user_id=user.id)
-                db.add(cable)
-                db.flush()
-                log_action(db, "cable", cable.id, "create_placeholder", user.id, notes="auto-generated by update")
+            _create_placeholder_cables(db, bridge.id, current_count + 1, target, user.id, "auto-generated by update")
 
     db.add(bridge)
+    db.flush()
+    log_action(db, "bridge", bridge.id, "update", user.id)
     db.commit()
     db.refresh(bridge)
-    log_action(db, "bridge", bridge.id, "update", user.id)
+    catalog_cache.invalidate("bridges", "cables")
     return bridge
 
 
@@ -206,8 +234,9 @@ def delete_bridge(
     if cables:
         raise HTTPException(status_code=400, detail="Elimina tirantes del puente antes de borrarlo.")
     db.delete(bridge)
-    db.commit()
     log_action(db, "bridge", bridge_id, "delete", user.id)
+    db.commit()
+    catalog_cache.invalidate("bridges")
     return {"status": "deleted", "id": bridge_id}
 
 
@@ -221,23 +250,28 @@ def delete_strand_type(
     if not st:
         raise HTTPException(status_code=404, detail="Strand type not found")
     db.delete(st)
-    db.commit()
     log_action(db, "strand_type", strand_type_id, "delete", user.id)
+    db.commit()
+    catalog_cache.invalidate("strand_types")
     return {"status": "deleted", "id": strand_type_id}
 
 @router.post("/strand-types", response_model=schemas.StrandTypeOut)
 def create_strand_type(payload: schemas.StrandTypeCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     st = StrandType(**payload.dict(), created_by_user_id=user.id)
     db.add(st)
+    db.flush()
+    log_action(db, "strand_type", st.id, "create", user.id)
     db.commit()
     db.refresh(st)
-    log_action(db, "strand_type", st.id, "create", user.id)
+    catalog_cache.invalidate("strand_types")
     return st
 
 
 @router.get("/strand-types", response_model=List[schemas.StrandTypeOut])
-def list_strand_types(db: Session = Depends(get_db)):
-    return db.query(StrandType).order_by(StrandType.nombre).all()
+def list_strand_types(request: Request, db: Session = Depends(get_db)):
+    return catalog_cache.respond(
+        "strand_types", request, lambda: db.query(StrandType).order_by(StrandType.nombre).all(), schemas.StrandTypeOut
+    )
 
 @router.put("/strand-types/{strand_type_id}", response_model=schemas.StrandTypeOut)
 def update_strand_type(
@@ -252,9 +286,11 @@ def update_strand_type(
     for field, value in payload.dict(exclude_unset=True).items():
         setattr(st, field, value)
     db.add(st)
+    db.flush()
+    log_action(db, "strand_type", st.id, "update", user.id)
     db.commit()
     db.refresh(st)
-    log_action(db, "strand_type", st.id, "update", user.id)
+    catalog_cache.invalidate("strand_types")
     return st
 
 
@@ -262,15 +298,27 @@ def update_strand_type(
 def create_cable(payload: schemas.CableCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     cable = Cable(**payload.dict(), created_by_user_id=user.id)
     db.add(cable)
+    db.flush()
+    log_action(db, "cable", cable.id, "create", user.id)
     db.commit()
     db.refresh(cable)
-    log_action(db, "cable", cable.id, "create", user.id)
+    catalog_cache.invalidate("cables")
     return cable
 
 
 @router.get("/cables", response_model=List[schemas.CableOut])
-def list_cables(db: Session = Depends(get_db)):
-    return db.query(Cable).order_by(Cable.bridge_id, Cable.nombre_en_puente).all()
+def list_cables(
+    request: Request, db: Session = Depends(get_db), columnar: str | None = Depends(columnar_media_type)
+):
+    if columnar:
+        rows = db.query(*model_columns(Cable, schemas.CableOut)).order_by(Cable.bridge_id, Cable.nombre_en_puente)
+        return columnar_response(columnar, list(schemas.CableOut.__fields__), rows)
+    return catalog_cache.respond(
+        "cables",
+        request,
+        lambda: db.query(Cable).order_by(Cable.bridge_id, Cable.nombre_en_puente).all(),
+        schemas.CableOut,
+    )
 
 
 @router.put("/cables/{cable_id}", response_model=schemas.CableOut)
@@ -288,9 +336,11 @@ def update_cable(
     if payload.notas is not None:
         cable.notas = payload.notas
     db.add(cable)
+    db.flush()
+    log_action(db, "cable", cable.id, "update", user.id)
     db.commit()
     db.refresh(cable)
-    log_action(db, "cable", cable.id, "update", user.id)
+    catalog_cache.invalidate("cables")
     return cable
 
 
@@ -300,8 +350,9 @@ def delete_cable(cable_id: int, db: Session = Depends(get_db), user: User = Depe
     if not cable:
         raise HTTPException(status_code=404, detail="Cable not found")
     db.delete(cable)
-    db.commit()
     log_action(db, "cable", cable_id, "delete", user.id)
+    db.commit()
+    catalog_cache.invalidate("cables")
     return {"status": "deleted", "id": cable_id}
 
 
@@ -324,9 +375,10 @@ def create_cable_state(payload: schemas.CableStateVersionCreate, db: Session = D
 
     state = CableStateVersion(**payload.dict(), created_by_user_id=user.id)
     db.add(state)
+    db.flush()
+    log_action(db, "cable_state_version", state.id, "create", user.id)
     db.commit()
     db.refresh(state)
-    log_action(db, "cable_state_version", state.id, "create", user.id)
     return state
 
 
@@ -344,15 +396,19 @@ def list_cable_states(cable_id: int, db: Session = Depends(get_db)):
 def create_sensor(payload: schemas.SensorCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     sensor = Sensor(**payload.dict(), created_by_user_id=user.id)
     db.add(sensor)
+    db.flush()
+    log_action(db, "sensor", sensor.id, "create", user.id)
     db.commit()
     db.refresh(sensor)
-    log_action(db, "sensor", sensor.id, "create", user.id)
+    catalog_cache.invalidate("sensors")
     return sensor
 
 
 @router.get("/sensors", response_model=List[schemas.SensorOut])
-def list_sensors(db: Session = Depends(get_db)):
-    return db.query(Sensor).order_by(Sensor.serial_or_asset_id).all()
+def list_sensors(request: Request, db: Session = Depends(get_db)):
+    return catalog_cache.respond(
+        "sensors", request, lambda: db.query(Sensor).order_by(Sensor.serial_or_asset_id).all(), schemas.SensorOut
+    )
 
 
 @router.post("/sensor-installations", response_model=schemas.SensorInstallationOut)
@@ -367,28 +423,69 @@ def create_sensor_installation(payload: schemas.SensorInstallationCreate, db: Se
 
     inst = SensorInstallation(**payload.dict(), created_by_user_id=user.id)
     db.add(inst)
+    db.flush()
+    log_action(db, "sensor_installation", inst.id, "create", user.id)
     db.commit()
     db.refresh(inst)
-    log_action(db, "sensor_installation", inst.id, "create", user.id)
+    catalog_cache.invalidate("sensor_installations")
     return inst
 
 
 @router.get("/sensor-installations", response_model=List[schemas.SensorInstallationOut])
-def list_sensor_installations(db: Session = Depends(get_db)):
-    return (
-        db.query(SensorInstallation)
+def list_sensor_installations(request: Request, db: Session = Depends(get_db)):
+    return catalog_cache.respond(
+        "sensor_installations",
+        request,
+        lambda: db.query(SensorInstallation)
         .order_by(SensorInstallation.sensor_id, SensorInstallation.installed_from.desc())
-        .all()
+        .all(),
+        schemas.SensorInstallationOut,
     )
 
 
+def _run_catalog_import(db: Session, payload: schemas.CatalogImport, user: User) -> schemas.CatalogImportResult:
+    try:
+        result = import_catalog(db, payload, user.id)
+    except CatalogImportError as exc:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=exc.errors)
+    db.commit()
+    catalog_cache.invalidate("bridges", "cables", "sensors", "sensor_installations")
+    return result
+
+
+@router.post("/catalog/import", response_model=schemas.CatalogImportResult)
+def import_catalog_json(
+    payload: schemas.CatalogImport,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles("admin", "analyst")),
+):
+    return _run_catalog_import(db, payload, user)
+
+
+@router.post("/catalog/import/csv", response_model=schemas.CatalogImportResult)
+def import_catalog_csv(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles("admin", "analyst")),
+):
+    try:
+        payload = parse_csv_bundle(file.file.read())
+    except CatalogImportError as exc:
+        raise HTTPException(status_code=400, detail=exc.errors)
+    except ValidationError as exc:
+        raise HTTPException(status_code=400, detail=exc.errors())
+    return _run_catalog_import(db, payload, user)
+
+
 @router.post("/acquisitions", response_model=schemas.AcquisitionOut)
 def create_acquisition(payload: schemas.AcquisitionCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     acq = Acquisition(**payload.dict(), created_by_user_id=user.id)
     db.add(acq)
+    db.flush()
+    log_action(db, "acquisition", acq.id, "create", user.id)
     db.commit()
     db.refresh(acq)
-    log_action(db, "acquisition", acq.id, "create", user.id)
     return acq
 
 
@@ -396,9 +493,10 @@ def create_acquisition(payload: schemas.AcquisitionCreate, db: Session = Depends
 def create_weighing_campaign(payload: schemas.WeighingCampaignCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     wc = WeighingCampaign(**payload.dict(), created_by_user_id=user.id)
     db.add(wc)
+    db.flush()
+    log_action(db, "weighing_campaign", wc.id, "create", user.id)
     db.commit()
     db.refresh(wc)
-    log_action(db, "weighing_campaign", wc.id, "create", user.id)
     return wc
 
 
@@ -406,9 +504,10 @@ def create_weighing_campaign(payload: schemas.WeighingCampaignCreate, db: Sessio
 def create_analysis_run(payload: schemas.AnalysisRunCreate, db: Session = Depends(get_db), user: User = Depends(require_roles("admin", "analyst"))):
     run = AnalysisRun(**payload.dict(), created_by_user_id=user.id)
     db.add(run)
+    db.flush()
+    log_action(db, "analysis_run", run.id, "create", user.id)
     db.commit()
     db.refresh(run)
-    log_action(db, "analysis_run", run.id, "create", user.id)
     return run
 
 
@@ -446,63 +545,230 @@ def create_analysis_result(payload: schemas.AnalysisResultCreate, db: Session =
 
 
 @router.get("/analysis-runs/{run_id}/results", response_model=List[schemas.AnalysisResultOut])
-def list_analysis_results(run_id: int, db: Session = Depends(get_db)):
-    return (
-        db.query(AnalysisResult)
-        .filter(AnalysisResult.analysis_run_id == run_id)
+async def list_analysis_results(
+    run_id: int, db: AsyncSession = Depends(get_async_db), columnar: str | None = Depends(columnar_media_type)
+):
+    if columnar:
+        stmt = (
+            select(*model_columns(AnalysisResult, schemas.AnalysisResultOut))
+            .where(AnalysisResult.analysis_run_id == run_id)
+            .order_by(AnalysisResult.created_at.desc())
+        )
+        rows = (await db.execute(stmt)).all()
+        return columnar_response(columnar, list(schemas.AnalysisResultOut.__fields__), rows)
+    stmt = (
+        select(AnalysisResult)
+        .where(AnalysisResult.analysis_run_id == run_id)
         .order_by(AnalysisResult.created_at.desc())
-        .all()
     )
+    return (await db.scalars(stmt)).all()
+
+
+HISTORY_COLUMNS = (
+    "cable_id",
+    "nombre_en_puente",
+    "acquired_at",
+    "analysis_run_id",
+    "f0_hz",
+    "tension_tf",
+    "k_used_value",
+    "k_used_calibration_id",
+    "quality_flag",
+    "result_id",
+)
+HISTORY_STREAM_CHUNK = 1000
 
 
-@router.get("/history", response_model=schemas.HistoryResponse)
-def history(
-    bridge_id: int | None = None,
-    cable_id: int | None = None,
-    date_from: datetime | None = None,
-    date_to: datetime | None = None,
-    db: Session = Depends(get_db),
+def _history_statement(
+    bridge_id: int | None,
+    cable_id: int | None,
+    date_from: datetime | None,
+    date_to: datetime | None,
+    after_acquired_at: datetime | None = None,
+    after_id: int | None = None,
+    columns=None,
 ):
-    q = (
-        db.query(
-            AnalysisResult,
-            AnalysisRun,
-            Acquisition,
-            Cable,
+    """Column-only history select ordered by the (acquired_at, result id) keyset; `columns` narrows it."""
+    stmt = (
+        select(
+            *(
+                columns
+                or (
+                    Cable.id.label("cable_id"),
+                    Cable.nombre_en_puente,
+                    Acquisition.acquired_at,
+                    AnalysisRun.id.label("analysis_run_id"),
+                    AnalysisResult.f0_hz,
+                    AnalysisResult.tension_tf,
+                    AnalysisResult.k_used_value,
+                    AnalysisResult.k_used_calibration_id,
+                    AnalysisResult.quality_flag,
+                    AnalysisResult.id.label("result_id"),
+                )
+            )
         )
+        .select_from(AnalysisResult)
         .join(AnalysisRun, AnalysisResult.analysis_run_id == AnalysisRun.id)
         .join(Acquisition, AnalysisRun.acquisition_id == Acquisition.id)
         .join(Cable, Cable.id == AnalysisResult.cable_id)
     )
     if bridge_id:
-        q = q.filter(Cable.bridge_id == bridge_id)
+        stmt = stmt.where(Cable.bridge_id == bridge_id)
     if cable_id:
-        q = q.filter(Cable.id == cable_id)
+        stmt = stmt.where(Cable.id == cable_id)
     if date_from:
-        q = q.filter(Acquisition.acquired_at >= date_from)
+        stmt = stmt.where(Acquisition.acquired_at >= date_from)
     if date_to:
-        q = q.filter(Acquisition.acquired_at <= date_to)
-
-    rows = q.order_by(Acquisition.acquired_at).all()
-    items = [
-        schemas.HistoryItem(
-            cable_id=cable.id,
-            nombre_en_puente=cable.nombre_en_puente,
-            acquired_at=acq.acquired_at,
-            analysis_run_id=run.id,
-            f0_hz=res.f0_hz,
-            tension_tf=res.tension_tf,
-            k_used_value=res.k_used_value,
-            k_used_calibration_id=res.k_used_calibration_id,
-            quality_flag=res.quality_flag,
+        stmt = stmt.where(Acquisition.acquired_at <= date_to)
+    if after_acquired_at is not None:
+        if after_id is None:
+            raise HTTPException(status_code=400, detail="after_id is required with after_acquired_at")
+        stmt = stmt.where(
+            or_(
+                Acquisition.acquired_at > after_acquired_at,
+                and_(Acquisition.acquired_at == after_acquired_at, AnalysisResult.id > after_id),
+            )
+        )
+    return stmt.order_by(Acquisition.acquired_at, AnalysisResult.id)
+
+
+def _stream_history(query_args: dict, limit: int | None, fmt: str):
+    # Sync session on the interactive pool: yield_per keeps a server-side cursor open while streaming
+    with SessionLocal() as stream_db:
+        stmt = _history_statement(**query_args)
+        if limit:
+            stmt = stmt.limit(limit)
+        rows = stream_db.execute(stmt.execution_options(yield_per=HISTORY_STREAM_CHUNK))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(HISTORY_COLUMNS)
+            for idx, row in enumerate(rows, start=1):
+                writer.writerow([v.isoformat() if isinstance(v, datetime) else v for v in row])
+                if idx % HISTORY_STREAM_CHUNK == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for row in rows:
+                item = dict(row._mapping)
+                item["acquired_at"] = row.acquired_at.isoformat()
+                yield json.dumps(item) + "\n"
+
+
+async def _history_reduced(
+    db: AsyncSession, query_args: dict, bucket: str | None, max_points: int | None
+) -> schemas.HistoryResponse:
+    """
+    Bucketed and/or LTTB-downsampled history; the point budget applies per cable on tension_tf.
+    Only the columns the reduction needs are read for the whole range; full rows are then
+    fetched for the kept points only.
+    """
+    np = lazy_import("numpy")
+    history_svc = lazy_import("app.services.history")
+    epoch_seconds = lazy_import("app.services.semaforo").epoch_seconds
+    narrow = (
+        Cable.id.label("cable_id"),
+        Acquisition.acquired_at,
+        AnalysisResult.id.label("result_id"),
+        *(getattr(AnalysisResult, field) for field in history_svc.AGG_FIELDS),
+    )
+    rows = (await db.execute(_history_statement(**query_args, columns=narrow))).tuples().all()
+    columns = list(zip(*rows)) or [()] * len(narrow)
+    cable_ids = np.array(columns[0], dtype="int64")
+    epoch = epoch_seconds(columns[1])
+    result_ids = np.array(columns[2], dtype="int64")
+    values = {
+        field: np.array(columns[3 + i], dtype=float) for i, field in enumerate(history_svc.AGG_FIELDS)
+    }
+    k_list = None
+    if query_args["cable_id"]:
+        k_list = (await db.scalars(_k_calibrations_statement(query_args["cable_id"]))).all()
+
+    if not bucket:
+        kept_ids = result_ids[history_svc.downsample_series(cable_ids, epoch, values["tension_tf"], max_points)]
+        by_id = {}
+        for start in range(0, len(kept_ids), HISTORY_STREAM_CHUNK):
+            chunk = [int(i) for i in kept_ids[start : start + HISTORY_STREAM_CHUNK]]
+            stmt = _history_statement(**query_args).where(AnalysisResult.id.in_(chunk))
+            by_id.update((row.result_id, row) for row in (await db.execute(stmt)).all())
+        items = [schemas.HistoryItem(**by_id[int(i)]._mapping) for i in kept_ids]
+        return schemas.HistoryResponse(results=items, k_calibrations=k_list)
+
+    agg = history_svc.aggregate_buckets(cable_ids, epoch, values, bucket)
+    keep = np.arange(len(agg["cable_id"]))
+    if max_points:
+        keep = history_svc.downsample_series(
+            agg["cable_id"], agg["bucket_start"].astype("int64").astype(float), agg["tension_tf_mean"], max_points
         )
-        for res, run, acq, cable in rows
+    names = dict(
+        (await db.execute(select(Cable.id, Cable.nombre_en_puente).where(Cable.id.in_(np.unique(cable_ids).tolist())))).tuples().all()
+    )
+    buckets = [
+        schemas.HistoryBucket(
+            cable_id=int(agg["cable_id"][i]),
+            nombre_en_puente=names[int(agg["cable_id"][i])],
+            bucket_start=agg["bucket_start"][i].item(),
+            count=int(agg["count"][i]),
+            **{f"{field}_{stat}": float(agg[f"{field}_{stat}"][i]) for field in history_svc.AGG_FIELDS for stat in ("min", "mean", "max")},
+        )
+        for i in keep
     ]
+    return schemas.HistoryResponse(results=[], k_calibrations=k_list, bucket=bucket, buckets=buckets)
+
+
+@router.get("/history", response_model=schemas.HistoryResponse)
+async def history(
+    bridge_id: int | None = None,
+    cable_id: int | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    after_acquired_at: datetime | None = None,
+    after_id: int | None = None,
+    limit: int | None = Query(None, gt=0),
+    format: str = Query("json", regex="^(json|ndjson|csv)$"),
+    bucket: str | None = Query(None, regex="^(day|week|month)$"),
+    max_points: int | None = Query(None, ge=3),
+    db: AsyncSession = Depends(get_async_db),
+    columnar: str | None = Depends(columnar_media_type),
+):
+    query_args = dict(
+        bridge_id=bridge_id,
+        cable_id=cable_id,
+        date_from=date_from,
+        date_to=date_to,
+        after_acquired_at=after_acquired_at,
+        after_id=after_id,
+    )
+    if bucket or max_points:
+        if format != "json" or limit or after_acquired_at is not None:
+            raise HTTPException(status_code=400, detail="bucket/max_points solo aplican a format=json sin paginación")
+        return await _history_reduced(db, query_args, bucket, max_points)
+
+    stmt = _history_statement(**query_args)
+    if format != "json":
+        # Starlette iterates the sync generator in its threadpool, one chunk at a time
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(_stream_history(query_args, limit, format), media_type=media_type)
+
+    rows = (await db.execute(stmt.limit(limit + 1) if limit else stmt)).all()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = schemas.HistoryCursor(after_acquired_at=rows[-1].acquired_at, after_id=rows[-1].result_id)
+    if columnar:
+        headers = {}
+        if next_cursor:
+            headers["X-Next-After-Acquired-At"] = next_cursor.after_acquired_at.isoformat()
+            headers["X-Next-After-Id"] = str(next_cursor.after_id)
+        return columnar_response(columnar, HISTORY_COLUMNS, rows, headers=headers)
+    items = [schemas.HistoryItem(**row._mapping) for row in rows]
 
     k_list = None
     if cable_id:
-        k_list = list_k_calibrations(cable_id=cable_id, db=db)
-    return schemas.HistoryResponse(results=items, k_calibrations=k_list)
+        k_list = (await db.scalars(_k_calibrations_statement(cable_id))).all()
+    return schemas.HistoryResponse(results=items, k_calibrations=k_list, next_cursor=next_cursor)
 
 
 @router.post("/acquisitions/{acq_id}/file")
@@ -517,15 +783,21 @@ def upload_acquisition_file(
     if not acq:
         raise HTTPException(status_code=404, detail="Acquisition not found")
 
-    data = file.file.read()
-    path, digest = save_upload(Path(settings.data_root), "raw" if file_kind == "raw_csv" else "normalized", file.filename, data)
+    # Se copia del archivo subido al destino por bloques, comprimiendo al vuelo
+    path, digest, size = write_stored(
+        Path(settings.data_root),
+        "raw" if file_kind == "raw_csv" else "normalized",
+        file.filename,
+        file.file,
+        compression_for(file_kind),
+    )
     record = RawFile(
         acquisition_id=acq_id,
         file_kind=file_kind,
         storage_path=str(path),
         original_filename=file.filename,
         sha256=digest,
-        file_size_bytes=len(data),
+        file_size_bytes=size,
         parser_version=parser_version,
     )
     db.add(record)
@@ -546,9 +818,12 @@ def upload_raw_csv(
     if not acq:
         raise HTTPException(status_code=404, detail="Acquisition not found")
     data = file.file.read()
-    record = register_raw_file(db, acq, parser_version, file.filename, Path(settings.data_root), data)
+    ingestion = lazy_import("app.services.ingestion")
+    record = ingestion.register_raw_file(db, acq, parser_version, file.filename, Path(settings.data_root), data)
     log_action(db, "raw_file", record.id, "create", user.id, notes="raw_csv")
-    return {"id": record.id, "sha256": record.sha256, "path": record.storage_path}
+    response = {"id": record.id, "sha256": record.sha256, "path": record.storage_path}
+    db.commit()
+    return response
 
 
 @router.post("/acquisitions/{acq_id}/normalize")
@@ -562,7 +837,8 @@ def normalize_acquisition(
     acq = db.get(Acquisition, acq_id)
     if not acq:
         raise HTTPException(status_code=404, detail="Acquisition not found")
-    norm_record, channels, path = normalize_from_raw(
+    ingestion = lazy_import("app.services.ingestion")
+    norm_record, channels, path = ingestion.normalize_from_raw(
         db=db,
         acq=acq,
         mapping=mapping,
@@ -570,11 +846,225 @@ def normalize_acquisition(
         parser_version=parser_version,
     )
     log_action(db, "raw_file", norm_record.id, "create", user.id, notes="normalized_csv")
-    return {
+    response = {
         "normalized_file_id": norm_record.id,
         "path": path,
         "channels_created": len(channels),
     }
+    db.commit()
+    return response
+
+
+def _mapping_template_out(template: ChannelMappingTemplate) -> schemas.MappingTemplateOut:
+    return schemas.MappingTemplateOut(
+        id=template.id,
+        bridge_id=template.bridge_id,
+        nombre=template.nombre,
+        mapping=template.mapping_json,
+        notes=template.notes,
+        created_at=template.created_at,
+    )
+
+
+@router.get("/acquisitions/{acq_id}/signal", response_model=schemas.SignalWindowOut)
+def acquisition_signal(
+    acq_id: int,
+    cable_id: int,
+    t_start: float | None = None,
+    t_end: float | None = None,
+    points: int = Query(2000, ge=10, le=20000),
+    method: str = Query("minmax", regex="^(minmax|lttb)$"),
+    db: Session = Depends(get_db),
+):
+    """Señal de un tirante en [t_start, t_end] s del último CSV normalizado, reducida a `points` en el servidor."""
+    acq = db.get(Acquisition, acq_id)
+    if not acq:
+        raise HTTPException(status_code=404, detail="Acquisition not found")
+    column = db.execute(
+        select(Cable.nombre_en_puente)
+        .join(AcquisitionChannel, AcquisitionChannel.cable_id == Cable.id)
+        .where(AcquisitionChannel.acquisition_id == acq_id, Cable.id == cable_id)
+    ).scalar()
+    if column is None:
+        raise HTTPException(status_code=404, detail="Cable not mapped in this acquisition")
+    record = db.scalars(
+        select(RawFile)
+        .where(RawFile.acquisition_id == acq_id, RawFile.file_kind == "normalized_csv")
+        .order_by(RawFile.created_at.desc())
+        .limit(1)
+    ).first()
+    if record is None:
+        raise HTTPException(status_code=404, detail="No hay CSV normalizado para esta adquisición")
+    np = lazy_import("numpy")
+    signals = lazy_import("app.services.signals")
+    pyramid = lazy_import("app.services.pyramid").load_pyramid(record.storage_path)
+    summary = pyramid.window(column, t_start, t_end, max(1, points // 2)) if pyramid else None
+    if summary is not None:
+        # Ventana amplia: se sirve del nivel de la pirámide que cabe en `points`, sin tocar el CSV
+        if method == "minmax":
+            t, y = np.repeat(summary.t, 2), np.column_stack([summary.min, summary.max]).ravel()
+        else:
+            t, y = summary.t, summary.mean
+        if t_start is not None:
+            t = np.maximum(t, t_start)  # el primer bucket puede empezar antes de la ventana
+        rows_read, rows_in_window, rows_per_point = len(summary.t), summary.rows_in_window, summary.bucket
+    else:
+        window = signals.read_window(record.storage_path, column, t_start, t_end, acq.Fs_Hz)
+        t, y = window.t, window.y
+        rows_read, rows_in_window, rows_per_point = window.rows_read, len(window.t), 1
+    keep = signals.downsample(t, y, points, method)
+    return schemas.SignalWindowOut(
+        acquisition_id=acq_id,
+        cable_id=cable_id,
+        column=column,
+        normalized_file_id=record.id,
+        fs_hz=acq.Fs_Hz,
+        method=method,
+        t_start=t_start,
+        t_end=t_end,
+        rows_read=rows_read,
+        points_in_window=rows_in_window,
+        rows_per_point=rows_per_point,
+        t=t[keep].tolist(),
+        y=[None if v != v else v for v in y[keep].tolist()],
+    )
+
+
+@router.post("/bridges/{bridge_id}/mapping-templates", response_model=schemas.MappingTemplateOut)
+def create_mapping_template(
+    bridge_id: int,
+    payload: schemas.MappingTemplateCreate,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles("admin", "analyst")),
+):
+    if not db.get(Bridge, bridge_id):
+        raise HTTPException(status_code=404, detail="Bridge not found")
+    exists = db.execute(
+        select(ChannelMappingTemplate.id).where(
+            ChannelMappingTemplate.bridge_id == bridge_id, ChannelMappingTemplate.nombre == payload.nombre
+        )
+    ).scalar()
+    if exists:
+        raise HTTPException(status_code=400, detail="Template name already exists for this bridge")
+    mapping = [item.dict() for item in payload.mapping]
+    columns = [item["csv_column_name"] for item in mapping]
+    if len(set(columns)) != len(columns):
+        raise HTTPException(status_code=400, detail="csv_column_name repetido en la plantilla")
+    ingestion = lazy_import("app.services.ingestion")
+    plan = ingestion.plan_mapping(db, mapping)
+    foreign = sorted(c.nombre_en_puente for c in plan.cables.values() if c.bridge_id != bridge_id)
+    if foreign:
+        raise HTTPException(status_code=400, detail=f"Tirantes de otro puente: {', '.join(foreign)}")
+    sensor_ids = {item["sensor_id"] for item in mapping}
+    missing = sensor_ids - set(db.execute(select(Sensor.id).where(Sensor.id.in_(sensor_ids))).scalars())
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Sensores inexistentes: {sorted(missing)}")
+    template = ChannelMappingTemplate(
+        bridge_id=bridge_id, nombre=payload.nombre, mapping_json=mapping, notes=payload.notes, created_by_user_id=user.id
+    )
+    db.add(template)
+    db.flush()
+    log_action(db, "channel_mapping_template", template.id, "create", user.id)
+    db.commit()
+    return _mapping_template_out(template)
+
+
+@router.get("/bridges/{bridge_id}/mapping-templates", response_model=List[schemas.MappingTemplateOut])
+def list_mapping_templates(bridge_id: int, db: Session = Depends(get_db)):
+    templates = db.scalars(
+        select(ChannelMappingTemplate)
+        .where(ChannelMappingTemplate.bridge_id == bridge_id)
+        .order_by(ChannelMappingTemplate.nombre)
+    ).all()
+    return [_mapping_template_out(t) for t in templates]
+
+
+@router.delete("/bridges/{bridge_id}/mapping-templates/{template_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_mapping_template(
+    bridge_id: int,
+    template_id: int,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles("admin", "analyst")),
+):
+    template = db.get(ChannelMappingTemplate, template_id)
+    if not template or template.bridge_id != bridge_id:
+        raise HTTPException(status_code=404, detail="Template not found")
+    db.delete(template)
+    log_action(db, "channel_mapping_template", template_id, "delete", user.id)
+    db.commit()
+
+
+@router.post(
+    "/bridges/{bridge_id}/mapping-templates/{template_id}/apply", response_model=schemas.MappingTemplateApplyResult
+)
+def apply_mapping_template(
+    bridge_id: int,
+    template_id: int,
+    payload: schemas.MappingTemplateApply,
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles("admin", "analyst")),
+):
+    """
+    Normalizes many acquisitions of the bridge with one template. The template is validated
+    and its cables/installations loaded once; each acquisition only reads its CSV and adds
+    its rows. Acquisitions that fail are reported and skipped; the rest commit together.
+    """
+    template = db.get(ChannelMappingTemplate, template_id)
+    if not template or template.bridge_id != bridge_id:
+        raise HTTPException(status_code=404, detail="Template not found")
+    ingestion = lazy_import("app.services.ingestion")
+    plan = ingestion.plan_mapping(db, template.mapping_json)
+    acquisition_ids = list(dict.fromkeys(payload.acquisition_ids))
+    acquisitions = {
+        a.id: a for a in db.scalars(select(Acquisition).where(Acquisition.id.in_(acquisition_ids)))
+    }
+    raw_files = ingestion.latest_raw_files(db, acquisition_ids)
+
+    results = []
+    for acq_id in acquisition_ids:
+        acq = acquisitions.get(acq_id)
+        if not acq or acq.bridge_id != bridge_id:
+            results.append(
+                schemas.MappingTemplateApplyItem(
+                    acquisition_id=acq_id, status="error", detail="Acquisition not found for this bridge"
+                )
+            )
+            continue
+        raw_record = raw_files.get(acq_id)
+        if raw_record is None:
+            results.append(
+                schemas.MappingTemplateApplyItem(
+                    acquisition_id=acq_id, status="error", detail="No hay raw_csv registrado para esta adquisición"
+                )
+            )
+            continue
+        try:
+            # Los errores de CSV/columnas saltan antes de cualquier escritura
+            norm_record, channels, _ = ingestion.normalize_from_raw(
+                db=db,
+                acq=acq,
+                mapping=plan.items,
+                data_root=Path(settings.data_root),
+                parser_version=payload.parser_version,
+                plan=plan,
+                raw_record=raw_record,
+            )
+        except (ValueError, OSError, EOFError, zlib.error) as exc:
+            # Crudo faltante o ilegible (lo que reporta app.scrub): se informa sin abortar el lote
+            results.append(schemas.MappingTemplateApplyItem(acquisition_id=acq_id, status="error", detail=str(exc)))
+            continue
+        log_action(db, "raw_file", norm_record.id, "create", user.id, notes=f"normalized_csv template {template.id}")
+        results.append(
+            schemas.MappingTemplateApplyItem(
+                acquisition_id=acq_id, status="ok", normalized_file_id=norm_record.id, channels_created=len(channels)
+            )
+        )
+    normalized = sum(r.status == "ok" for r in results)
+    response = schemas.MappingTemplateApplyResult(
+        template_id=template.id, normalized=normalized, errors=len(results) - normalized, results=results
+    )
+    db.commit()
+    return response
 
 
 @router.post("/weighing-measurements", response_model=schemas.WeighingMeasurementOut)
@@ -629,12 +1119,24 @@ def create_k_calibration(payload: schemas.KCalibrationCreate, db: Session = Depe
     return candidate
 
 
-@router.get("/k-calibrations", response_model=List[schemas.KCalibrationOut])
-def list_k_calibrations(cable_id: int | None = None, db: Session = Depends(get_db)):
-    q = db.query(KCalibration)
+def _k_calibrations_statement(cable_id: int | None, *entities):
+    stmt = select(*(entities or (KCalibration,)))
     if cable_id:
-        q = q.filter(KCalibration.cable_id == cable_id)
-    return q.order_by(KCalibration.valid_from.desc()).all()
+        stmt = stmt.where(KCalibration.cable_id == cable_id)
+    return stmt.order_by(KCalibration.valid_from.desc())
+
+
+@router.get("/k-calibrations", response_model=List[schemas.KCalibrationOut])
+async def list_k_calibrations(
+    cable_id: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    columnar: str | None = Depends(columnar_media_type),
+):
+    if columnar:
+        stmt = _k_calibrations_statement(cable_id, *model_columns(KCalibration, schemas.KCalibrationOut))
+        rows = (await db.execute(stmt)).all()
+        return columnar_response(columnar, list(schemas.KCalibrationOut.__fields__), rows)
+    return (await db.scalars(_k_calibrations_statement(cable_id))).all()
 
 
 @router.post("/weighing-campaigns/{campaign_id}/attachment")
@@ -661,38 +1163,64 @@ def upload_weighing_attachment(
 
 
 @router.get("/bridges/{bridge_id}/semaforo", response_model=schemas.SemaforoResponse)
-def semaforo(bridge_id: int, acquisition_id: int, top_n: int | None = Query(None, gt=0), db: Session = Depends(get_db)):
-    acq = db.get(Acquisition, acquisition_id)
+async def semaforo(
+    bridge_id: int,
+    acquisition_id: int,
+    top_n: int | None = Query(None, gt=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    acq = await db.get(Acquisition, acquisition_id)
     if not acq:
         raise HTTPException(status_code=404, detail="Acquisition not found")
 
     rows = (
-        db.query(AnalysisResult, Cable)
-        .join(AnalysisRun, AnalysisResult.analysis_run_id == AnalysisRun.id)
-        .join(Cable, Cable.id == AnalysisResult.cable_id)
-        .filter(AnalysisRun.acquisition_id == acquisition_id, Cable.bridge_id == bridge_id)
-        .all()
-    )
+        await db.execute(
+            select(Cable.id, Cable.nombre_en_puente, AnalysisResult.tension_tf)
+            .join(AnalysisRun, AnalysisResult.analysis_run_id == AnalysisRun.id)
+            .join(Cable, Cable.id == AnalysisResult.cable_id)
+            .where(AnalysisRun.acquisition_id == acquisition_id, Cable.bridge_id == bridge_id)
+        )
+    ).all()
     if not rows:
         return schemas.SemaforoResponse(bridge_id=bridge_id, acquisition_id=acquisition_id, total=0, exceden=0, items=[])
 
+    # Todas las versiones de estado de los tirantes en una sola consulta
+    states_by_cable: dict[int, list] = {}
+    state_rows = await db.execute(
+        select(CableStateVersion, StrandType.Fu_default)
+        .join(StrandType, StrandType.id == CableStateVersion.strand_type_id)
+        .where(CableStateVersion.cable_id.in_({cable_id for cable_id, _, _ in rows}))
+    )
+    for st, fu_default in state_rows:
+        states_by_cable.setdefault(st.cable_id, []).append(
+            business.CableStateVersion(
+                cable_id=st.cable_id,
+                valid_from=st.valid_from,
+                valid_to=st.valid_to,
+                length_effective_m=st.length_effective_m,
+                strands_active=st.strands_active,
+                strands_total=st.strands_total,
+                fu_override=st.Fu_override,
+                strand_type_fu_default=fu_default,
+            )
+        )
+
     items = []
     exceden = 0
-    for res, cable in rows:
-        states: List[CableStateVersion] = db.query(CableStateVersion).filter(CableStateVersion.cable_id == cable.id).all()
+    for cable_id, cable_name, tension in rows:
+        states = states_by_cable.get(cable_id)
         if not states:
             continue
         state_selected = select_cable_state_version(states, acq.acquired_at)
         fu = effective_fu(state_selected)
-        tension = res.tension_tf
         pct = (tension / fu) * 100 if fu else 0.0
-        estado = "ALERTA" if pct > 45.0 else "OK"
+        estado = "ALERTA" if pct > ALERT_PCT_FU else "OK"
         if estado == "ALERTA":
             exceden += 1
         items.append(
             schemas.SemaforoItem(
-                cable_id=cable.id,
-                nombre_en_puente=cable.nombre_en_puente,
+                cable_id=cable_id,
+                nombre_en_puente=cable_name,
                 tension_tf=tension,
                 fu=fu,
                 pct_fu=pct,
@@ -711,3 +1239,136 @@ def semaforo(bridge_id: int, acquisition_id: int, top_n: int | None = Query(None
         items=items_sorted,
         top_n=top_n,
     )
+
+
+@router.get("/bridges/{bridge_id}/semaforo/timeline", response_model=schemas.SemaforoTimelineResponse)
+async def semaforo_timeline(
+    bridge_id: int,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    np = lazy_import("numpy")
+    semaforo_svc = lazy_import("app.services.semaforo")
+    stmt = (
+        select(
+            Acquisition.id,
+            Acquisition.acquired_at,
+            Cable.id,
+            Cable.nombre_en_puente,
+            AnalysisResult.tension_tf,
+        )
+        .join(AnalysisRun, AnalysisResult.analysis_run_id == AnalysisRun.id)
+        .join(Acquisition, AnalysisRun.acquisition_id == Acquisition.id)
+        .join(Cable, Cable.id == AnalysisResult.cable_id)
+        .where(Cable.bridge_id == bridge_id)
+    )
+    if date_from:
+        stmt = stmt.where(Acquisition.acquired_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Acquisition.acquired_at <= date_to)
+    rows = (await db.execute(stmt.order_by(Acquisition.acquired_at, Acquisition.id, AnalysisResult.id))).all()
+
+    acq_index: dict[int, int] = {}
+    acquisitions: List[schemas.SemaforoTimelineAcquisition] = []
+    cable_names: dict[int, str] = {}
+    latest: dict[tuple[int, int], float] = {}
+    for acq_id, acquired_at, cable_id, cable_name, tension in rows:
+        if acq_id not in acq_index:
+            acq_index[acq_id] = len(acquisitions)
+            acquisitions.append(schemas.SemaforoTimelineAcquisition(id=acq_id, acquired_at=acquired_at))
+        cable_names[cable_id] = cable_name
+        # Rows come ordered by result id: the last run per (acquisition, cable) wins
+        latest[(acq_id, cable_id)] = tension
+
+    cable_ids = sorted(cable_names, key=lambda cid: (cable_names[cid], cid))
+    cable_index = {cid: idx for idx, cid in enumerate(cable_ids)}
+    tension = np.full((len(acquisitions), len(cable_ids)), np.nan)
+    for (acq_id, cable_id), value in latest.items():
+        tension[acq_index[acq_id], cable_index[cable_id]] = value
+
+    fu = np.full_like(tension, np.nan)
+    if cable_ids:
+        states = (
+            await db.execute(
+                select(
+                    CableStateVersion.cable_id,
+                    CableStateVersion.valid_from,
+                    CableStateVersion.valid_to,
+                    CableStateVersion.Fu_override,
+                    StrandType.Fu_default,
+                )
+                .join(StrandType, StrandType.id == CableStateVersion.strand_type_id)
+                .where(CableStateVersion.cable_id.in_(cable_ids))
+                .order_by(CableStateVersion.cable_id, CableStateVersion.valid_from)
+            )
+        ).all()
+        by_cable: dict[int, list] = {}
+        for st in states:
+            by_cable.setdefault(st.cable_id, []).append(st)
+        at = semaforo_svc.epoch_seconds([a.acquired_at for a in acquisitions])
+        for cable_id, cable_states in by_cable.items():
+            idx = semaforo_svc.select_state_indices(
+                semaforo_svc.epoch_seconds([st.valid_from for st in cable_states]),
+                semaforo_svc.epoch_seconds([st.valid_to for st in cable_states]),
+                at,
+            )
+            fu_values = np.array(
+                [st.Fu_override if st.Fu_override is not None else st.Fu_default for st in cable_states],
+                dtype=float,
+            )
+            fu[:, cable_index[cable_id]] = np.where(idx >= 0, fu_values[np.maximum(idx, 0)], np.nan)
+
+    pct, estado = semaforo_svc.threshold_matrix(tension, fu)
+    return schemas.SemaforoTimelineResponse(
+        bridge_id=bridge_id,
+        acquisitions=acquisitions,
+        cables=[schemas.SemaforoTimelineCable(id=cid, nombre_en_puente=cable_names[cid]) for cid in cable_ids],
+        pct_fu=[[None if np.isnan(v) else float(v) for v in row] for row in pct],
+        estado=estado.tolist(),
+        exceden=(estado == "ALERTA").sum(axis=1).astype(int).tolist(),
+        alert_pct=ALERT_PCT_FU,
+    )
+
+
+@router.get("/storage/scrubs", response_model=List[schemas.StorageScrubRunOut])
+def list_storage_scrubs(
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    user: User = Depends(require_roles("admin")),
+):
+    return db.scalars(select(StorageScrubRun).order_by(StorageScrubRun.id.desc()).limit(limit)).all()
+
+
+@router.get("/storage/scrubs/{run_id}", response_model=schemas.StorageScrubRunOut)
+def get_storage_scrub(run_id: int, db: Session = Depends(get_db), user: User = Depends(require_roles("admin"))):
+    run = db.get(StorageScrubRun, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Scrub run not found")
+    findings = db.scalars(
+        select(StorageScrubFinding).where(StorageScrubFinding.scrub_run_id == run_id).order_by(StorageScrubFinding.id)
+    ).all()
+    out = schemas.StorageScrubRunOut.from_orm(run)
+    out.findings = [schemas.StorageScrubFindingOut.from_orm(f) for f in findings]
+    return out
+
+
+@router.get("/profiles")
+def list_profiles(user: User = Depends(require_roles("admin"))):
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, user: User = Depends(require_roles("admin"))):
+    profile = profile_store.load(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get("/profiles/{profile_id}/pstats")
+def download_profile_pstats(profile_id: str, user: User = Depends(require_roles("admin"))):
+    path = profile_store.path(profile_id, ".prof")
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
@@ -0,0 +1,116 @@
+"""
+Audit logging batched per session.
+
+`log_action` only queues the entry on the session; the queue is written with a
+single executemany INSERT right before the session commits, inside the same
+transaction as the audited change. A rollback discards it.
+
+For high-volume imports a session can hand its entries to the background
+`AuditWriter` instead (`use_async_audit(db)`): the data commit no longer waits
+for the audit insert, at the cost of the audit rows landing shortly after.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "audit_pending"
+_ASYNC_KEY = "audit_async"
+
+
+def log_action(db: Session, entity: str, entity_id: int, action: str, user_id: int, notes: str | None = None):
+    db.info.setdefault(_PENDING_KEY, []).append(
+        {
+            "entity": entity,
+            "entity_id": entity_id,
+            "action": action,
+            "performed_by": user_id,
+            "performed_at": datetime.utcnow(),
+            "notes": notes,
+        }
+    )
+
+
+def use_async_audit(db: Session) -> None:
+    """Routes the audit entries of this session to the background writer."""
+    db.info[_ASYNC_KEY] = True
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_audit(session: Session) -> None:
+    pending: Optional[List[Dict]] = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if session.info.get(_ASYNC_KEY):
+        audit_writer.submit(pending)
+        return
+    session.execute(insert(AuditLog), pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_audit(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class AuditWriter:
+    """Drains queued audit entries in batches on a daemon thread, using the batch pool."""
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Dict]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, entries: List[Dict]) -> None:
+        for entry in entries:
+            self._queue.put(entry)
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self, first: Dict) -> List[Dict]:
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict]) -> None:
+        from .db import BatchSessionLocal
+
+        try:
+            with BatchSessionLocal() as db:
+                db.execute(insert(AuditLog), batch)
+                db.commit()
+        except Exception:
+            logger.exception("No se pudieron escribir %d entradas de auditoría", len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self) -> None:
+        while True:
+            self._write(self._drain(self._queue.get()))
+
+    def flush(self) -> None:
+        """Blocks until every submitted entry has been written (or failed)."""
+        self._queue.join()
+
+
+audit_writer = AuditWriter()
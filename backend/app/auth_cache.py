@@ -0,0 +1,96 @@
+"""
+In-process caches for the authentication path.
+
+`TokenCache` memoizes decoded JWT payloads by token string until the token's
+own `exp`, so HS256 is verified once per token and worker. `UserCache` keeps a
+detached copy of each authenticated user (id, username, role) for a short TTL;
+changes to a User row made through the ORM evict it immediately in this
+process, other workers pick the change up when the TTL runs out.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+from .config import get_settings
+from .models import User
+from .security import decode_token
+
+
+class TokenCache:
+    def __init__(self, decode: Callable[[str], dict], max_entries: int = 10000):
+        self._decode = decode
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def decode(self, token: str) -> dict:
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(token)
+        if cached and cached[0] > now:
+            return cached[1]
+        payload = self._decode(token)  # lanza si la firma o el exp no son válidos
+        expires_at = float(payload.get("exp") or 0)
+        if expires_at > now:
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._evict(now)
+                self._entries[token] = (expires_at, payload)
+        return payload
+
+    def _evict(self, now: float) -> None:
+        for token in [t for t, (exp, _) in self._entries.items() if exp <= now]:
+            del self._entries[token]
+        while len(self._entries) >= self.max_entries:
+            # Orden de inserción: descarta el token memorizado más antiguo
+            del self._entries[next(iter(self._entries))]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class UserCache:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[int, Tuple[float, User]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, load: Callable[[int], Optional[User]]) -> Optional[User]:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(user_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        user = load(user_id)
+        if user is None:
+            self.invalidate(user_id)
+            return None
+        # Copia sin sesión ni password_hash: se comparte entre peticiones concurrentes
+        snapshot = User(id=user.id, username=user.username, full_name=user.full_name, role=user.role)
+        if self.ttl_seconds > 0:
+            with self._lock:
+                self._entries[user_id] = (now + self.ttl_seconds, snapshot)
+        return snapshot
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(decode_token)
+user_cache = UserCache(get_settings().auth_user_cache_ttl_seconds)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_user(_mapper, _connection, target: User) -> None:
+    user_cache.invalidate(target.id)
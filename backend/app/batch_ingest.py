@@ -0,0 +1,420 @@
+"""
+Batch ingestion of raw CSVs from a folder, driven by a manifest.
+
+Usage (against DATABASE_URL / DATA_ROOT):
+    python -m app.batch_ingest /campo/2024-05 --manifest /campo/2024-05/manifest.csv --user jorge --workers 4
+
+Manifest (CSV or JSON list) columns:
+    file            path relative to the folder; glob patterns allowed (acq_12/*.csv)
+    acquisition_id  existing acquisition; or, instead,
+    bridge_id, acquired_at, fs_hz
+                    the acquisition is looked up by (bridge_id, acquired_at) and created if missing
+    mapping         optional JSON file with the normalize mapping
+                    ([{"csv_column_name", "sensor_id", "cable_id", "height_m"}, ...])
+    template        or, instead of `mapping`, the id of a bridge mapping template
+
+Files are hashed in worker processes, files whose sha256 is already registered as
+raw_csv are skipped, and each acquisition is then handled by one worker: its new
+files are registered (one commit per file) and, when a mapping is given,
+normalize_from_raw runs over its latest raw_csv, as POST /normalize does. Since
+every step is committed as it completes, re-running the same command after an
+interruption resumes where it stopped: registered files are skipped and an
+acquisition is normalized again only if it has new files or no normalized CSV yet.
+
+With SQLite use --workers 1 (a single writer); parallel registration targets Postgres.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import glob
+import json
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from .audit import log_action
+from .models import Acquisition, ChannelMappingTemplate, RawFile, User
+from .utils import sha256_for_fileobj
+
+SHA_LOOKUP_CHUNK = 500
+
+
+class ManifestError(ValueError):
+    pass
+
+
+@dataclass
+class ManifestEntry:
+    path: Path
+    acquisition_id: Optional[int] = None
+    bridge_id: Optional[int] = None
+    acquired_at: Optional[datetime] = None
+    fs_hz: Optional[float] = None
+    mapping_path: Optional[Path] = None
+    template_id: Optional[int] = None
+
+
+@dataclass
+class FileResult:
+    path: str
+    acquisition_id: Optional[int]
+    sha256: Optional[str] = None
+    status: str = "pending"  # registered | skipped_registered | skipped_duplicate | error
+    detail: Optional[str] = None
+
+
+@dataclass
+class AcquisitionJob:
+    acquisition_id: int
+    files: List[Tuple[str, str]]  # (ruta, sha256) por registrar
+    mapping: Optional[List[dict]]
+
+
+@dataclass
+class AcquisitionResult:
+    acquisition_id: int
+    registered: List[str] = field(default_factory=list)
+    normalized_file_id: Optional[int] = None
+    channels_created: int = 0
+    status: str = "ok"  # ok | skipped | error
+    detail: Optional[str] = None
+
+
+@dataclass
+class IngestReport:
+    files: List[FileResult] = field(default_factory=list)
+    acquisitions: List[AcquisitionResult] = field(default_factory=list)
+    unmatched: List[str] = field(default_factory=list)
+    created_acquisitions: List[int] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def errors(self) -> int:
+        return sum(f.status == "error" for f in self.files) + sum(a.status == "error" for a in self.acquisitions)
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "errors": self.errors}
+
+
+def _optional(row: Dict, key: str, cast):
+    value = row.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return cast(value.strip() if isinstance(value, str) else value)
+
+
+def load_manifest(manifest: Path, folder: Path) -> List[ManifestEntry]:
+    """Parses the manifest and expands globs; every row must resolve to at least one file."""
+    if manifest.suffix.lower() == ".json":
+        rows = json.loads(manifest.read_text())
+    else:
+        with manifest.open(newline="", encoding="utf-8") as fh:
+            rows = list(csv.DictReader(fh))
+    entries: List[ManifestEntry] = []
+    for line, row in enumerate(rows, start=1):
+        pattern = (row.get("file") or "").strip()
+        if not pattern:
+            raise ManifestError(f"Fila {line}: falta 'file'")
+        paths = sorted(Path(p) for p in glob.glob(str(folder / pattern)))
+        if not paths:
+            raise ManifestError(f"Fila {line}: ningún archivo coincide con {pattern}")
+        acquisition_id = _optional(row, "acquisition_id", int)
+        bridge_id = _optional(row, "bridge_id", int)
+        acquired_at = _optional(row, "acquired_at", lambda v: v if isinstance(v, datetime) else datetime.fromisoformat(v))
+        if acquisition_id is None and (bridge_id is None or acquired_at is None):
+            raise ManifestError(f"Fila {line}: indicar acquisition_id o bridge_id + acquired_at")
+        mapping = _optional(row, "mapping", str)
+        for path in paths:
+            entries.append(
+                ManifestEntry(
+                    path=path,
+                    acquisition_id=acquisition_id,
+                    bridge_id=bridge_id,
+                    acquired_at=acquired_at,
+                    fs_hz=_optional(row, "fs_hz", float),
+                    mapping_path=(folder / mapping) if mapping else None,
+                    template_id=_optional(row, "template", int),
+                )
+            )
+    return entries
+
+
+def hash_file(path: str) -> Tuple[str, str, int]:
+    with open(path, "rb") as fh:
+        digest = sha256_for_fileobj(fh, chunk_size=1 << 20)
+    return path, digest, Path(path).stat().st_size
+
+
+def _map(executor: Optional[Executor], func, items: Sequence, chunksize: int = 1) -> Iterable:
+    if executor is None:
+        return map(func, items)
+    return executor.map(func, items, chunksize=chunksize)
+
+
+def registered_hashes(db: Session, digests: Iterable[str]) -> Dict[str, int]:
+    """sha256 -> acquisition_id for the digests already registered as raw_csv."""
+    digests = list(digests)
+    found: Dict[str, int] = {}
+    for offset in range(0, len(digests), SHA_LOOKUP_CHUNK):
+        chunk = digests[offset : offset + SHA_LOOKUP_CHUNK]
+        found.update(
+            db.execute(
+                select(RawFile.sha256, RawFile.acquisition_id).where(
+                    RawFile.file_kind == "raw_csv", RawFile.sha256.in_(chunk)
+                )
+            ).all()
+        )
+    return found
+
+
+def resolve_acquisitions(
+    db: Session, entries: List[ManifestEntry], user_id: int, create_for: Optional[Set[int]] = None
+) -> Tuple[Dict[int, Optional[int]], List[int]]:
+    """
+    Maps each entry (by index) to an acquisition id, creating the missing (bridge_id, acquired_at)
+    acquisitions of the entries in `create_for` (all when None). Returns (ids by entry index, created ids).
+    """
+    by_key = {(e.bridge_id, e.acquired_at) for e in entries if e.acquisition_id is None}
+    existing: Dict[Tuple[int, datetime], int] = {}
+    if by_key:
+        existing = {
+            (bridge_id, acquired_at): acq_id
+            for acq_id, bridge_id, acquired_at in db.execute(
+                select(Acquisition.id, Acquisition.bridge_id, Acquisition.acquired_at).where(
+                    tuple_(Acquisition.bridge_id, Acquisition.acquired_at).in_(list(by_key))
+                )
+            )
+        }
+    explicit = {e.acquisition_id for e in entries if e.acquisition_id is not None}
+    known = set(db.execute(select(Acquisition.id).where(Acquisition.id.in_(explicit))).scalars()) if explicit else set()
+
+    created: List[int] = []
+    fs_by_key = {
+        (e.bridge_id, e.acquired_at): e.fs_hz
+        for idx, e in enumerate(entries)
+        if e.acquisition_id is None and (create_for is None or idx in create_for)
+    }
+    missing = [key for key in sorted(fs_by_key) if key not in existing]
+    if missing:
+        for bridge_id, acquired_at in missing:
+            fs_hz = fs_by_key[(bridge_id, acquired_at)]
+            if fs_hz is None:
+                raise ManifestError(f"Falta fs_hz para crear la adquisición {bridge_id} @ {acquired_at.isoformat()}")
+            acq = Acquisition(
+                bridge_id=bridge_id, acquired_at=acquired_at, Fs_Hz=fs_hz, operator_user_id=user_id, created_by_user_id=user_id
+            )
+            db.add(acq)
+            db.flush()
+            log_action(db, "acquisition", acq.id, "create", user_id, notes="batch_ingest")
+            existing[(bridge_id, acquired_at)] = acq.id
+            created.append(acq.id)
+        db.commit()
+
+    resolved: Dict[int, Optional[int]] = {}
+    for idx, e in enumerate(entries):
+        if e.acquisition_id is not None:
+            resolved[idx] = e.acquisition_id if e.acquisition_id in known else None
+        else:
+            resolved[idx] = existing.get((e.bridge_id, e.acquired_at))
+    return resolved, created
+
+
+def _load_mapping(path: Path) -> List[dict]:
+    mapping = json.loads(path.read_text())
+    if not isinstance(mapping, list) or not all(isinstance(item, dict) for item in mapping):
+        raise ManifestError(f"{path}: el mapeo debe ser una lista de objetos")
+    return mapping
+
+
+def _has_normalized(db: Session, acquisition_id: int) -> bool:
+    return (
+        db.execute(
+            select(RawFile.id).where(RawFile.acquisition_id == acquisition_id, RawFile.file_kind == "normalized_csv").limit(1)
+        ).scalar()
+        is not None
+    )
+
+
+def ingest_acquisition(job: AcquisitionJob, user_id: int, parser_version: str, data_root: str) -> AcquisitionResult:
+    """Registers the job's files (one commit each) and normalizes the acquisition when it has a mapping."""
+    from .db import BatchSessionLocal
+    from .services import ingestion
+
+    result = AcquisitionResult(job.acquisition_id)
+    with BatchSessionLocal() as db:
+        try:
+            acq = db.get(Acquisition, job.acquisition_id)
+            for path, digest in job.files:
+                name = Path(path).name
+                # Los registradores repiten nombres entre carpetas: el nombre guardado lleva adquisición y hash
+                with open(path, "rb") as fh:
+                    record = ingestion.register_raw_file(
+                        db, acq, parser_version, name, Path(data_root), fh, stored_name=f"acq{acq.id}_{digest[:16]}_{name}"
+                    )
+                if record.sha256 != digest:
+                    raise ValueError(f"{path} cambió durante la ingesta")
+                log_action(db, "raw_file", record.id, "create", user_id, notes="raw_csv batch_ingest")
+                db.commit()
+                result.registered.append(path)
+            if job.mapping is None or (not result.registered and _has_normalized(db, acq.id)):
+                result.status = "ok" if result.registered else "skipped"
+                return result
+            norm_record, channels, _ = ingestion.normalize_from_raw(
+                db=db, acq=acq, mapping=job.mapping, data_root=Path(data_root), parser_version=parser_version
+            )
+            log_action(db, "raw_file", norm_record.id, "create", user_id, notes="normalized_csv batch_ingest")
+            result.normalized_file_id = norm_record.id
+            result.channels_created = len(channels)
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            result.status = "error"
+            result.detail = str(exc)
+    return result
+
+
+def _ingest_star(args) -> AcquisitionResult:
+    return ingest_acquisition(*args)
+
+
+def _init_worker() -> None:
+    # Tras fork, las conexiones heredadas pertenecen al padre: se descartan sin cerrarlas
+    from .db import batch_engine, engine
+
+    engine.dispose(close=False)
+    batch_engine.dispose(close=False)
+
+
+def ingest(
+    db: Session,
+    folder: Path,
+    entries: List[ManifestEntry],
+    user_id: int,
+    data_root: Path,
+    parser_version: str = "v1",
+    executor: Optional[Executor] = None,
+    dry_run: bool = False,
+    exclude: Sequence[Path] = (),
+) -> IngestReport:
+    """Hashes, skips what is already registered and hands one job per acquisition to `executor`."""
+    start = time.perf_counter()
+    report = IngestReport()
+    listed = {e.path.resolve() for e in entries} | {p.resolve() for p in exclude}
+    report.unmatched = sorted(str(p) for p in folder.rglob("*.csv") if p.resolve() not in listed)
+
+    hashes = {path: (digest, size) for path, digest, size in _map(executor, hash_file, [str(e.path) for e in entries], 8)}
+    already = registered_hashes(db, {digest for digest, _ in hashes.values()})
+    # Solo se crean adquisiciones para archivos que de verdad hay que registrar
+    to_register = {idx for idx, e in enumerate(entries) if hashes[str(e.path)][0] not in already}
+    resolved, report.created_acquisitions = resolve_acquisitions(
+        db, entries, user_id, create_for=set() if dry_run else to_register
+    )
+
+    jobs: Dict[int, AcquisitionJob] = {}
+    mappings: Dict[Path, List[dict]] = {}
+    templates: Dict[int, List[dict]] = {}
+    seen: Dict[str, str] = {}
+    for idx, entry in enumerate(entries):
+        digest = hashes[str(entry.path)][0]
+        acq_id = resolved[idx]
+        file_result = FileResult(str(entry.path), acq_id, digest)
+        report.files.append(file_result)
+        if digest in already:
+            file_result.status = "skipped_registered"
+            file_result.detail = f"registrado en la adquisición {already[digest]}"
+        elif acq_id is None:
+            if dry_run and entry.acquisition_id is None:
+                file_result.status, file_result.detail = "pending", "adquisición por crear"
+            else:
+                file_result.status, file_result.detail = "error", "adquisición inexistente"
+            continue
+        if acq_id is None:
+            continue
+        job = jobs.setdefault(acq_id, AcquisitionJob(acq_id, [], None))
+        if entry.mapping_path is not None:
+            if entry.mapping_path not in mappings:
+                mappings[entry.mapping_path] = _load_mapping(entry.mapping_path)
+            job.mapping = mappings[entry.mapping_path]
+        elif entry.template_id is not None:
+            if entry.template_id not in templates:
+                template = db.get(ChannelMappingTemplate, entry.template_id)
+                if template is None:
+                    raise ManifestError(f"Plantilla de mapeo {entry.template_id} no existe")
+                templates[entry.template_id] = template.mapping_json
+            job.mapping = templates[entry.template_id]
+        if file_result.status == "skipped_registered":
+            continue
+        if digest in seen:
+            file_result.status, file_result.detail = "skipped_duplicate", f"mismo contenido que {seen[digest]}"
+        else:
+            seen[digest] = str(entry.path)
+            file_result.status = "registered" if not dry_run else "pending"
+            job.files.append((str(entry.path), digest))
+
+    if not dry_run:
+        args = [(job, user_id, parser_version, str(data_root)) for job in jobs.values()]
+        report.acquisitions = list(_map(executor, _ingest_star, args))
+        failed = {a.acquisition_id: a for a in report.acquisitions if a.status == "error"}
+        for file_result in report.files:
+            acq_result = failed.get(file_result.acquisition_id)
+            if acq_result and file_result.status == "registered" and file_result.path not in acq_result.registered:
+                file_result.status, file_result.detail = "error", acq_result.detail
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingesta por lotes de CSV crudos guiada por un manifiesto.")
+    parser.add_argument("folder", type=Path)
+    parser.add_argument("--manifest", type=Path, help="CSV o JSON (por defecto FOLDER/manifest.csv)")
+    parser.add_argument("--user", required=True, help="Usuario al que se atribuyen los registros")
+    parser.add_argument("--workers", type=int, default=4, help="Procesos para hash y registro (1: sin procesos)")
+    parser.add_argument("--parser-version", default="v1")
+    parser.add_argument("--dry-run", action="store_true", help="Solo hash y plan, sin escribir")
+    parser.add_argument("--report", type=Path, help="Guardar el reporte JSON")
+    args = parser.parse_args(argv)
+
+    from .config import get_settings
+    from .db import BatchSessionLocal
+
+    manifest = args.manifest or args.folder / "manifest.csv"
+    entries = load_manifest(manifest, args.folder)
+    with BatchSessionLocal() as db:
+        user_id = db.execute(select(User.id).where(User.username == args.user)).scalar()
+        if user_id is None:
+            print(f"Usuario {args.user} no existe", file=sys.stderr)
+            return 2
+        data_root = Path(get_settings().data_root)
+        if args.workers > 1:
+            with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+                report = ingest(
+                    db, args.folder, entries, user_id, data_root, args.parser_version, pool, args.dry_run, [manifest]
+                )
+        else:
+            report = ingest(db, args.folder, entries, user_id, data_root, args.parser_version, None, args.dry_run, [manifest])
+
+    for f in report.files:
+        print(f"{f.status:<20} acq={f.acquisition_id}  {f.path}" + (f"  ({f.detail})" if f.detail else ""))
+    for a in report.acquisitions:
+        line = f"acq {a.acquisition_id}: {a.status}, {len(a.registered)} registrados"
+        if a.normalized_file_id:
+            line += f", normalizado #{a.normalized_file_id} ({a.channels_created} canales)"
+        print(line + (f"  ({a.detail})" if a.detail else ""))
+    if report.unmatched:
+        print(f"{len(report.unmatched)} CSV de la carpeta no están en el manifiesto")
+    print(f"Listo en {report.seconds:.1f}s, {report.errors} errores")
+    if args.report:
+        args.report.write_text(json.dumps(report.to_dict(), indent=2, default=str))
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
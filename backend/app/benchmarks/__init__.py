@@ -0,0 +1,2 @@
+# Benchmark suites: end-to-end API (app.benchmarks.api) and hot-function sweeps (app.benchmarks.micro);
+# results are stored and compared with app.benchmarks.report.
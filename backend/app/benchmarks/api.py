@@ -0,0 +1,395 @@
+"""
+End-to-end API benchmarks, run in-process through TestClient against DATABASE_URL.
+
+Usage:
+    DATABASE_URL=... DATA_ROOT=/tmp/bench python -m app.benchmarks.api \
+        --seed-dataset --bridges 5 --cables 40 --years 5 --acq-per-month 8 --raw-every 20 \
+        --output bench/api-baseline.json
+    DATABASE_URL=... DATA_ROOT=/tmp/bench python -m app.benchmarks.api \
+        --baseline bench/api-baseline.json --check
+
+`--seed-dataset` fills the database with app.synthetic first (bridges already there
+are skipped). Every request goes through the full middleware stack; per scenario the
+report has p50/p95/p99 latency, sequential throughput, SQL statements per request,
+the highest RSS sampled between its requests and the RSS growth during the scenario
+(plus the process-wide ru_maxrss, which only ever grows). With `--check` the run exits
+with status 1 when any metric regresses against the baseline beyond its Rule.
+
+The normalize scenario writes normalized CSVs and channel rows; they are deleted after
+the scenario (rows by id above a mark taken before it, files no row points to), so
+repeated and baseline runs measure the same dataset.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from ..models import (
+    Acquisition,
+    AcquisitionChannel,
+    AnalysisResult,
+    AnalysisRun,
+    AuditLog,
+    Cable,
+    RawFile,
+    Sensor,
+    SensorInstallation,
+    User,
+)
+from ..query_budget import count_queries
+from ..security import hash_password
+from ..storage import SIDECAR_SUFFIXES, sidecar_path
+from .report import (
+    Rule,
+    check_against_baseline,
+    current_rss_mb,
+    latency_summary,
+    new_results,
+    peak_rss_mb,
+    print_table,
+    save_results,
+)
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench"
+
+RULES: Dict[str, Rule] = {
+    "latency_p50_ms": Rule(0.25, min_delta=2.0),
+    "latency_p95_ms": Rule(0.25, min_delta=5.0),
+    "latency_p99_ms": Rule(0.5, min_delta=10.0),
+    "throughput_rps": Rule(0.25, higher_is_worse=False),
+    # El número de sentencias es determinista: cualquier aumento es una regresión
+    "queries_max": Rule(0.0),
+    "rss_growth_mb": Rule(0.5, min_delta=20.0),
+}
+
+TABLE_COLUMNS = ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms", "throughput_rps", "queries_max", "scenario_peak_rss_mb")
+
+
+class BenchmarkError(RuntimeError):
+    pass
+
+
+@dataclass
+class Targets:
+    """Ids the scenarios hit, picked from the dataset once before the run."""
+
+    bridge_id: int
+    cable_id: int
+    acquisition_ids: List[int]
+    raw_acquisition_ids: List[int] = field(default_factory=list)
+    mapping: List[dict] = field(default_factory=list)
+    bridge_results: int = 0
+    auth_headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    iterations: int
+    request: Callable  # (client, targets, i) -> response
+    needs_raw: bool = False
+    cleanup: Optional[Callable] = None  # (db, targets, mark) -> None: deshace las escrituras del escenario
+
+
+def ensure_bench_user(db: Session) -> None:
+    if db.execute(select(User.id).where(User.username == BENCH_USERNAME)).scalar() is None:
+        db.add(User(username=BENCH_USERNAME, full_name="Benchmark", role="admin", password_hash=hash_password(BENCH_PASSWORD)))
+        db.commit()
+
+
+def discover_targets(db: Session, bridge_id: Optional[int] = None, max_acquisitions: int = 50) -> Targets:
+    """Picks the bridge with the most acquisitions (or `bridge_id`), its first cable and latest acquisitions."""
+    if bridge_id is None:
+        bridge_id = db.execute(
+            select(Acquisition.bridge_id).group_by(Acquisition.bridge_id).order_by(func.count().desc(), Acquisition.bridge_id).limit(1)
+        ).scalar()
+    if bridge_id is None:
+        raise BenchmarkError("No hay adquisiciones; usar --seed-dataset o cargar datos")
+    cable_id = db.execute(
+        select(Cable.id).where(Cable.bridge_id == bridge_id).order_by(Cable.nombre_en_puente).limit(1)
+    ).scalar()
+    acquisition_ids = list(
+        db.execute(
+            select(Acquisition.id)
+            .where(Acquisition.bridge_id == bridge_id)
+            .order_by(Acquisition.acquired_at.desc())
+            .limit(max_acquisitions)
+        ).scalars()
+    )
+    raw_acquisition_ids = list(
+        db.execute(
+            select(RawFile.acquisition_id)
+            .join(Acquisition, Acquisition.id == RawFile.acquisition_id)
+            .where(Acquisition.bridge_id == bridge_id, RawFile.file_kind == "raw_csv")
+            .distinct()
+            .order_by(RawFile.acquisition_id)
+            .limit(max_acquisitions)
+        ).scalars()
+    )
+    mapping = [
+        {"csv_column_name": serial, "sensor_id": sensor_id, "cable_id": cid, "height_m": height}
+        for serial, sensor_id, cid, height in db.execute(
+            select(Sensor.serial_or_asset_id, Sensor.id, SensorInstallation.cable_id, SensorInstallation.height_m)
+            .join(SensorInstallation, SensorInstallation.sensor_id == Sensor.id)
+            .join(Cable, Cable.id == SensorInstallation.cable_id)
+            .where(Cable.bridge_id == bridge_id, SensorInstallation.installed_to.is_(None))
+            .order_by(Cable.nombre_en_puente)
+        )
+    ]
+    bridge_results = db.execute(
+        select(func.count(AnalysisResult.id))
+        .join(AnalysisRun, AnalysisRun.id == AnalysisResult.analysis_run_id)
+        .join(Acquisition, Acquisition.id == AnalysisRun.acquisition_id)
+        .where(Acquisition.bridge_id == bridge_id)
+    ).scalar()
+    return Targets(bridge_id, cable_id, acquisition_ids, raw_acquisition_ids, mapping, bridge_results)
+
+
+def _login(client, t: Targets, i: int):
+    return client.post("/auth/token", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+
+
+def _history_cable(client, t: Targets, i: int):
+    return client.get("/history", params={"cable_id": t.cable_id})
+
+
+def _history_bridge_page(client, t: Targets, i: int):
+    return client.get("/history", params={"bridge_id": t.bridge_id, "limit": 500})
+
+
+def _history_bridge_csv(client, t: Targets, i: int):
+    return client.get("/history", params={"bridge_id": t.bridge_id, "format": "csv"})
+
+
+def _history_bridge_monthly(client, t: Targets, i: int):
+    return client.get("/history", params={"bridge_id": t.bridge_id, "bucket": "month"})
+
+
+def _semaforo(client, t: Targets, i: int):
+    acq_id = t.acquisition_ids[i % len(t.acquisition_ids)]
+    return client.get(f"/bridges/{t.bridge_id}/semaforo", params={"acquisition_id": acq_id})
+
+
+def _semaforo_timeline(client, t: Targets, i: int):
+    return client.get(f"/bridges/{t.bridge_id}/semaforo/timeline")
+
+
+def _normalize(client, t: Targets, i: int):
+    acq_id = t.raw_acquisition_ids[i % len(t.raw_acquisition_ids)]
+    return client.post(
+        f"/acquisitions/{acq_id}/normalize",
+        params={"parser_version": "bench"},
+        json=t.mapping,
+        headers=t.auth_headers,
+    )
+
+
+def _write_mark(db: Session) -> Dict[str, int]:
+    return {
+        "raw_file": db.execute(select(func.max(RawFile.id))).scalar() or 0,
+        "channel": db.execute(select(func.max(AcquisitionChannel.id))).scalar() or 0,
+    }
+
+
+def _undo_normalize(db: Session, t: Targets, mark: Dict[str, int]) -> None:
+    """Deletes the normalized files, channel rows and audit entries added since `mark`."""
+    created = db.execute(
+        select(RawFile.id, RawFile.storage_path).where(
+            RawFile.id > mark["raw_file"],
+            RawFile.file_kind == "normalized_csv",
+            RawFile.acquisition_id.in_(t.raw_acquisition_ids),
+        )
+    ).all()
+    ids = [row.id for row in created]
+    db.execute(
+        delete(AcquisitionChannel).where(
+            AcquisitionChannel.id > mark["channel"], AcquisitionChannel.acquisition_id.in_(t.raw_acquisition_ids)
+        )
+    )
+    db.execute(delete(AuditLog).where(AuditLog.entity == "raw_file", AuditLog.entity_id.in_(ids)))
+    db.execute(delete(RawFile).where(RawFile.id.in_(ids)))
+    db.commit()
+    paths = {row.storage_path for row in created}
+    # El nombre normalizado es fijo por adquisición: no borrar archivos que otra fila sigue usando
+    paths -= set(db.scalars(select(RawFile.storage_path).where(RawFile.storage_path.in_(paths))))
+    for path in paths:
+        for target in (Path(path), *(sidecar_path(path, suffix) for suffix in SIDECAR_SUFFIXES)):
+            target.unlink(missing_ok=True)
+
+
+def _catalog(path: str):
+    def request(client, t: Targets, i: int):
+        return client.get(path)
+
+    return request
+
+
+SCENARIOS: Sequence[Scenario] = (
+    Scenario("login", 10, _login),
+    Scenario("history_cable", 50, _history_cable),
+    Scenario("history_bridge_page", 50, _history_bridge_page),
+    Scenario("history_bridge_csv", 10, _history_bridge_csv),
+    Scenario("history_bridge_monthly", 20, _history_bridge_monthly),
+    Scenario("semaforo", 50, _semaforo),
+    Scenario("semaforo_timeline", 10, _semaforo_timeline),
+    Scenario("normalize", 10, _normalize, needs_raw=True, cleanup=_undo_normalize),
+    Scenario("catalog_bridges", 100, _catalog("/bridges")),
+    Scenario("catalog_cables", 50, _catalog("/cables")),
+    Scenario("catalog_strand_types", 100, _catalog("/strand-types")),
+    Scenario("catalog_sensors", 50, _catalog("/sensors")),
+    Scenario("catalog_sensor_installations", 50, _catalog("/sensor-installations")),
+)
+
+
+def run_scenario(
+    client, scenario: Scenario, targets: Targets, warmup: int = 2, session_factory: Optional[Callable] = None
+) -> Dict[str, float]:
+    mark = None
+    if scenario.cleanup is not None:
+        with session_factory() as db:
+            mark = _write_mark(db)
+    try:
+        for i in range(warmup):
+            scenario.request(client, targets, i)
+        rss_before = current_rss_mb()
+        rss_peak = rss_before
+        latencies: List[float] = []
+        queries: List[int] = []
+        wall_start = time.perf_counter()
+        for i in range(scenario.iterations):
+            with count_queries(all_threads=True) as log:
+                start = time.perf_counter()
+                resp = scenario.request(client, targets, warmup + i)
+                latencies.append(time.perf_counter() - start)
+            if resp.status_code != 200:
+                raise BenchmarkError(f"{scenario.name}: HTTP {resp.status_code} {resp.text[:200]}")
+            queries.append(log.count)
+            rss_peak = max(rss_peak, current_rss_mb())
+        wall = time.perf_counter() - wall_start
+    finally:
+        if mark is not None:
+            with session_factory() as db:
+                scenario.cleanup(db, targets, mark)
+    return {
+        **latency_summary(latencies),
+        "throughput_rps": scenario.iterations / wall,
+        "queries_mean": sum(queries) / len(queries),
+        "queries_max": float(max(queries)),
+        # Muestreado entre peticiones: propio del escenario, a diferencia de ru_maxrss
+        "scenario_peak_rss_mb": rss_peak,
+        "process_peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": current_rss_mb() - rss_before,
+        "iterations": float(scenario.iterations),
+    }
+
+
+def run(
+    client,
+    targets: Targets,
+    scenarios: Sequence[Scenario] = SCENARIOS,
+    iterations: Optional[int] = None,
+    warmup: int = 2,
+    session_factory: Optional[Callable] = None,
+    **environment,
+) -> Dict:
+    """
+    Runs the scenarios in order; those needing raw CSVs are skipped when the bridge has none.
+    `session_factory` (SessionLocal by default) is used to undo the writing scenarios.
+    """
+    if session_factory is None:
+        from ..db import SessionLocal as session_factory
+    token = client.post("/auth/token", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+    if token.status_code != 200:
+        raise BenchmarkError(f"Login de '{BENCH_USERNAME}' falló: HTTP {token.status_code}")
+    targets.auth_headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    results = new_results(
+        "api",
+        bridge_id=targets.bridge_id,
+        bridge_results=targets.bridge_results,
+        bridge_cables=len(targets.mapping),
+        **environment,
+    )
+    for scenario in scenarios:
+        if scenario.needs_raw and (not targets.raw_acquisition_ids or not targets.mapping):
+            continue
+        if iterations:
+            scenario = replace(scenario, iterations=iterations)
+        results["benchmarks"][scenario.name] = run_scenario(client, scenario, targets, warmup, session_factory)
+    return results
+
+
+def rules_with_tolerance(tolerance: Optional[float]) -> Dict[str, Rule]:
+    if tolerance is None:
+        return dict(RULES)
+    return {
+        name: replace(rule, tolerance=tolerance) if name.startswith(("latency", "throughput")) else rule
+        for name, rule in RULES.items()
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks end-to-end de la API contra DATABASE_URL.")
+    parser.add_argument("--seed-dataset", action="store_true", help="Generar antes el dataset sintético")
+    parser.add_argument("--bridges", type=int, default=3)
+    parser.add_argument("--cables", type=int, default=40)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--acq-per-month", type=int, default=8)
+    parser.add_argument("--raw-every", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bridge-id", type=int, help="Puente a medir (por defecto, el de más adquisiciones)")
+    parser.add_argument("--only", nargs="*", help="Escenarios a correr")
+    parser.add_argument("--iterations", type=int, help="Iteraciones por escenario (sustituye los valores por defecto)")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--output", type=Path, help="Guardar resultados JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON de referencia para comparar")
+    parser.add_argument("--check", action="store_true", help="Salir con 1 si hay regresiones respecto al baseline")
+    parser.add_argument("--tolerance", type=float, help="Tolerancia relativa para latencia/throughput (0.25 por defecto)")
+    args = parser.parse_args(argv)
+
+    from fastapi.testclient import TestClient
+
+    from ..config import get_settings
+    from ..db import BatchSessionLocal, SessionLocal, engine, init_db
+    from ..main import app
+
+    settings = get_settings()
+    init_db()
+    if args.seed_dataset:
+        from ..synthetic import SyntheticConfig, generate
+
+        cfg = SyntheticConfig(
+            bridges=args.bridges,
+            cables_per_bridge=args.cables,
+            years=args.years,
+            acquisitions_per_month=args.acq_per_month,
+            raw_every=args.raw_every,
+            seed=args.seed,
+        )
+        with BatchSessionLocal() as db:
+            generate(db, cfg, Path(settings.data_root))
+    with SessionLocal() as db:
+        ensure_bench_user(db)
+        targets = discover_targets(db, args.bridge_id)
+
+    scenarios = [s for s in SCENARIOS if not args.only or s.name in args.only]
+    with TestClient(app) as client:
+        results = run(
+            client, targets, scenarios, args.iterations, args.warmup, database=engine.dialect.name
+        )
+    print_table(results, TABLE_COLUMNS)
+    if args.output:
+        save_results(args.output, results)
+    regressions = check_against_baseline(results, args.baseline, rules_with_tolerance(args.tolerance))
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
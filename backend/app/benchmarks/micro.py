@@ -0,0 +1,329 @@
+"""
+Micro-benchmarks for the CPU hot spots, swept over input size.
+
+Usage:
+    python -m app.benchmarks.micro --output bench/micro.json
+    python -m app.benchmarks.micro --baseline bench/micro.json --check
+    python -m app.benchmarks.micro --quick --only select_k_for_timestamp
+
+For every size the best per-call time (best of `--repeats` timed loops) and the
+tracemalloc peak of one call are recorded, and a log-log fit over the sweep gives
+the scaling exponent (1 = linear). Each benchmark declares the exponent its
+algorithm should stay under, so `--check` catches an accidental O(n²) even without
+a baseline; with `--baseline` the per-size numbers are compared as well.
+
+normalize_from_raw runs against an in-memory SQLite database and a temporary
+DATA_ROOT; it does not touch DATABASE_URL.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..services import business
+from .report import Rule, check_against_baseline, new_results, print_table, save_results
+
+RULES: Dict[str, Rule] = {
+    "time_us@*": Rule(0.5, min_delta=5.0),
+    "peak_kib@*": Rule(0.25, min_delta=64.0),
+    "time_exponent": Rule(0.0, min_delta=0.25),
+}
+
+T0 = datetime(2015, 1, 1)
+
+Setup = Callable[[int, np.random.Generator], ContextManager[Callable[[], object]]]
+
+
+@dataclass(frozen=True)
+class MicroBenchmark:
+    name: str
+    setup: Setup  # (size, rng) -> context manager yielding a zero-argument call
+    sizes: Sequence[int]
+    quick_sizes: Sequence[int]
+    max_exponent: float
+
+
+def time_call(call: Callable[[], object], repeats: int = 3, min_time: float = 0.05) -> float:
+    """Best per-call time: the loop count doubles until one loop takes `min_time`, then best of `repeats`."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def peak_memory(call: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def scaling_exponent(sizes: Sequence[int], values: Sequence[float]) -> float:
+    return float(np.polyfit(np.log(sizes), np.log(np.maximum(values, 1e-12)), 1)[0])
+
+
+def run_benchmark(bench: MicroBenchmark, quick: bool = False, repeats: int = 3, min_time: float = 0.05, seed: int = 0) -> Dict[str, float]:
+    sizes = list(bench.quick_sizes if quick else bench.sizes)
+    metrics: Dict[str, float] = {}
+    times: List[float] = []
+    peaks: List[float] = []
+    for size in sizes:
+        with bench.setup(size, np.random.default_rng([seed, size])) as call:
+            call()  # calentamiento (imports perezosos, cachés)
+            seconds = time_call(call, repeats, min_time)
+            peak = peak_memory(call)
+        metrics[f"time_us@{size}"] = seconds * 1e6
+        metrics[f"peak_kib@{size}"] = peak / 1024
+        times.append(seconds)
+        peaks.append(peak)
+    metrics["time_exponent"] = scaling_exponent(sizes, times)
+    metrics["memory_exponent"] = scaling_exponent(sizes, peaks)
+    return metrics
+
+
+def exponent_violations(results: Dict, benchmarks: Sequence[MicroBenchmark]) -> List[str]:
+    limits = {b.name: b.max_exponent for b in benchmarks}
+    return [
+        f"{name} time_exponent {metrics['time_exponent']:.2f} > {limits[name]}"
+        for name, metrics in results["benchmarks"].items()
+        if name in limits and metrics["time_exponent"] > limits[name]
+    ]
+
+
+# --- Casos ---
+
+
+def _k_calibrations(n: int, rng: np.random.Generator) -> List[business.KCalibration]:
+    starts = [T0 + timedelta(hours=i) for i in range(n)]
+    return [
+        business.KCalibration(
+            cable_id=1,
+            k_value=float(k),
+            valid_from=start,
+            valid_to=starts[i + 1] if i + 1 < n else None,
+            calibration_id=i + 1,
+        )
+        for i, (start, k) in enumerate(zip(starts, rng.uniform(50, 150, n)))
+    ]
+
+
+def _cable_states(n: int) -> List[business.CableStateVersion]:
+    starts = [T0 + timedelta(hours=i) for i in range(n)]
+    return [
+        business.CableStateVersion(
+            cable_id=1,
+            valid_from=start,
+            valid_to=starts[i + 1] if i + 1 < n else None,
+            length_effective_m=100.0,
+            strands_active=37,
+            strands_total=37,
+            fu_override=None,
+            strand_type_fu_default=100.0,
+        )
+        for i, start in enumerate(starts)
+    ]
+
+
+@contextmanager
+def _select_k(n: int, rng: np.random.Generator):
+    calibrations = _k_calibrations(n, rng)
+    at = calibrations[n // 2].valid_from + timedelta(minutes=30)
+    yield lambda: business.select_k_for_timestamp(calibrations, at)
+
+
+@contextmanager
+def _select_state(n: int, rng: np.random.Generator):
+    states = _cable_states(n)
+    at = states[n // 2].valid_from + timedelta(minutes=30)
+    yield lambda: business.select_cable_state_version(states, at)
+
+
+@contextmanager
+def _validate_installations(n: int, rng: np.random.Generator):
+    # n instalaciones consecutivas repartidas en n/4 sensores, en orden aleatorio
+    installations = [
+        business.SensorInstallation(
+            sensor_id=i // 4,
+            cable_id=i,
+            installed_from=T0 + timedelta(days=90 * (i % 4)),
+            installed_to=T0 + timedelta(days=90 * (i % 4 + 1)) if i % 4 < 3 else None,
+        )
+        for i in range(n)
+    ]
+    order = rng.permutation(n)
+    installations = [installations[i] for i in order]
+    yield lambda: business.validate_installations_no_overlap(installations)
+
+
+@contextmanager
+def _validate_k(n: int, rng: np.random.Generator):
+    calibrations = _k_calibrations(n, rng)
+    last = calibrations[-1]
+    calibrations[-1] = business.KCalibration(1, last.k_value, last.valid_from, last.valid_from + timedelta(hours=1), n)
+    new_one = business.KCalibration(1, 100.0, last.valid_from + timedelta(hours=1), None)
+    yield lambda: business.validate_k_no_overlap(calibrations, new_one)
+
+
+def _raw_csv(rows: int, channels: int, rng: np.random.Generator) -> bytes:
+    from ..synthetic import harmonic_signals, raw_csv_bytes
+
+    fs_hz = 128.0
+    _, signals = harmonic_signals(rng.uniform(0.8, 3.0, channels), fs_hz, rows / fs_hz, rng)
+    t = np.arange(rows) / fs_hz
+    return raw_csv_bytes(t, signals, [f"ch{c}" for c in range(channels)], {"Fs_Hz": fs_hz})
+
+
+def _read_csv(rows: int, channels: int):
+    @contextmanager
+    def setup(size: int, rng: np.random.Generator):
+        from ..services.ingestion import _read_csv_after_data_start
+
+        content = _raw_csv(rows or size, channels or size, rng)
+        yield lambda: _read_csv_after_data_start(content)
+
+    return setup
+
+
+def _normalize(rows: int, channels: int):
+    @contextmanager
+    def setup(size: int, rng: np.random.Generator):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import Session
+
+        from ..db import Base
+        from ..models import Acquisition, Bridge, Cable, RawFile, Sensor, SensorInstallation
+        from ..services.ingestion import normalize_from_raw
+
+        n_rows, n_channels = rows or size, channels or size
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with tempfile.TemporaryDirectory(prefix="bench_normalize_") as tmp, Session(engine) as db:
+            data_root = Path(tmp)
+            bridge = Bridge(nombre="bench")
+            db.add(bridge)
+            db.flush()
+            cables = [Cable(bridge_id=bridge.id, nombre_en_puente=f"T-{c:03d}") for c in range(n_channels)]
+            sensors = [Sensor(sensor_type="acc", serial_or_asset_id=f"ch{c}", unit="g") for c in range(n_channels)]
+            db.add_all(cables + sensors)
+            db.flush()
+            db.add_all(
+                SensorInstallation(sensor_id=s.id, cable_id=c.id, installed_from=T0, height_m=2.0)
+                for s, c in zip(sensors, cables)
+            )
+            acq = Acquisition(bridge_id=bridge.id, acquired_at=T0 + timedelta(days=10), Fs_Hz=128.0)
+            db.add(acq)
+            db.flush()
+            raw_path = data_root / "raw.csv"
+            content = _raw_csv(n_rows, n_channels, rng)
+            raw_path.write_bytes(content)
+            db.add(
+                RawFile(
+                    acquisition_id=acq.id,
+                    file_kind="raw_csv",
+                    storage_path=str(raw_path),
+                    original_filename="raw.csv",
+                    sha256="0" * 64,
+                    file_size_bytes=len(content),
+                    parser_version="bench",
+                )
+            )
+            db.commit()
+            mapping = [
+                {"csv_column_name": s.serial_or_asset_id, "sensor_id": s.id, "cable_id": c.id, "height_m": 2.0}
+                for s, c in zip(sensors, cables)
+            ]
+
+            def call():
+                normalize_from_raw(db, acq, mapping, data_root, "bench")
+                db.rollback()
+
+            yield call
+        engine.dispose()
+
+    return setup
+
+
+BENCHMARKS: Sequence[MicroBenchmark] = (
+    MicroBenchmark("read_csv_after_data_start[rows]", _read_csv(0, 8), (2_000, 8_000, 32_000, 128_000), (500, 1_000, 2_000), 1.3),
+    MicroBenchmark("read_csv_after_data_start[channels]", _read_csv(8_000, 0), (4, 16, 64, 128), (2, 4, 8), 1.3),
+    MicroBenchmark("normalize_from_raw[rows]", _normalize(0, 8), (2_000, 8_000, 32_000, 128_000), (500, 1_000, 2_000), 1.3),
+    MicroBenchmark("normalize_from_raw[channels]", _normalize(4_000, 0), (4, 16, 64, 128), (2, 4, 8), 1.3),
+    MicroBenchmark("select_k_for_timestamp[calibrations]", _select_k, (100, 1_000, 10_000, 100_000), (50, 100, 200), 1.3),
+    MicroBenchmark("select_cable_state_version[versions]", _select_state, (100, 1_000, 10_000, 100_000), (50, 100, 200), 1.3),
+    MicroBenchmark(
+        "validate_installations_no_overlap[installations]", _validate_installations, (100, 1_000, 10_000, 100_000), (50, 100, 200), 1.4
+    ),
+    MicroBenchmark("validate_k_no_overlap[calibrations]", _validate_k, (100, 1_000, 10_000, 100_000), (50, 100, 200), 1.3),
+)
+
+TABLE_COLUMNS = ("time_exponent", "memory_exponent")
+
+
+def run(
+    benchmarks: Sequence[MicroBenchmark] = BENCHMARKS,
+    quick: bool = False,
+    repeats: int = 3,
+    min_time: float = 0.05,
+    seed: int = 0,
+) -> Dict:
+    results = new_results("micro", quick=quick, repeats=repeats, min_time=min_time)
+    for bench in benchmarks:
+        results["benchmarks"][bench.name] = run_benchmark(bench, quick, repeats, min_time, seed)
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de las funciones críticas, barriendo tamaños.")
+    parser.add_argument("--only", nargs="*", help="Benchmarks a correr (prefijo del nombre)")
+    parser.add_argument("--quick", action="store_true", help="Tamaños pequeños, para humo/CI")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Segundos mínimos por medición")
+    parser.add_argument("--output", type=Path, help="Guardar resultados JSON")
+    parser.add_argument("--baseline", type=Path, help="JSON de referencia para comparar")
+    parser.add_argument("--check", action="store_true", help="Salir con 1 ante regresiones o exponentes fuera de límite")
+    args = parser.parse_args(argv)
+
+    benchmarks = [b for b in BENCHMARKS if not args.only or any(b.name.startswith(o) for o in args.only)]
+    results = run(benchmarks, args.quick, args.repeats, args.min_time)
+    for name, metrics in results["benchmarks"].items():
+        print(name)
+        for key, value in metrics.items():
+            if key.startswith("time_us@"):
+                size = key.split("@", 1)[1]
+                print(f"  n={size:>8}  {value:>12.1f} us  {metrics[f'peak_kib@{size}']:>10.1f} KiB")
+    print_table(results, TABLE_COLUMNS)
+    if args.output:
+        save_results(args.output, results)
+    problems = exponent_violations(results, benchmarks)
+    for line in problems:
+        print(f"ESCALA {line}")
+    problems += check_against_baseline(results, args.baseline, RULES)
+    return 1 if args.check and problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Benchmark results: summaries, memory readings, JSON storage and baseline comparison.
+
+A results document is
+    {"suite": ..., "created_at": ..., "environment": {...}, "benchmarks": {name: {metric: value}}}
+with flat numeric metrics, so any two runs of a suite can be compared with `compare()`
+under per-metric `Rule`s (keys may be fnmatch patterns, e.g. "time_us@*").
+"""
+from __future__ import annotations
+
+import fnmatch
+import json
+import os
+import platform
+import resource
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A metric regresses when it worsens by more than max(tolerance · baseline, min_delta)."""
+
+    tolerance: float
+    min_delta: float = 0.0
+    higher_is_worse: bool = True
+
+
+def latency_summary(seconds: Sequence[float], prefix: str = "latency") -> Dict[str, float]:
+    ms = np.asarray(seconds, dtype=float) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        f"{prefix}_p50_ms": float(p50),
+        f"{prefix}_p95_ms": float(p95),
+        f"{prefix}_p99_ms": float(p99),
+        f"{prefix}_mean_ms": float(ms.mean()),
+        f"{prefix}_max_ms": float(ms.max()),
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss: KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def current_rss_mb() -> float:
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return peak_rss_mb()
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def new_results(suite: str, **environment) -> Dict:
+    return {
+        "suite": suite,
+        "created_at": datetime.utcnow().isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), **environment},
+        "benchmarks": {},
+    }
+
+
+def save_results(path: Path, results: Mapping) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True, default=str))
+
+
+def load_results(path: Path) -> Dict:
+    return json.loads(path.read_text())
+
+
+def _rule_for(metric: str, rules: Mapping[str, Rule]) -> Optional[Rule]:
+    if metric in rules:
+        return rules[metric]
+    return next((rule for pattern, rule in rules.items() if fnmatch.fnmatchcase(metric, pattern)), None)
+
+
+def compare(current: Mapping, baseline: Mapping, rules: Mapping[str, Rule]) -> List[str]:
+    """Regressions of `current` against `baseline`, one line each; benchmarks missing on either side are ignored."""
+    regressions = []
+    for name, base in sorted(baseline.get("benchmarks", {}).items()):
+        cur = current.get("benchmarks", {}).get(name)
+        if cur is None:
+            continue
+        for metric in sorted(set(base) & set(cur)):
+            rule = _rule_for(metric, rules)
+            if rule is None:
+                continue
+            b, c = float(base[metric]), float(cur[metric])
+            worse_by = c - b if rule.higher_is_worse else b - c
+            if worse_by > max(rule.tolerance * abs(b), rule.min_delta):
+                regressions.append(f"{name} {metric}: {b:.4g} -> {c:.4g}")
+    return regressions
+
+
+def print_table(results: Mapping, columns: Sequence[str], stream=None) -> None:
+    stream = stream or sys.stdout
+    # Cada columna al menos tan ancha como su nombre, con un espacio de separación
+    widths = [max(16, len(c) + 2) for c in columns]
+    header = f"{'benchmark':<32}" + "".join(f"{c:>{w}}" for c, w in zip(columns, widths))
+    print(header, file=stream)
+    for name, metrics in results["benchmarks"].items():
+        cells = "".join(f"{metrics.get(c, float('nan')):>{w}.3f}" for c, w in zip(columns, widths))
+        print(f"{name:<32}{cells}", file=stream)
+
+
+def check_against_baseline(
+    results: Mapping, baseline_path: Optional[Path], rules: Mapping[str, Rule], stream=None
+) -> List[str]:
+    if baseline_path is None:
+        return []
+    regressions = compare(results, load_results(baseline_path), rules)
+    for line in regressions:
+        print(f"REGRESION {line}", file=stream or sys.stdout)
+    return regressions
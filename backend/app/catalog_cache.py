@@ -0,0 +1,101 @@
+"""
+In-process cache for catalog list endpoints with ETag revalidation.
+
+Each catalog has a version counter stored as a small file, so every uvicorn
+worker on the host sees the same value without touching the database. Write
+handlers bump the counter after committing; readers compare it with their
+cached entry and answer 304 when the client's If-None-Match is current.
+Writers outside the API (CLIs such as app.synthetic) must call `bump` after committing.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Tuple, Type
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from .config import get_settings
+
+CATALOGS = ("bridges", "strand_types", "cables", "sensors", "sensor_installations")
+
+
+class CatalogVersions:
+    """File-backed version counters shared by every worker process on the host."""
+
+    def __init__(self, root: Path):
+        self.root = root
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.version"
+
+    def get(self, name: str) -> int:
+        try:
+            return int(self._path(name).read_text() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump(self, *names: str) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                for name in names:
+                    tmp = self._path(name).with_suffix(".tmp")
+                    tmp.write_text(str(self.get(name) + 1))
+                    os.replace(tmp, self._path(name))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def catalog_versions() -> CatalogVersions:
+    settings = get_settings()
+    return CatalogVersions(Path(settings.catalog_version_dir or Path(settings.data_root) / ".catalog"))
+
+
+def bump(*names: str) -> None:
+    """Invalidates the cached catalogs `names` (all of them by default) in every worker."""
+    catalog_versions().bump(*(names or CATALOGS))
+
+
+class CatalogCache:
+    def __init__(self, versions: CatalogVersions):
+        self.versions = versions
+        self._entries: Dict[str, Tuple[int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def etag(self, name: str, version: int) -> str:
+        return f'"{name}-{version}"'
+
+    def invalidate(self, *names: str) -> None:
+        self.versions.bump(*names)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def respond(
+        self, name: str, request: Request, load: Callable[[], Iterable], schema: Type[BaseModel]
+    ) -> Response:
+        """Serves `name` from cache, re-running `load` only when its version moved."""
+        version = self.versions.get(name)
+        etag = self.etag(name, version)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        with self._lock:
+            cached = self._entries.get(name)
+        if cached and cached[0] == version:
+            body = cached[1]
+        else:
+            body = json.dumps(jsonable_encoder([schema.from_orm(obj) for obj in load()])).encode("utf-8")
+            with self._lock:
+                self._entries[name] = (version, body)
+        return Response(content=body, media_type="application/json", headers=headers)
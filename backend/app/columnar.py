@@ -0,0 +1,87 @@
+"""
+Columnar (dict-of-arrays) responses for bulk read endpoints.
+
+Clients opt in through the Accept header; rows are taken straight from
+column-tuple queries, so no Pydantic model is built per row.
+Arrow IPC and Parquet need pyarrow, which is optional: without it those
+media types answer 406.
+"""
+from __future__ import annotations
+
+import io
+import json
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+COLUMNAR_JSON = "application/vnd.cempei.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+PARQUET = "application/vnd.apache.parquet"
+COLUMNAR_MEDIA_TYPES = (COLUMNAR_JSON, ARROW_STREAM, PARQUET)
+
+
+def columnar_media_type(request: Request) -> Optional[str]:
+    """Dependency: the columnar media type requested in Accept, or None for the regular JSON list."""
+    accept = request.headers.get("accept", "")
+    requested = [part.split(";")[0].strip().lower() for part in accept.split(",")]
+    for media_type in requested:
+        if media_type in COLUMNAR_MEDIA_TYPES:
+            return media_type
+    return None
+
+
+def model_columns(model, schema) -> list:
+    """ORM columns of `model` in the field order of the Pydantic `schema`."""
+    return [getattr(model, name) for name in schema.__fields__]
+
+
+def to_columns(names: Sequence[str], rows: Iterable[Sequence]) -> Dict[str, List]:
+    rows = list(rows)
+    if not rows:
+        return {name: [] for name in names}
+    return {name: list(values) for name, values in zip(names, zip(*rows))}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _arrow_table(columns: Dict[str, List]):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=406, detail="pyarrow no está instalado; usa " + COLUMNAR_JSON)
+    # Arrow no infiere structs heterogéneos: los dict/list (p. ej. harmonics_json) viajan como JSON
+    prepared = {
+        name: [json.dumps(v) if isinstance(v, (dict, list)) else v for v in values]
+        for name, values in columns.items()
+    }
+    return pa.table(prepared)
+
+
+def columnar_response(
+    media_type: str, names: Sequence[str], rows: Iterable[Sequence], headers: Optional[Dict[str, str]] = None
+) -> Response:
+    columns = to_columns(names, rows)
+    if media_type == COLUMNAR_JSON:
+        body = json.dumps(columns, default=_json_default).encode("utf-8")
+    elif media_type == ARROW_STREAM:
+        table = _arrow_table(columns)
+        import pyarrow as pa
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        body = sink.getvalue().to_pybytes()
+    else:
+        table = _arrow_table(columns)
+        import pyarrow.parquet as pq
+
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer)
+        body = buffer.getvalue()
+    return Response(content=body, media_type=media_type, headers=headers)
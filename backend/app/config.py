@@ -11,6 +11,41 @@ class Settings(BaseSettings):
     algorithm_version: str = "v1.0"
     secret_key: str = os.getenv("SECRET_KEY", "dev-secret-key-change-me")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "240"))
+    # TTL de la caché en proceso de usuario/rol usada por get_current_user (0 la desactiva)
+    auth_user_cache_ttl_seconds: float = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    batch_pool_size: int = int(os.getenv("BATCH_POOL_SIZE", "2"))
+    batch_max_overflow: int = int(os.getenv("BATCH_MAX_OVERFLOW", "2"))
+    # Pool propio del engine async (lecturas); se suma a DB_POOL_SIZE y BATCH_POOL_SIZE por worker
+    async_pool_size: int = int(os.getenv("ASYNC_POOL_SIZE", "5"))
+    async_max_overflow: int = int(os.getenv("ASYNC_MAX_OVERFLOW", "5"))
+    # Crear el esquema al arrancar cada worker; en despliegue usar `python -m app.init_db` y dejarlo en false
+    db_auto_create: bool = os.getenv("DB_AUTO_CREATE", "true").lower() in ("1", "true", "yes")
+    # Perfilado bajo demanda (X-Profile: 1 con token admin); false retira el middleware
+    # Token estático para /metrics, /pool-stats y /startup (p. ej. el scraper de Prometheus); sin él, token de admin
+    ops_token: str = os.getenv("OPS_TOKEN", "")
+    profiling_enabled: bool = os.getenv("PROFILING_ENABLED", "true").lower() in ("1", "true", "yes")
+    profile_keep: int = int(os.getenv("PROFILE_KEEP", "200"))
+    # Una petición que repite la misma sentencia SQL este número de veces se marca como posible N+1 (0 desactiva)
+    n_plus_one_threshold: int = int(os.getenv("N_PLUS_ONE_THRESHOLD", "20"))
+    # Contadores de versión del catálogo compartidos entre workers (por defecto DATA_ROOT/.catalog)
+    catalog_version_dir: str = os.getenv("CATALOG_VERSION_DIR", "")
+    # Compresión al guardar CSV crudos/normalizados: none | gzip | zstd (zstd requiere zstandard)
+    storage_compression_raw: str = os.getenv("STORAGE_COMPRESSION_RAW", "gzip")
+    storage_compression_normalized: str = os.getenv("STORAGE_COMPRESSION_NORMALIZED", "gzip")
+    storage_gzip_level: int = int(os.getenv("STORAGE_GZIP_LEVEL", "6"))
+    storage_zstd_level: int = int(os.getenv("STORAGE_ZSTD_LEVEL", "3"))
+    # Archivo frío (python -m app.tiering): destino, antigüedad y compresión; vacío = DATA_ROOT/archive
+    archive_root: str = os.getenv("ARCHIVE_ROOT", "")
+    archive_after_months: int = int(os.getenv("ARCHIVE_AFTER_MONTHS", "24"))
+    archive_compression: str = os.getenv("ARCHIVE_COMPRESSION", "gzip")
+    # Caché LRU en disco rápido de archivos archivados leídos de nuevo; vacío = DATA_ROOT/.hot_cache, 0 MB la desactiva
+    archive_cache_dir: str = os.getenv("ARCHIVE_CACHE_DIR", "")
+    archive_cache_max_mb: float = float(os.getenv("ARCHIVE_CACHE_MAX_MB", "2048"))
 
     class Config:
         env_file = ".env"
@@ -21,20 +21,37 @@ BACKEND_URL configurable (default http://localhost:8000).
 """
 
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+HIST_MAX_POINTS = int(os.getenv("HIST_MAX_POINTS", "1500"))
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY], suppress_callback_exceptions=True)
 
 
+# Respuestas GET con ETag: (path, params) -> (etag, json). El backend responde 304 si no cambió.
+_etag_cache: dict = {}
+
+
 def call_api(method: str, path: str, **kwargs):
     url = f"{BACKEND_URL}{path}"
     token = os.getenv("DASH_TOKEN") or kwargs.pop("token", None)
     headers = kwargs.pop("headers", {}) or {}
     if token:
         headers["Authorization"] = f"Bearer {token}"
+    cache_key = None
+    cached = None
+    if method.upper() == "GET":
+        cache_key = (path, json.dumps(kwargs.get("params") or {}, sort_keys=True, default=str))
+        cached = _etag_cache.get(cache_key)
+        if cached:
+            headers["If-None-Match"] = cached[0]
     try:
         with httpx.Client(timeout=10.0) as client:
             resp = client.request(method, url, headers=headers, **kwargs)
+            if resp.status_code == 304 and cached:
+                return cached[1]
             resp.raise_for_status()
-            return resp.json()
+            data = resp.json()
+            if cache_key and resp.headers.get("ETag"):
+                _etag_cache[cache_key] = (resp.headers["ETag"], data)
+            return data
     except Exception as exc:
         return {"error": str(exc)}
 
@@ -375,6 +392,18 @@ def semaforo_page():
             ),
             html.Div(id="sem-status"),
             html.Div(id="sem-table"),
+            html.Hr(),
+            html.H5("Línea de tiempo"),
+            dbc.Row(
+                [
+                    dbc.Col(dbc.Input(id="sem-tl-from", placeholder="date_from YYYY-MM-DD (opcional)", type="text"), md=4),
+                    dbc.Col(dbc.Input(id="sem-tl-to", placeholder="date_to YYYY-MM-DD (opcional)", type="text"), md=4),
+                    dbc.Col(dbc.Button("Ver línea de tiempo", id="sem-tl-submit", color="secondary"), md=3),
+                ],
+                className="gy-2 mb-3",
+            ),
+            html.Div(id="sem-tl-status"),
+            dcc.Graph(id="sem-tl-graph"),
         ],
         fluid=True,
     )
@@ -390,6 +419,20 @@ def historico_page():
                     dbc.Col(dbc.Input(id="hist-cable", placeholder="cable_id (opcional)", type="number"), md=3),
                     dbc.Col(dbc.Input(id="hist-from", placeholder="date_from YYYY-MM-DD (opcional)", type="text"), md=3),
                     dbc.Col(dbc.Input(id="hist-to", placeholder="date_to YYYY-MM-DD (opcional)", type="text"), md=3),
+                    dbc.Col(
+                        dcc.Dropdown(
+                            id="hist-bucket",
+                            options=[
+                                {"label": "Sin agregar", "value": ""},
+                                {"label": "Día", "value": "day"},
+                                {"label": "Semana", "value": "week"},
+                                {"label": "Mes", "value": "month"},
+                            ],
+                            value="",
+                            clearable=False,
+                        ),
+                        md=3,
+                    ),
                 ],
                 className="gy-2 mb-2",
             ),
@@ -1682,10 +1725,14 @@ def query_results(_, run_id):
     State("hist-cable", "value"),
     State("hist-from", "value"),
     State("hist-to", "value"),
+    State("hist-bucket", "value"),
     prevent_initial_call=True,
 )
-def load_history(_, bridge_id, cable_id, date_from, date_to):
-    params = {}
+def load_history(_, bridge_id, cable_id, date_from, date_to, bucket):
+    # Presupuesto de puntos por tirante: el payload escala con la pantalla, no con los datos
+    params = {"max_points": HIST_MAX_POINTS}
+    if bucket:
+        params["bucket"] = bucket
     if bridge_id:
         params["bridge_id"] = bridge_id
     if cable_id:
@@ -1697,12 +1744,16 @@ def load_history(_, bridge_id, cable_id, date_from, date_to):
     res = call_api("GET", "/history", params=params)
     if isinstance(res, dict) and res.get("error"):
         return str(res), None, {}, {}
-    results = res.get("results", []) if isinstance(res, dict) else []
-    if not results:
+    if bucket:
+        df = res.get("buckets") or []
+        x, y_t, y_f = "bucket_start", "tension_tf_mean", "f0_hz_mean"
+    else:
+        df = res.get("results", []) if isinstance(res, dict) else []
+        x, y_t, y_f = "acquired_at", "tension_tf", "f0_hz"
+    if not df:
         return "Sin datos", None, {}, {}
-    df = results
-    fig_t = px.line(df, x="acquired_at", y="tension_tf", color="nombre_en_puente", markers=True, title="Tensión vs fecha")
-    fig_f = px.line(df, x="acquired_at", y="f0_hz", color="nombre_en_puente", markers=True, title="f0 vs fecha")
+    fig_t = px.line(df, x=x, y=y_t, color="nombre_en_puente", markers=True, title="Tensión vs fecha")
+    fig_f = px.line(df, x=x, y=y_f, color="nombre_en_puente", markers=True, title="f0 vs fecha")
     table = dash_table.DataTable(data=df, page_size=10)
     return "", table, fig_t, fig_f
 
@@ -1729,5 +1780,39 @@ def consult_semaforo(_, bridge_id, acq_id, topn):
     return resumen, table
 
 
+@app.callback(
+    Output("sem-tl-status", "children"),
+    Output("sem-tl-graph", "figure"),
+    Input("sem-tl-submit", "n_clicks"),
+    State("sem-bridge", "value"),
+    State("sem-tl-from", "value"),
+    State("sem-tl-to", "value"),
+    prevent_initial_call=True,
+)
+def consult_semaforo_timeline(_, bridge_id, date_from, date_to):
+    params = {}
+    if date_from:
+        params["date_from"] = date_from
+    if date_to:
+        params["date_to"] = date_to
+    res = call_api("GET", f"/bridges/{bridge_id}/semaforo/timeline", params=params)
+    if isinstance(res, dict) and res.get("error"):
+        return str(res), {}
+    if not res.get("acquisitions"):
+        return "Sin resultados", {}
+    fig = px.imshow(
+        res["pct_fu"],
+        x=[c["nombre_en_puente"] for c in res["cables"]],
+        y=[a["acquired_at"] for a in res["acquisitions"]],
+        color_continuous_scale="RdYlGn_r",
+        zmin=0,
+        zmax=max(100.0, res["alert_pct"] * 2),
+        aspect="auto",
+        labels={"color": "% Fu"},
+        title=f"% Fu por tirante y adquisición (alerta > {res['alert_pct']}%)",
+    )
+    return f"Adquisiciones: {len(res['acquisitions'])} | Tirantes: {len(res['cables'])}", fig
+
+
 if __name__ == "__main__":
     app.run_server(debug=True, host="0.0.0.0", port=8050)
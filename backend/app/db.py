@@ -1,20 +1,110 @@
 from __future__ import annotations
 
+from functools import lru_cache
+from typing import Dict
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
 from .config import get_settings
+from .pool_metrics import PoolStats, instrumented_queue_pool
 
 settings = get_settings()
 
-engine = create_engine(settings.database_url)
+pool_stats: Dict[str, PoolStats] = {name: PoolStats(name) for name in ("interactive", "batch", "async")}
+
+
+def _create_engine(name: str, pool_size: int, max_overflow: int):
+    url = make_url(settings.database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # SQLite en memoria usa SingletonThreadPool; no admite tamaño/overflow
+        return create_engine(url)
+    return create_engine(
+        url,
+        poolclass=instrumented_queue_pool(pool_stats[name]),
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+# Pool para requests interactivos (API/Dash) y pool aparte para jobs batch, para que no se roben conexiones
+engine = _create_engine("interactive", settings.db_pool_size, settings.db_max_overflow)
+batch_engine = _create_engine("batch", settings.batch_pool_size, settings.batch_max_overflow)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+BatchSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=batch_engine)
 Base = declarative_base()
 
 
+def init_db() -> None:
+    """Creates the schema (idempotent). Runs from `python -m app.init_db`, or on startup when DB_AUTO_CREATE is on."""
+    from . import models  # noqa: F401  registra las tablas en Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def get_batch_db():
+    db = BatchSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+@lru_cache()
+def get_async_engine() -> AsyncEngine:
+    """
+    Async engine for the read-heavy endpoints (asyncpg on Postgres, aiosqlite on SQLite).
+    Created on first use so workers that never serve those endpoints do not need the driver.
+    """
+    url = make_url(settings.database_url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    if url.get_backend_name() == "sqlite":
+        # Las conexiones aiosqlite quedan ligadas a su event loop; sin pool no se comparten entre loops
+        return create_async_engine(url, poolclass=instrumented_queue_pool(pool_stats["async"], NullPool))
+    return create_async_engine(
+        url,
+        poolclass=instrumented_queue_pool(pool_stats["async"], AsyncAdaptedQueuePool),
+        pool_size=settings.async_pool_size,
+        max_overflow=settings.async_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
+@lru_cache()
+def get_async_sessionmaker() -> async_sessionmaker:
+    return async_sessionmaker(get_async_engine(), autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+def pool_status() -> Dict[str, Dict]:
+    status = {
+        "interactive": pool_stats["interactive"].snapshot(engine.pool),
+        "batch": pool_stats["batch"].snapshot(batch_engine.pool),
+    }
+    # El engine async se crea con la primera lectura async; antes no hay pool que reportar
+    if get_async_engine.cache_info().currsize:
+        status["async"] = pool_stats["async"].snapshot(get_async_engine().pool)
+    return status
@@ -115,7 +115,11 @@ CREATE INDEX IF NOT EXISTS idx_sensor_installations_no_overlap
 ON sensor_installations
 USING GIST (
     sensor_id,
-    tstzrange(installed_from, COALESCE(installed_to, 'infinity')) WITH &&);
+    tstzrange(installed_from, COALESCE(installed_to, 'infinity')));
+
+CREATE INDEX IF NOT EXISTS idx_sensor_installations_sensor_from ON sensor_installations (sensor_id, installed_from);
+CREATE INDEX IF NOT EXISTS idx_sensor_installations_cable ON sensor_installations (cable_id);
+CREATE INDEX IF NOT EXISTS idx_cable_state_versions_cable_valid_from ON cable_state_versions (cable_id, valid_from);
 
 -- 4.2 Acquisitions
 CREATE TABLE IF NOT EXISTS acquisitions (
@@ -129,6 +133,9 @@ CREATE TABLE IF NOT EXISTS acquisitions (
     created_by_user_id BIGINT REFERENCES users(id)
 );
 
+CREATE INDEX IF NOT EXISTS idx_acquisitions_bridge_acquired_at ON acquisitions (bridge_id, acquired_at);
+CREATE INDEX IF NOT EXISTS idx_acquisitions_acquired_at ON acquisitions (acquired_at);
+
 CREATE TABLE IF NOT EXISTS raw_files (
     id BIGSERIAL PRIMARY KEY,
     acquisition_id BIGINT NOT NULL REFERENCES acquisitions(id) ON DELETE CASCADE,
@@ -142,6 +149,8 @@ CREATE TABLE IF NOT EXISTS raw_files (
     CONSTRAINT uq_raw_files_sha UNIQUE (sha256)
 );
 
+CREATE INDEX IF NOT EXISTS idx_raw_files_acq_kind_created ON raw_files (acquisition_id, file_kind, created_at);
+
 CREATE TABLE IF NOT EXISTS acquisition_channels (
     id BIGSERIAL PRIMARY KEY,
     acquisition_id BIGINT NOT NULL REFERENCES acquisitions(id) ON DELETE CASCADE,
@@ -153,6 +162,20 @@ CREATE TABLE IF NOT EXISTS acquisition_channels (
     notes TEXT
 );
 
+CREATE INDEX IF NOT EXISTS idx_acquisition_channels_acquisition ON acquisition_channels (acquisition_id);
+
+CREATE TABLE IF NOT EXISTS channel_mapping_templates (
+    id BIGSERIAL PRIMARY KEY,
+    bridge_id BIGINT NOT NULL REFERENCES bridges(id) ON DELETE CASCADE,
+    nombre TEXT NOT NULL,
+    mapping_json JSONB NOT NULL,
+    notes TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    created_by_user_id BIGINT REFERENCES users(id)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_channel_mapping_template_nombre ON channel_mapping_templates (bridge_id, nombre);
+
 -- 4.3 Pesajes directos y K
 CREATE TABLE IF NOT EXISTS weighing_campaigns (
     id BIGSERIAL PRIMARY KEY,
@@ -221,7 +244,9 @@ CREATE INDEX IF NOT EXISTS idx_k_calibrations_no_overlap
 ON k_calibrations
 USING GIST (
     cable_id,
-    tstzrange(valid_from, COALESCE(valid_to, 'infinity')) WITH &&);
+    tstzrange(valid_from, COALESCE(valid_to, 'infinity')));
+
+CREATE INDEX IF NOT EXISTS idx_k_calibrations_cable_valid_from ON k_calibrations (cable_id, valid_from);
 
 -- 5 Análisis
 CREATE TABLE IF NOT EXISTS analysis_runs (
@@ -233,6 +258,8 @@ CREATE TABLE IF NOT EXISTS analysis_runs (
     notes TEXT
 );
 
+CREATE INDEX IF NOT EXISTS idx_analysis_runs_acquisition ON analysis_runs (acquisition_id);
+
 CREATE TABLE IF NOT EXISTS analysis_run_params (
     id BIGSERIAL PRIMARY KEY,
     analysis_run_id BIGINT NOT NULL REFERENCES analysis_runs(id) ON DELETE CASCADE,
@@ -268,6 +295,9 @@ CREATE TABLE IF NOT EXISTS analysis_results (
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+CREATE INDEX IF NOT EXISTS idx_analysis_results_run ON analysis_results (analysis_run_id);
+CREATE INDEX IF NOT EXISTS idx_analysis_results_cable ON analysis_results (cable_id);
+
 -- Helpers
 CREATE TABLE IF NOT EXISTS audit_log (
     id BIGSERIAL PRIMARY KEY,
@@ -278,3 +308,29 @@ CREATE TABLE IF NOT EXISTS audit_log (
     performed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
     notes TEXT
 );
+
+-- Verificación de integridad de archivos (python -m app.scrub)
+CREATE TABLE IF NOT EXISTS storage_scrub_runs (
+    id BIGSERIAL PRIMARY KEY,
+    started_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ,
+    status TEXT NOT NULL DEFAULT 'running',
+    files_checked INTEGER NOT NULL DEFAULT 0,
+    bytes_read BIGINT NOT NULL DEFAULT 0,
+    missing INTEGER NOT NULL DEFAULT 0,
+    corrupt INTEGER NOT NULL DEFAULT 0,
+    orphaned INTEGER NOT NULL DEFAULT 0,
+    notes TEXT
+);
+
+CREATE TABLE IF NOT EXISTS storage_scrub_findings (
+    id BIGSERIAL PRIMARY KEY,
+    scrub_run_id BIGINT NOT NULL REFERENCES storage_scrub_runs(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    entity TEXT,
+    entity_id BIGINT,
+    path TEXT NOT NULL,
+    detail TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_storage_scrub_findings_run ON storage_scrub_findings (scrub_run_id);
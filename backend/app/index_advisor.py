@@ -0,0 +1,108 @@
+"""
+Index advisor: runs EXPLAIN over the hot endpoint queries and reports sequential scans.
+
+Usage (against DATABASE_URL):
+    python -m app.index_advisor
+
+Exits with status 1 when any query plan contains a sequential scan. On Postgres the
+planner is run with enable_seqscan=off, so a Seq Scan means no usable index exists
+(tiny dev tables would otherwise always be scanned).
+"""
+from __future__ import annotations
+
+import re
+import sys
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from .models import (
+    AcquisitionChannel,
+    AnalysisResult,
+    AnalysisRun,
+    Cable,
+    CableStateVersion,
+    KCalibration,
+    RawFile,
+    SensorInstallation,
+)
+
+_PG_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+
+def endpoint_queries(db: Session) -> Dict[str, object]:
+    """Representative statements of the read paths of /history, semáforo and normalize."""
+    from .api import _history_statement, _k_calibrations_statement
+
+    return {
+        "history_by_bridge": _history_statement(1, None, None, None),
+        "history_by_cable": _history_statement(None, 1, None, None),
+        "k_calibrations_by_cable": _k_calibrations_statement(1),
+        "semaforo_results": db.query(Cable.id, Cable.nombre_en_puente, AnalysisResult.tension_tf)
+        .join(AnalysisRun, AnalysisResult.analysis_run_id == AnalysisRun.id)
+        .join(Cable, Cable.id == AnalysisResult.cable_id)
+        .filter(AnalysisRun.acquisition_id == 1, Cable.bridge_id == 1)
+        .statement,
+        "semaforo_states": db.query(CableStateVersion)
+        .filter(CableStateVersion.cable_id.in_([1, 2]))
+        .order_by(CableStateVersion.cable_id, CableStateVersion.valid_from)
+        .statement,
+        "normalize_raw_lookup": db.query(RawFile)
+        .filter(RawFile.acquisition_id == 1, RawFile.file_kind == "raw_csv")
+        .order_by(RawFile.created_at.desc())
+        .limit(1)
+        .statement,
+        "normalize_installations": db.query(SensorInstallation)
+        .filter(SensorInstallation.sensor_id == 1)
+        .order_by(SensorInstallation.installed_from)
+        .statement,
+        "acquisition_channels": db.query(AcquisitionChannel).filter(AcquisitionChannel.acquisition_id == 1).statement,
+    }
+
+
+def explain(db: Session, statement) -> List[str]:
+    dialect = db.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    conn = db.connection()
+    if dialect.name == "sqlite":
+        return [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    if dialect.name == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    return [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}")]
+
+
+def sequential_scans(plan: List[str]) -> List[str]:
+    """Tables read by a full sequential scan in an EXPLAIN plan (Postgres or SQLite format)."""
+    tables = []
+    for line in plan:
+        match = _PG_SEQ_SCAN.search(line) or _SQLITE_SCAN.match(line.strip())
+        if match:
+            tables.append(match.group(1))
+    return tables
+
+
+def advise(db: Session) -> Dict[str, List[str]]:
+    """Maps each endpoint query to the tables it scans sequentially (empty list when index-driven)."""
+    report = {}
+    try:
+        for name, statement in endpoint_queries(db).items():
+            report[name] = sequential_scans(explain(db, statement))
+    finally:
+        db.rollback()
+    return report
+
+
+def main() -> int:
+    from .db import SessionLocal
+
+    with SessionLocal() as db:
+        report = advise(db)
+    for name, tables in report.items():
+        status = "OK" if not tables else "SEQ SCAN: " + ", ".join(tables)
+        print(f"{name:<28} {status}")
+    return 1 if any(report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+"""
+Creates the database schema once, outside the API workers.
+
+Usage (against DATABASE_URL):
+    python -m app.init_db
+"""
+from __future__ import annotations
+
+import time
+
+from .db import init_db
+
+
+def main() -> None:
+    start = time.perf_counter()
+    init_db()
+    print(f"Esquema listo en {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
 import os
+import time
 from pathlib import Path
 from typing import Any, Dict
 
-from fastapi import FastAPI
+# Antes que cualquier otro import: BOOT_START marca el inicio del arranque
+from .startup import BOOT_START, record_phase, report as startup_report, timed_import
 
-from .api import router
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI
+
+# Importados uno a uno para que /startup muestre cuánto aporta cada módulo al arranque
+for _module in ("app.config", "app.db", "app.models", "app.schemas", "app.security", "app.api"):
+    timed_import(_module)
+
+from .api import profile_store, require_ops_access, router
+from .config import get_settings
+from .db import init_db, pool_status
+from .metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, request_metrics
+from .profiling import ProfilingMiddleware
+from fastapi.responses import JSONResponse, Response
 
 ALGORITHM_VERSION = "v1.0"
 
@@ -18,13 +30,24 @@ app = FastAPI(
 )
 
 app.include_router(router)
+if get_settings().profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, store=profile_store)
+app.add_middleware(MetricsMiddleware)
+
+
+record_phase("import", time.perf_counter() - BOOT_START)
 
 
 @app.on_event("startup")
 def ensure_data_dirs() -> None:
+    start = time.perf_counter()
     data_root = Path(os.environ.get("DATA_ROOT", "/data"))
     for sub in ("raw", "normalized", "attachments"):
         (data_root / sub).mkdir(parents=True, exist_ok=True)
+    if get_settings().db_auto_create:
+        init_db()
+    record_phase("startup", time.perf_counter() - start)
+    record_phase("boot_total", time.perf_counter() - BOOT_START)
 
 
 @app.get("/health")
@@ -41,6 +64,21 @@ def info() -> Dict[str, Any]:
     }
 
 
+@app.get("/pool-stats", dependencies=[Depends(require_ops_access)])
+def pool_stats() -> Dict[str, Any]:
+    return pool_status()
+
+
+@app.get("/metrics", dependencies=[Depends(require_ops_access)])
+def metrics() -> Response:
+    return Response(request_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/startup", dependencies=[Depends(require_ops_access)])
+def startup_timings() -> Dict[str, Any]:
+    return startup_report()
+
+
 @app.exception_handler(ValueError)
 async def value_error_handler(_, exc: ValueError) -> JSONResponse:
     return JSONResponse(status_code=400, content={"detail": str(exc)})
@@ -0,0 +1,237 @@
+"""
+Request metrics in Prometheus text format (GET /metrics).
+
+`MetricsMiddleware` is a plain ASGI middleware, so streamed bodies are counted
+and timed until their last chunk. SQL statements and DB time are attributed to
+the request through a ContextVar fed by engine-level cursor events; Starlette
+copies the context into its threadpool, so sync handlers, yield dependencies
+and streaming generators are all covered, as are the async engine's statements.
+"""
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import get_settings
+from .query_budget import statement_shape
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float("inf"))
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500, float("inf"))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@dataclass
+class DBStats:
+    statements: int = 0
+    seconds: float = 0.0
+    # Veces que se ejecutó cada texto SQL; el texto compilado es estable entre filas de un mismo bucle
+    by_statement: Dict[str, int] = field(default_factory=dict)
+
+
+_db_stats: contextvars.ContextVar[Optional[DBStats]] = contextvars.ContextVar("db_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de ejecución (no en conn.info): si la sentencia falla se descarta con él
+    if _db_stats.get() is not None and context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _db_stats.get()
+    start = getattr(context, "_metrics_query_start", None)
+    if stats is None or start is None:
+        return
+    stats.statements += 1
+    stats.seconds += time.perf_counter() - start
+    stats.by_statement[statement] = stats.by_statement.get(statement, 0) + 1
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for idx, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[idx] += 1
+                break
+
+
+def _labels(**labels: str) -> str:
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{k}="{escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _bound(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(value)
+
+
+class RequestMetrics:
+    def __init__(self, n_plus_one_threshold: int = 0):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.latency: Dict[Tuple[str, str], Histogram] = {}
+            self.size: Dict[Tuple[str, str], Histogram] = {}
+            self.statements: Dict[Tuple[str, str], Histogram] = {}
+            self.db_seconds: Dict[Tuple[str, str], float] = {}
+            self.requests: Dict[Tuple[str, str, int], int] = {}
+            self.errors: Dict[Tuple[str, str], int] = {}
+            self.n_plus_one: Dict[Tuple[str, str], int] = {}
+            self.in_flight: Dict[str, int] = {}
+
+    def start(self, method: str) -> None:
+        with self._lock:
+            self.in_flight[method] = self.in_flight.get(method, 0) + 1
+
+    def finish(self, method: str, route: str, status: int, seconds: float, size: int, db: DBStats, error: bool) -> None:
+        key = (method, route)
+        suspect = self._n_plus_one_suspect(db)
+        if suspect:
+            logger.warning("Posible N+1 en %s %s: %d x %s", method, route, suspect[1], statement_shape(suspect[0])[:300])
+        with self._lock:
+            self.in_flight[method] -= 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.size.setdefault(key, Histogram(SIZE_BUCKETS)).observe(size)
+            self.statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(db.statements)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + db.seconds
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            if error:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            if suspect:
+                self.n_plus_one[key] = self.n_plus_one.get(key, 0) + 1
+
+    def _n_plus_one_suspect(self, db: DBStats) -> Optional[Tuple[str, int]]:
+        if not self.n_plus_one_threshold or not db.by_statement:
+            return None
+        statement, count = max(db.by_statement.items(), key=lambda item: item[1])
+        return (statement, count) if count >= self.n_plus_one_threshold else None
+
+    def _histogram_lines(self, name: str, help_text: str, data: Dict[Tuple[str, str], Histogram]) -> List[str]:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (method, route), hist in sorted(data.items()):
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=_bound(bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {hist.sum}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {hist.count}")
+        return lines
+
+    def render(self) -> str:
+        with self._lock:
+            lines = self._histogram_lines(
+                "http_request_duration_seconds", "Request latency by route, including streamed bodies.", self.latency
+            )
+            lines += self._histogram_lines("http_response_size_bytes", "Response body size by route.", self.size)
+            lines += self._histogram_lines(
+                "http_request_db_statements", "SQL statements executed per request.", self.statements
+            )
+            lines += [
+                "# HELP http_request_db_seconds_total Time spent executing SQL, by route.",
+                "# TYPE http_request_db_seconds_total counter",
+            ]
+            lines += [
+                f"http_request_db_seconds_total{_labels(method=m, route=r)} {v}" for (m, r), v in sorted(self.db_seconds.items())
+            ]
+            lines += ["# HELP http_requests_total Requests by route and status.", "# TYPE http_requests_total counter"]
+            lines += [
+                f"http_requests_total{_labels(method=m, route=r, status=str(s))} {v}"
+                for (m, r, s), v in sorted(self.requests.items())
+            ]
+            lines += [
+                "# HELP http_request_errors_total Requests that ended in a 5xx or an unhandled exception.",
+                "# TYPE http_request_errors_total counter",
+            ]
+            lines += [f"http_request_errors_total{_labels(method=m, route=r)} {v}" for (m, r), v in sorted(self.errors.items())]
+            lines += [
+                "# HELP http_request_n_plus_one_total Requests that repeated one SQL statement N_PLUS_ONE_THRESHOLD+ times.",
+                "# TYPE http_request_n_plus_one_total counter",
+            ]
+            lines += [
+                f"http_request_n_plus_one_total{_labels(method=m, route=r)} {v}" for (m, r), v in sorted(self.n_plus_one.items())
+            ]
+            lines += ["# HELP http_requests_in_flight Requests currently being served.", "# TYPE http_requests_in_flight gauge"]
+            lines += [f"http_requests_in_flight{_labels(method=m)} {v}" for m, v in sorted(self.in_flight.items())]
+        return "\n".join(lines) + "\n"
+
+
+request_metrics = RequestMetrics(get_settings().n_plus_one_threshold)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request until its last body chunk and records it under its route template."""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+        self._route_paths: Optional[Dict[object, str]] = None
+
+    def _route(self, scope) -> str:
+        # El router deja el endpoint resuelto en el scope; se etiqueta con la plantilla, no con la ruta concreta
+        if self._route_paths is None:
+            self._route_paths = {
+                getattr(r, "endpoint", None): r.path for r in getattr(scope.get("app"), "routes", []) if hasattr(r, "path")
+            }
+        return self._route_paths.get(scope.get("endpoint"), "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        db = DBStats()
+        token = _db_stats.set(db)
+        state = {"status": 500, "size": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["size"] += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.start(method)
+        start = time.perf_counter()
+        failed = False
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _db_stats.reset(token)
+            status = state["status"]
+            self.metrics.finish(
+                method,
+                self._route(scope),
+                status,
+                time.perf_counter() - start,
+                state["size"],
+                db,
+                failed or status >= 500,
+            )
@@ -3,21 +3,35 @@ from __future__ import annotations
 from datetime import datetime
 
 from sqlalchemy import (
+    DDL,
     JSON,
+    BigInteger,
     Boolean,
     CheckConstraint,
     Column,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
+    event,
+    func,
+    text,
 )
 from sqlalchemy.orm import relationship
 
 from .db import Base
 
+# Los índices GiST (sensor_id/cable_id + rango) necesitan btree_gist; en SQLite no se crean.
+# Las columnas ORM son timestamp sin zona, por eso el rango es tsrange (tstzrange no sería IMMUTABLE).
+event.listen(
+    Base.metadata,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist").execute_if(dialect="postgresql"),
+)
+
 
 class User(Base):
     __tablename__ = "users"
@@ -68,6 +82,11 @@ class Cable(Base):
     bridge = relationship("Bridge", back_populates="cables")
     states = relationship("CableStateVersion", back_populates="cable")
 
+    __table_args__ = (
+        # Solo acceso por (puente, nombre); la unicidad la impone schema.sql, no create_all
+        Index("idx_cables_bridge_nombre", "bridge_id", "nombre_en_puente"),
+    )
+
 
 class CableStateVersion(Base):
     __tablename__ = "cable_state_versions"
@@ -100,6 +119,7 @@ class CableStateVersion(Base):
 
     __table_args__ = (
         CheckConstraint("strands_active <= strands_total", name="chk_strands_active_total_orm"),
+        Index("idx_cable_state_versions_cable_valid_from", "cable_id", "valid_from"),
     )
 
 
@@ -127,6 +147,17 @@ class SensorInstallation(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     created_by_user_id = Column(Integer, ForeignKey("users.id"))
 
+    __table_args__ = (
+        Index("idx_sensor_installations_sensor_from", "sensor_id", "installed_from"),
+        Index("idx_sensor_installations_cable", "cable_id"),
+        Index(
+            "idx_sensor_installations_no_overlap",
+            "sensor_id",
+            func.tsrange(installed_from, func.coalesce(installed_to, text("'infinity'"))),
+            postgresql_using="gist",
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Acquisition(Base):
     __tablename__ = "acquisitions"
@@ -139,6 +170,11 @@ class Acquisition(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     created_by_user_id = Column(Integer, ForeignKey("users.id"))
 
+    __table_args__ = (
+        Index("idx_acquisitions_bridge_acquired_at", "bridge_id", "acquired_at"),
+        Index("idx_acquisitions_acquired_at", "acquired_at"),
+    )
+
 
 class RawFile(Base):
     __tablename__ = "raw_files"
@@ -152,6 +188,10 @@ class RawFile(Base):
     parser_version = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("idx_raw_files_acq_kind_created", "acquisition_id", "file_kind", "created_at"),
+    )
+
 
 class AcquisitionChannel(Base):
     __tablename__ = "acquisition_channels"
@@ -164,6 +204,27 @@ class AcquisitionChannel(Base):
     status_flag = Column(String, nullable=False)
     notes = Column(Text)
 
+    __table_args__ = (
+        Index("idx_acquisition_channels_acquisition", "acquisition_id"),
+    )
+
+
+class ChannelMappingTemplate(Base):
+    """Mapeo de normalize guardado por puente (lista de csv_column_name, sensor_id, cable_id, height_m)."""
+
+    __tablename__ = "channel_mapping_templates"
+    id = Column(Integer, primary_key=True)
+    bridge_id = Column(Integer, ForeignKey("bridges.id"), nullable=False)
+    nombre = Column(String, nullable=False)
+    mapping_json = Column(JSON, nullable=False)
+    notes = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"))
+
+    __table_args__ = (
+        Index("uq_channel_mapping_template_nombre", "bridge_id", "nombre", unique=True),
+    )
+
 
 class WeighingCampaign(Base):
     __tablename__ = "weighing_campaigns"
@@ -228,6 +289,16 @@ class KCalibration(Base):
     computed_by_user_id = Column(Integer, ForeignKey("users.id"))
     notes = Column(Text)
 
+    __table_args__ = (
+        Index("idx_k_calibrations_cable_valid_from", "cable_id", "valid_from"),
+        Index(
+            "idx_k_calibrations_no_overlap",
+            "cable_id",
+            func.tsrange(valid_from, func.coalesce(valid_to, text("'infinity'"))),
+            postgresql_using="gist",
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class AnalysisRun(Base):
     __tablename__ = "analysis_runs"
@@ -238,6 +309,10 @@ class AnalysisRun(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     notes = Column(Text)
 
+    __table_args__ = (
+        Index("idx_analysis_runs_acquisition", "acquisition_id"),
+    )
+
 
 class AnalysisRunParams(Base):
     __tablename__ = "analysis_run_params"
@@ -273,6 +348,11 @@ class AnalysisResult(Base):
     quality_flag = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (
+        Index("idx_analysis_results_run", "analysis_run_id"),
+        Index("idx_analysis_results_cable", "cable_id"),
+    )
+
 
 class AuditLog(Base):
     __tablename__ = "audit_log"
@@ -283,3 +363,34 @@ class AuditLog(Base):
     performed_by = Column(Integer, ForeignKey("users.id"))
     performed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     notes = Column(Text)
+
+
+class StorageScrubRun(Base):
+    """Una pasada del verificador de integridad de DATA_ROOT (app.scrub)."""
+
+    __tablename__ = "storage_scrub_runs"
+    id = Column(Integer, primary_key=True)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime)
+    status = Column(String, nullable=False, default="running")  # running | ok | issues | interrupted
+    files_checked = Column(Integer, nullable=False, default=0)
+    bytes_read = Column(BigInteger, nullable=False, default=0)
+    missing = Column(Integer, nullable=False, default=0)
+    corrupt = Column(Integer, nullable=False, default=0)
+    orphaned = Column(Integer, nullable=False, default=0)
+    notes = Column(Text)
+
+
+class StorageScrubFinding(Base):
+    __tablename__ = "storage_scrub_findings"
+    id = Column(Integer, primary_key=True)
+    scrub_run_id = Column(Integer, ForeignKey("storage_scrub_runs.id"), nullable=False)
+    kind = Column(String, nullable=False)  # missing | corrupt | orphaned
+    entity = Column(String)  # raw_file | weighing_attachment; NULL para huérfanos
+    entity_id = Column(Integer)
+    path = Column(String, nullable=False)
+    detail = Column(Text)
+
+    __table_args__ = (
+        Index("idx_storage_scrub_findings_run", "scrub_run_id"),
+    )
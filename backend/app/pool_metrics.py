@@ -0,0 +1,86 @@
+"""
+Connection pool instrumentation: checkout wait-time histogram and live pool state.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, List, Type
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+# Límites superiores (s) del histograma de espera por conexión
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float("inf"))
+
+
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.wait_counts: List[int] = [0] * len(WAIT_BUCKETS)
+        self.wait_sum = 0.0
+        self.checkouts = 0
+        self.timeouts = 0
+
+    def observe_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_sum += seconds
+            for idx, bound in enumerate(WAIT_BUCKETS):
+                if seconds <= bound:
+                    self.wait_counts[idx] += 1
+                    break
+
+    def observe_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool) -> Dict:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_sum": self.wait_sum,
+                "wait_histogram": {
+                    ("+Inf" if bound == float("inf") else str(bound)): count
+                    for bound, count in zip(WAIT_BUCKETS, self.wait_counts)
+                },
+            }
+        data["pool_class"] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_out=pool.checkedout(),
+                checked_in=pool.checkedin(),
+                overflow=pool.overflow(),
+                max_overflow=pool._max_overflow,
+                timeout=pool.timeout(),
+            )
+        return data
+
+
+def instrumented_queue_pool(stats: PoolStats, base: Type[Pool] = QueuePool):
+    """
+    Subclass of `base` (QueuePool, AsyncAdaptedQueuePool, NullPool...) that times every checkout;
+    the class attribute survives pool.recreate().
+    """
+
+    class InstrumentedQueuePool(base):
+        _stats = stats
+
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                self._stats.observe_timeout()
+                raise
+            self._stats.observe_wait(time.perf_counter() - start)
+            return conn
+
+    InstrumentedQueuePool.__name__ = InstrumentedQueuePool.__qualname__ = f"Instrumented{base.__name__}"
+    return InstrumentedQueuePool
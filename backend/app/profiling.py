@@ -0,0 +1,255 @@
+"""
+On-demand request profiling for admins.
+
+A request carrying `X-Profile: 1` (or `?profile=1`) and an admin bearer token
+runs its endpoint under cProfile and records every SQL statement with its
+duration. The result (top functions, SQL, raw pstats) is stored under
+DATA_ROOT/profiles and served by GET /profiles/{profile_id}; the response
+carries the id in `X-Profile-Id`.
+
+Requests without the flag only pay one header lookup in the middleware and one
+ContextVar read in the endpoint wrapper; the SQL hooks are installed the first
+time a profile is requested. cProfile follows the endpoint only: sync handlers
+are profiled on their worker thread, async handlers on the event loop (where
+other tasks running concurrently may show up). Streamed bodies produced after
+the endpoint returns are not included.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import pstats
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+from starlette.routing import request_response
+
+from .auth_cache import token_cache, user_cache
+from .db import SessionLocal
+from .models import User
+
+PROFILE_ID_RE = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+TOP_FUNCTIONS = 40
+
+
+@dataclass
+class RequestProfile:
+    profile_id: str
+    profiler: cProfile.Profile = field(default_factory=cProfile.Profile)
+    sql: List[Dict] = field(default_factory=list)
+
+
+_active: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("request_profile", default=None)
+_hooks_lock = threading.Lock()
+_hooks_installed = False
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active.get()
+    starts = conn.info.get("profile_query_start")
+    if profile is None or not starts:
+        return
+    profile.sql.append(
+        {"statement": statement, "seconds": time.perf_counter() - starts.pop(), "executemany": executemany}
+    )
+
+
+def _install_sql_hooks() -> None:
+    global _hooks_installed
+    with _hooks_lock:
+        if not _hooks_installed:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            _hooks_installed = True
+
+
+def profiled(func):
+    """Wraps an endpoint so it runs under the request's profiler when one is active."""
+    if asyncio.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            profile = _active.get()
+            if profile is None:
+                return await func(*args, **kwargs)
+            profile.profiler.enable()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profile.profiler.disable()
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        profile.profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.profiler.disable()
+
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    """APIRoute whose endpoint call goes through `profiled`; signature and dependencies are untouched."""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        self.dependant.call = profiled(self.dependant.call)
+        self.app = request_response(self.get_route_handler())
+
+
+class ProfileStore:
+    def __init__(self, root: Path, keep: int = 200):
+        self.root = root
+        self.keep = keep
+
+    def path(self, profile_id: str, suffix: str = ".json") -> Optional[Path]:
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        return self.root / f"{profile_id}{suffix}"
+
+    def save(self, profile: RequestProfile, meta: Dict) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        stats = pstats.Stats(profile.profiler, stream=io.StringIO())
+        stats.dump_stats(str(self.path(profile.profile_id, ".prof")))
+        rows = []
+        for (filename, line, name), (cc, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append(
+                {
+                    "function": f"{filename}:{line}({name})",
+                    "ncalls": ncalls,
+                    "primitive_calls": cc,
+                    "tottime": tottime,
+                    "cumtime": cumtime,
+                }
+            )
+        rows.sort(key=lambda r: r["cumtime"], reverse=True)
+        by_statement: Dict[str, Dict] = {}
+        for q in profile.sql:
+            agg = by_statement.setdefault(q["statement"], {"statement": q["statement"], "count": 0, "seconds": 0.0})
+            agg["count"] += 1
+            agg["seconds"] += q["seconds"]
+        document = {
+            **meta,
+            "profile_id": profile.profile_id,
+            "top_functions": rows[:TOP_FUNCTIONS],
+            "sql_total_seconds": sum(q["seconds"] for q in profile.sql),
+            "sql_statements": profile.sql,
+            "sql_by_statement": sorted(by_statement.values(), key=lambda a: a["seconds"], reverse=True),
+        }
+        self.path(profile.profile_id).write_text(json.dumps(document, default=str))
+        self._prune()
+
+    def _prune(self) -> None:
+        documents = sorted(self.root.glob("*.json"))
+        for old in documents[: max(0, len(documents) - self.keep)]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".prof").unlink(missing_ok=True)
+
+    def list(self) -> List[Dict]:
+        items = []
+        for doc in sorted(self.root.glob("*.json"), reverse=True):
+            data = json.loads(doc.read_text())
+            items.append({k: data.get(k) for k in ("profile_id", "method", "path", "status", "seconds", "created_at")})
+        return items
+
+    def load(self, profile_id: str) -> Optional[Dict]:
+        path = self.path(profile_id)
+        if path is None or not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+
+def _profile_requested(scope) -> bool:
+    for key, value in scope["headers"]:
+        if key == b"x-profile":
+            return value.strip().lower() in (b"1", b"true", b"yes")
+    query = scope.get("query_string", b"")
+    if b"profile=" not in query:
+        return False
+    return any(part in (b"profile=1", b"profile=true") for part in query.split(b"&"))
+
+
+def _is_admin(scope) -> bool:
+    auth = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = auth.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        user_id = int(token_cache.decode(token).get("sub"))
+    except Exception:
+        return False
+
+    def load(uid: int):
+        with SessionLocal() as db:
+            return db.get(User, uid)
+
+    user = user_cache.get(user_id, load)
+    return user is not None and user.role == "admin"
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, store: ProfileStore):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if not await run_in_threadpool(_is_admin, scope):
+            await JSONResponse({"detail": "Profiling requires an admin token"}, status_code=403)(scope, receive, send)
+            return
+
+        _install_sql_hooks()
+        profile = RequestProfile(profile_id=f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}")
+        state = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.profile_id.encode())
+                ]
+            await send(message)
+
+        token = _active.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _active.reset(token)
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": state["status"],
+                "seconds": time.perf_counter() - start,
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            await run_in_threadpool(self.store.save, profile, meta)
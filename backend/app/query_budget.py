@@ -0,0 +1,112 @@
+"""
+Statement counting for N+1 detection and query budgets.
+
+`count_queries()` records every SQL statement executed inside a block and
+groups them by shape (literals and IN-lists collapsed), so a loop issuing the
+same SELECT per row stands out. `query_budget(n)` turns that into an assertion:
+
+    with query_budget(3):
+        client.get(f"/bridges/{bridge_id}/semaforo", params={"acquisition_id": acq_id})
+
+By default a block only sees statements run in its own context (including the
+threadpool and async sessions it awaits). `all_threads=True` counts every
+statement on every engine, which is what tests need when the app runs in the
+TestClient's portal thread.
+"""
+from __future__ import annotations
+
+import contextvars
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*(?:\?|%\([^)]*\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\([^)]*\)s|\$\d+|:\w+))*\s*\)")
+
+
+def statement_shape(statement: str) -> str:
+    """Normalizes a statement so per-row variants of the same query compare equal."""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _LITERALS.sub("?", shape)
+    return _PLACEHOLDER_LISTS.sub("(?)", shape)
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, statement: str) -> None:
+        with self._lock:
+            self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Counter:
+        return Counter(statement_shape(s) for s in self.statements)
+
+    def repeated(self, threshold: int = 2) -> Dict[str, int]:
+        """Statement shapes executed at least `threshold` times (the N+1 suspects)."""
+        return {shape: n for shape, n in self.shapes().most_common() if n >= threshold}
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements"]
+        lines += [f"  {n:>4} x {shape[:200]}" for shape, n in self.shapes().most_common()]
+        return "\n".join(lines)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_context_logs: contextvars.ContextVar[Tuple[QueryLog, ...]] = contextvars.ContextVar("query_logs", default=())
+_global_logs: List[QueryLog] = []
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    for log in _context_logs.get():
+        log.add(statement)
+    for log in _global_logs:
+        log.add(statement)
+
+
+@contextmanager
+def count_queries(all_threads: bool = False) -> Iterator[QueryLog]:
+    log = QueryLog()
+    if all_threads:
+        _global_logs.append(log)
+        try:
+            yield log
+        finally:
+            _global_logs.remove(log)
+        return
+    token = _context_logs.set(_context_logs.get() + (log,))
+    try:
+        yield log
+    finally:
+        _context_logs.reset(token)
+
+
+@contextmanager
+def query_budget(
+    max_queries: int, max_repeats: Optional[int] = None, all_threads: bool = True
+) -> Iterator[QueryLog]:
+    """Fails with QueryBudgetExceeded when the block runs more than `max_queries` statements,
+    or (with `max_repeats`) any single statement shape more than `max_repeats` times."""
+    with count_queries(all_threads=all_threads) as log:
+        yield log
+    if log.count > max_queries:
+        raise QueryBudgetExceeded(f"Query budget {max_queries} exceeded: {log.report()}")
+    if max_repeats is not None:
+        repeated = log.repeated(max_repeats + 1)
+        if repeated:
+            raise QueryBudgetExceeded(f"Statement repeated more than {max_repeats} times: {log.report()}")
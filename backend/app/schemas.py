@@ -109,6 +109,48 @@ class AcquisitionOut(AcquisitionCreate):
         orm_mode = True
 
 
+class ChannelMappingItem(BaseModel):
+    csv_column_name: str
+    sensor_id: int
+    cable_id: int
+    height_m: float = Field(..., gt=0)
+
+
+class MappingTemplateCreate(BaseModel):
+    nombre: str
+    mapping: List[ChannelMappingItem] = Field(..., min_items=1)
+    notes: Optional[str]
+
+
+class MappingTemplateOut(BaseModel):
+    id: int
+    bridge_id: int
+    nombre: str
+    mapping: List[ChannelMappingItem]
+    notes: Optional[str]
+    created_at: datetime
+
+
+class MappingTemplateApply(BaseModel):
+    acquisition_ids: List[int] = Field(..., min_items=1, max_items=500)
+    parser_version: str
+
+
+class MappingTemplateApplyItem(BaseModel):
+    acquisition_id: int
+    status: str  # ok | error
+    normalized_file_id: Optional[int]
+    channels_created: int = 0
+    detail: Optional[str]
+
+
+class MappingTemplateApplyResult(BaseModel):
+    template_id: int
+    normalized: int
+    errors: int
+    results: List[MappingTemplateApplyItem]
+
+
 class WeighingCampaignCreate(BaseModel):
     bridge_id: int
     performed_at: datetime
@@ -180,6 +222,27 @@ class SemaforoResponse(BaseModel):
     top_n: Optional[int] = None
 
 
+class SemaforoTimelineAcquisition(BaseModel):
+    id: int
+    acquired_at: datetime
+
+
+class SemaforoTimelineCable(BaseModel):
+    id: int
+    nombre_en_puente: str
+
+
+class SemaforoTimelineResponse(BaseModel):
+    bridge_id: int
+    acquisitions: List[SemaforoTimelineAcquisition]
+    cables: List[SemaforoTimelineCable]
+    # Matrices acquisitions x cables; None where the cable has no result
+    pct_fu: List[List[Optional[float]]]
+    estado: List[List[Optional[str]]]
+    exceden: List[int]
+    alert_pct: float
+
+
 class HistoryItem(BaseModel):
     cable_id: int
     nombre_en_puente: str
@@ -192,9 +255,30 @@ class HistoryItem(BaseModel):
     quality_flag: str
 
 
+class HistoryBucket(BaseModel):
+    cable_id: int
+    nombre_en_puente: str
+    bucket_start: datetime
+    count: int
+    tension_tf_min: float
+    tension_tf_mean: float
+    tension_tf_max: float
+    f0_hz_min: float
+    f0_hz_mean: float
+    f0_hz_max: float
+
+
+class HistoryCursor(BaseModel):
+    after_acquired_at: datetime
+    after_id: int
+
+
 class HistoryResponse(BaseModel):
     results: List[HistoryItem]
     k_calibrations: Optional[List[KCalibrationOut]] = None
+    next_cursor: Optional[HistoryCursor] = None
+    bucket: Optional[str] = None
+    buckets: Optional[List[HistoryBucket]] = None
 
 
 class CableStateVersionCreate(BaseModel):
@@ -314,3 +398,105 @@ class KCalibrationOut(KCalibrationCreate):
 
     class Config:
         orm_mode = True
+
+
+HistoryResponse.update_forward_refs()
+
+
+class CatalogImportState(BaseModel):
+    valid_from: datetime
+    valid_to: Optional[datetime]
+    length_effective_m: float
+    length_total_m: Optional[float] = None
+    strands_total: int
+    strands_active: int
+    strands_inactive: Optional[int] = 0
+    # Tipo de torón por id o por nombre del catálogo
+    strand_type_id: Optional[int]
+    strand_type_nombre: Optional[str]
+    diametro_mm: float
+    area_mm2: float
+    E_MPa: float
+    mu_total_kg_m: float
+    mu_active_basis_kg_m: float
+    design_tension_tf: float
+    Fu_override: Optional[float]
+    antivandalic_enabled: bool = False
+    antivandalic_length_m: Optional[float]
+    source: Optional[str]
+    notes: Optional[str]
+
+
+class CatalogImportCable(BaseModel):
+    nombre_en_puente: str
+    notas: Optional[str]
+    states: List[CatalogImportState] = []
+
+
+class CatalogImportInstallation(BaseModel):
+    sensor_serial: str
+    cable_nombre: str
+    installed_from: datetime
+    installed_to: Optional[datetime]
+    height_m: float
+    mounting_details: Optional[str]
+    notes: Optional[str]
+
+
+class CatalogImport(BaseModel):
+    bridge: BridgeCreate
+    cables: List[CatalogImportCable] = []
+    sensors: List[SensorCreate] = []
+    installations: List[CatalogImportInstallation] = []
+
+
+class CatalogImportResult(BaseModel):
+    bridge_id: int
+    cables: int
+    states: int
+    sensors: int
+    installations: int
+
+
+class StorageScrubFindingOut(BaseModel):
+    kind: str
+    entity: Optional[str]
+    entity_id: Optional[int]
+    path: str
+    detail: Optional[str]
+
+    class Config:
+        orm_mode = True
+
+
+class StorageScrubRunOut(BaseModel):
+    id: int
+    started_at: datetime
+    finished_at: Optional[datetime]
+    status: str
+    files_checked: int
+    bytes_read: int
+    missing: int
+    corrupt: int
+    orphaned: int
+    notes: Optional[str]
+    findings: Optional[List[StorageScrubFindingOut]]
+
+    class Config:
+        orm_mode = True
+
+
+class SignalWindowOut(BaseModel):
+    acquisition_id: int
+    cable_id: int
+    column: str
+    normalized_file_id: int
+    fs_hz: Optional[float]
+    method: str
+    t_start: Optional[float]
+    t_end: Optional[float]
+    rows_read: int
+    points_in_window: int
+    rows_per_point: int = 1  # >1: servido desde la pirámide min/max (filas por bucket)
+    t: List[float]
+    y: List[Optional[float]]
@@ -0,0 +1,302 @@
+"""
+Storage integrity scrub: re-hashes the files under DATA_ROOT against the database.
+
+Usage (against DATABASE_URL / DATA_ROOT):
+    python -m app.scrub --workers 4 --max-mb-per-s 150 --report scrub.json
+
+Every raw_files and weighing_attachments row is checked: the file must exist, its
+original content must hash to the recorded sha256 and, for raw_files, have the recorded
+size. Only files that write_stored compressed (codec suffix, see app.storage) are
+decompressed; attachments are stored as uploaded and hashed byte for byte, even when the
+upload is itself a .gz. Files under {raw,normalized,attachments} of DATA_ROOT and of
+ARCHIVE_ROOT (e.g. an archive copy left by a tiering run that crashed before its commit)
+that no row points to are reported as orphaned. Nothing is deleted or repaired.
+
+Files are read by a small thread pool (hashing and zlib release the GIL) with a bounded
+number of files in flight, and all reads share one token bucket of --max-mb-per-s of disk
+bytes, so a nightly run leaves I/O for the API. Rows are streamed by id, never loaded at once.
+The run and its findings are stored in storage_scrub_runs / storage_scrub_findings.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from .models import RawFile, StorageScrubFinding, StorageScrubRun, WeighingAttachment
+from .storage import CHUNK_SIZE, SIDECAR_SUFFIXES, archive_root, open_stored
+
+STORAGE_SUBDIRS = ("raw", "normalized", "attachments")
+ROW_CHUNK = 1000
+
+
+@dataclass
+class StoredFile:
+    entity: str  # raw_file | weighing_attachment
+    entity_id: int
+    path: str
+    sha256: Optional[str]
+    size: Optional[int]
+
+
+@dataclass
+class Finding:
+    kind: str  # missing | corrupt | orphaned
+    path: str
+    entity: Optional[str] = None
+    entity_id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+@dataclass
+class ScrubReport:
+    files_checked: int = 0
+    bytes_read: int = 0
+    findings: List[Finding] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def count(self, kind: str) -> int:
+        return sum(f.kind == kind for f in self.findings)
+
+    def to_dict(self) -> Dict:
+        counts = {kind: self.count(kind) for kind in ("missing", "corrupt", "orphaned")}
+        return {**asdict(self), **counts}
+
+
+class RateLimiter:
+    """Token bucket shared by all reader threads; `bytes_per_second` <= 0 disables it."""
+
+    def __init__(self, bytes_per_second: float, burst_seconds: float = 1.0):
+        self.rate = bytes_per_second
+        self.capacity = max(bytes_per_second * burst_seconds, CHUNK_SIZE)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= n
+            wait_s = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait_s:
+            time.sleep(wait_s)
+
+
+class _ThrottledReader:
+    """Read-only file wrapper that charges every read to the limiter and counts disk bytes."""
+
+    def __init__(self, fh, limiter: RateLimiter):
+        self._fh = fh
+        self._limiter = limiter
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fh.read(size)
+        self.bytes_read += len(data)
+        self._limiter.acquire(len(data))
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        self._fh.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._fh.closed
+
+
+def _resolve(path: str | Path) -> str:
+    return str(Path(path).resolve())
+
+
+def stored_files(db: Session) -> Iterator[StoredFile]:
+    """All rows that point to a stored file, streamed in id order."""
+    for row in db.execute(
+        select(RawFile.id, RawFile.storage_path, RawFile.sha256, RawFile.file_size_bytes).order_by(RawFile.id)
+    ).yield_per(ROW_CHUNK):
+        yield StoredFile("raw_file", row.id, row.storage_path, row.sha256, row.file_size_bytes)
+    for row in db.execute(
+        select(WeighingAttachment.id, WeighingAttachment.storage_path, WeighingAttachment.sha256).order_by(
+            WeighingAttachment.id
+        )
+    ).yield_per(ROW_CHUNK):
+        yield StoredFile("weighing_attachment", row.id, row.storage_path, row.sha256, None)
+
+
+def verify_file(entry: StoredFile, limiter: RateLimiter) -> tuple[int, Optional[Finding]]:
+    """(disk bytes read, finding or None) for one stored file."""
+    path = Path(entry.path)
+    if not path.is_file():
+        return 0, Finding("missing", entry.path, entry.entity, entry.entity_id)
+    hasher = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as raw:
+        reader = _ThrottledReader(raw, limiter)
+        try:
+            # Los adjuntos nunca se comprimen: un adjunto .gz heredado (sin la marca .plain) se hashea tal cual
+            stream = reader if entry.entity == "weighing_attachment" else open_stored(path, reader)
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                size += len(chunk)
+        except (OSError, EOFError, zlib.error) as exc:
+            detail = f"no se pudo leer/descomprimir: {exc}"
+            return reader.bytes_read, Finding("corrupt", entry.path, entry.entity, entry.entity_id, detail)
+        except RuntimeError as exc:  # zstd sin el paquete zstandard
+            return reader.bytes_read, Finding("corrupt", entry.path, entry.entity, entry.entity_id, str(exc))
+    if entry.sha256 and hasher.hexdigest() != entry.sha256:
+        detail = f"sha256 {hasher.hexdigest()} != {entry.sha256}"
+        return reader.bytes_read, Finding("corrupt", entry.path, entry.entity, entry.entity_id, detail)
+    if entry.size is not None and size != entry.size:
+        detail = f"tamaño {size} != {entry.size}"
+        return reader.bytes_read, Finding("corrupt", entry.path, entry.entity, entry.entity_id, detail)
+    return reader.bytes_read, None
+
+
+def find_orphans(root: Path, known: Set[str], subdirs: Sequence[str] = STORAGE_SUBDIRS) -> List[Finding]:
+    """
+    Files under the storage subdirectories of `root` that no row points to (temporary .*.tmp files are
+    ignored; sidecars such as row indexes count as orphaned only if their file is).
+    """
+    orphans = []
+    for subdir in subdirs:
+        base = root / subdir
+        if not base.is_dir():
+            continue
+        for path in sorted(base.rglob("*")):
+            if not path.is_file() or path.name.startswith("."):
+                continue
+            owner = next((str(path)[: -len(s)] for s in SIDECAR_SUFFIXES if path.name.endswith(s)), str(path))
+            if _resolve(owner) not in known:
+                orphans.append(Finding("orphaned", str(path)))
+    return orphans
+
+
+def scrub(
+    db: Session,
+    data_root: Path,
+    workers: int = 4,
+    max_bytes_per_second: float = 0,
+    check_orphans: bool = True,
+) -> ScrubReport:
+    """
+    Verifies every stored file with `workers` threads and at most 2·workers files in flight.
+    Does not write to the database; see `record_scrub`.
+    """
+    start = time.perf_counter()
+    report = ScrubReport()
+    limiter = RateLimiter(max_bytes_per_second)
+    known: Set[str] = set()
+    in_flight: Set[Future] = set()
+
+    def collect(done) -> None:
+        for future in done:
+            read, finding = future.result()
+            report.files_checked += 1
+            report.bytes_read += read
+            if finding:
+                report.findings.append(finding)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="scrub") as pool:
+        for entry in stored_files(db):
+            known.add(_resolve(entry.path))
+            if len(in_flight) >= 2 * max(1, workers):
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(pool.submit(verify_file, entry, limiter))
+        collect(wait(in_flight).done)
+    if check_orphans:
+        roots: Dict[Path, Path] = {}
+        for root in (data_root, archive_root()):
+            roots.setdefault(root.resolve(), root)
+        for root in roots.values():
+            report.findings.extend(find_orphans(root, known))
+    report.findings.sort(key=lambda f: (f.kind, f.path))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def record_scrub(db: Session, report: ScrubReport, started_at: datetime, notes: Optional[str] = None) -> StorageScrubRun:
+    """Stores the run summary and its findings in one commit."""
+    run = StorageScrubRun(
+        started_at=started_at,
+        finished_at=datetime.utcnow(),
+        status="issues" if report.findings else "ok",
+        files_checked=report.files_checked,
+        bytes_read=report.bytes_read,
+        missing=report.count("missing"),
+        corrupt=report.count("corrupt"),
+        orphaned=report.count("orphaned"),
+        notes=notes,
+    )
+    db.add(run)
+    db.flush()
+    if report.findings:
+        db.execute(
+            insert(StorageScrubFinding),
+            [
+                dict(scrub_run_id=run.id, kind=f.kind, entity=f.entity, entity_id=f.entity_id, path=f.path, detail=f.detail)
+                for f in report.findings
+            ],
+        )
+    db.commit()
+    return run
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica sha256 y existencia de los archivos de DATA_ROOT.")
+    parser.add_argument("--workers", type=int, default=4, help="Hilos de lectura (archivos en vuelo: 2×)")
+    parser.add_argument("--max-mb-per-s", type=float, default=0, help="Límite de lectura de disco (0: sin límite)")
+    parser.add_argument("--no-orphans", action="store_true", help="No buscar archivos sin registro")
+    parser.add_argument("--nice", type=int, default=10, help="Incremento de niceness del proceso (0: sin cambio)")
+    parser.add_argument("--report", type=Path, help="Guardar el reporte JSON")
+    args = parser.parse_args(argv)
+
+    from .config import get_settings
+    from .db import BatchSessionLocal
+
+    if args.nice and hasattr(os, "nice"):
+        os.nice(args.nice)
+    started_at = datetime.utcnow()
+    with BatchSessionLocal() as db:
+        report = scrub(
+            db, Path(get_settings().data_root), args.workers, args.max_mb_per_s * 1024 * 1024, not args.no_orphans
+        )
+        # Se lee el id dentro de la sesión: al cerrarla la corrida queda desligada
+        run_id = record_scrub(db, report, started_at).id
+
+    for f in report.findings:
+        print(f"{f.kind:<10} {f.entity or '-'}:{f.entity_id or '-'}  {f.path}" + (f"  ({f.detail})" if f.detail else ""))
+    mb = report.bytes_read / (1024 * 1024)
+    print(
+        f"Corrida {run_id}: {report.files_checked} archivos, {mb:.1f} MB en {report.seconds:.1f}s; "
+        f"{report.count('missing')} faltantes, {report.count('corrupt')} corruptos, {report.count('orphaned')} huérfanos"
+    )
+    if args.report:
+        args.report.write_text(json.dumps(report.to_dict(), indent=2, default=str))
+    return 1 if report.findings else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
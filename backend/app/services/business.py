@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Iterable, List, Optional, Sequence
 
+ALERT_PCT_FU = 45.0
+
 
 @dataclass(frozen=True)
 class CableStateVersion:
@@ -119,3 +121,24 @@ def validate_k_no_overlap(calibrations: Iterable[KCalibration], new_one: KCalibr
         end_b = new_one.valid_to or datetime.max
         if start_a < end_b and start_b < end_a:
             raise ValueError("Overlapping K calibration validity range for this cable")
+
+
+def validate_states_no_overlap(states: Iterable[CableStateVersion]) -> None:
+    """
+    Ensures the state versions of each cable do not overlap and at most one is open.
+    Closed-open intervals [valid_from, valid_to or infinity).
+    Raises ValueError on overlap.
+    """
+    by_cable: dict = {}
+    for state in states:
+        by_cable.setdefault(state.cable_id, []).append(state)
+
+    for cable_id, cable_states in by_cable.items():
+        sorted_states = sorted(cable_states, key=lambda s: s.valid_from)
+        for current, nxt in zip(sorted_states, sorted_states[1:]):
+            # Open-ended versions overlap anything that starts later
+            if current.valid_to is None or nxt.valid_from < current.valid_to:
+                raise ValueError(
+                    f"Cable {cable_id} has overlapping state versions starting "
+                    f"{current.valid_from} and {nxt.valid_from}"
+                )
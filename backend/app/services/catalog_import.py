@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import csv
+import io
+import zipfile
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import schemas
+from app.audit import log_action
+from app.models import Bridge, Cable, CableStateVersion, Sensor, SensorInstallation, StrandType
+from app.services import business
+
+CSV_SHEETS = ("bridge", "cables", "states", "sensors", "installations")
+
+
+class CatalogImportError(ValueError):
+    """Validation failed; `errors` lists every problem found in the catalog."""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def _utc_naive(value: datetime | None) -> datetime | None:
+    # Solo para comparar: SQLite devuelve naive y el payload puede traer zona
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _read_sheet(bundle: zipfile.ZipFile, name: str) -> List[Dict[str, str]]:
+    matches = [n for n in bundle.namelist() if n.rsplit("/", 1)[-1].lower() == f"{name}.csv"]
+    if not matches:
+        return []
+    text = bundle.read(matches[0]).decode("utf-8-sig")
+    return [{k.strip(): (v.strip() or None) for k, v in row.items() if k} for row in csv.DictReader(io.StringIO(text))]
+
+
+def parse_csv_bundle(content: bytes) -> schemas.CatalogImport:
+    """
+    Reads a zip with bridge.csv (one row), cables.csv, states.csv, sensors.csv and installations.csv.
+    states.csv references its cable by a `cable_nombre` column; installations use sensor_serial/cable_nombre.
+    """
+    try:
+        bundle = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        raise CatalogImportError(["El bundle CSV debe ser un archivo zip"])
+    with bundle:
+        sheets = {name: _read_sheet(bundle, name) for name in CSV_SHEETS}
+    if len(sheets["bridge"]) != 1:
+        raise CatalogImportError(["bridge.csv debe tener exactamente una fila"])
+
+    cables: Dict[str, Dict] = {}
+    lines: Dict[str, int] = {}
+    errors = []
+    for line, row in enumerate(sheets["cables"], start=2):  # línea 1: encabezado
+        name = row.get("nombre_en_puente")
+        if name in cables:
+            errors.append(f"cables.csv línea {line}: tirante {name} repetido (ya en línea {lines[name]})")
+            continue
+        cables[name] = {**row, "states": []}
+        lines[name] = line
+    for row in sheets["states"]:
+        cable_name = row.pop("cable_nombre", None)
+        if cable_name not in cables:
+            errors.append(f"states.csv: tirante {cable_name} no está en cables.csv")
+            continue
+        cables[cable_name]["states"].append(row)
+    if errors:
+        raise CatalogImportError(errors)
+    return schemas.CatalogImport.parse_obj(
+        {
+            "bridge": sheets["bridge"][0],
+            "cables": list(cables.values()),
+            "sensors": sheets["sensors"],
+            "installations": sheets["installations"],
+        }
+    )
+
+
+def validate_catalog(db: Session, payload: schemas.CatalogImport) -> Dict[str, Dict]:
+    """
+    Validates the whole catalog in memory with a handful of lookups.
+    Returns the resolved strand types per (cable, state index) and existing sensor ids by serial.
+    Raises CatalogImportError listing every problem.
+    """
+    errors: List[str] = []
+    if db.query(Bridge.id).filter(Bridge.nombre == payload.bridge.nombre).first():
+        errors.append(f"Ya existe un puente llamado {payload.bridge.nombre}")
+
+    cable_names = [c.nombre_en_puente for c in payload.cables]
+    duplicated = sorted({n for n in cable_names if cable_names.count(n) > 1})
+    if duplicated:
+        errors.append(f"Tirantes repetidos: {', '.join(duplicated)}")
+
+    strand_types = db.query(StrandType.id, StrandType.nombre, StrandType.Fu_default).all()
+    by_id = {st.id: st for st in strand_types}
+    by_name = {st.nombre: st for st in strand_types}
+    resolved_strands: Dict[tuple, int] = {}
+    state_rules: List[business.CableStateVersion] = []
+    for cable in payload.cables:
+        for idx, state in enumerate(cable.states):
+            where = f"{cable.nombre_en_puente} estado #{idx + 1}"
+            st = by_id.get(state.strand_type_id) if state.strand_type_id else by_name.get(state.strand_type_nombre)
+            if not st:
+                errors.append(f"{where}: tipo de torón no encontrado")
+            else:
+                resolved_strands[(cable.nombre_en_puente, idx)] = st.id
+            if state.valid_to and state.valid_to <= state.valid_from:
+                errors.append(f"{where}: valid_to must be greater than valid_from")
+            if state.strands_active > state.strands_total:
+                errors.append(f"{where}: strands_active must be <= strands_total")
+            if state.antivandalic_enabled and not state.antivandalic_length_m:
+                errors.append(f"{where}: antivandalic_length_m required when antivandalic_enabled")
+            state_rules.append(
+                business.CableStateVersion(
+                    cable_id=cable.nombre_en_puente,
+                    valid_from=_utc_naive(state.valid_from),
+                    valid_to=_utc_naive(state.valid_to),
+                    length_effective_m=state.length_effective_m,
+                    strands_active=state.strands_active,
+                    strands_total=state.strands_total,
+                    fu_override=state.Fu_override,
+                    strand_type_fu_default=st.Fu_default if st else 0.0,
+                )
+            )
+    try:
+        business.validate_states_no_overlap(state_rules)
+    except ValueError as exc:
+        errors.append(str(exc))
+
+    serials = [s.serial_or_asset_id for s in payload.sensors]
+    duplicated = sorted({s for s in serials if serials.count(s) > 1})
+    if duplicated:
+        errors.append(f"Sensores repetidos: {', '.join(duplicated)}")
+    referenced = set(serials) | {inst.sensor_serial for inst in payload.installations}
+    existing_sensors = dict(
+        db.query(Sensor.serial_or_asset_id, Sensor.id).filter(Sensor.serial_or_asset_id.in_(referenced)).all()
+    )
+    for serial in serials:
+        if serial in existing_sensors:
+            errors.append(f"El sensor {serial} ya existe en el catálogo")
+
+    installations: List[business.SensorInstallation] = []
+    if existing_sensors:
+        serial_by_id = {sid: serial for serial, sid in existing_sensors.items()}
+        for inst in db.query(SensorInstallation).filter(SensorInstallation.sensor_id.in_(serial_by_id)).all():
+            installations.append(
+                business.SensorInstallation(
+                    serial_by_id[inst.sensor_id], f"#{inst.cable_id}", _utc_naive(inst.installed_from), _utc_naive(inst.installed_to)
+                )
+            )
+    known_cables = set(cable_names)
+    for idx, inst in enumerate(payload.installations):
+        where = f"Instalación #{idx + 1} ({inst.sensor_serial} -> {inst.cable_nombre})"
+        if inst.cable_nombre not in known_cables:
+            errors.append(f"{where}: tirante no incluido en la importación")
+        if inst.sensor_serial not in existing_sensors and inst.sensor_serial not in serials:
+            errors.append(f"{where}: sensor desconocido")
+        if inst.installed_to and inst.installed_to <= inst.installed_from:
+            errors.append(f"{where}: installed_to must be greater than installed_from")
+        if inst.height_m <= 0:
+            errors.append(f"{where}: height_m must be > 0")
+        installations.append(
+            business.SensorInstallation(
+                inst.sensor_serial, inst.cable_nombre, _utc_naive(inst.installed_from), _utc_naive(inst.installed_to)
+            )
+        )
+    try:
+        business.validate_installations_no_overlap(installations)
+    except ValueError as exc:
+        errors.append(str(exc))
+
+    if errors:
+        raise CatalogImportError(errors)
+    return {"strand_types": resolved_strands, "existing_sensors": existing_sensors}
+
+
+def import_catalog(db: Session, payload: schemas.CatalogImport, user_id: int) -> schemas.CatalogImportResult:
+    """Validates and inserts the catalog with one bulk INSERT per table; the caller commits."""
+    resolved = validate_catalog(db, payload)
+
+    bridge_row = payload.bridge.dict()
+    if bridge_row.get("num_tirantes") is None:
+        bridge_row["num_tirantes"] = len(payload.cables)
+    bridge_id = db.execute(
+        insert(Bridge).values(**bridge_row, created_by_user_id=user_id).returning(Bridge.id)
+    ).scalar_one()
+    log_action(db, "bridge", bridge_id, "create", user_id, notes="bulk import")
+
+    cable_ids: Dict[str, int] = {}
+    if payload.cables:
+        rows = [
+            {"bridge_id": bridge_id, "nombre_en_puente": c.nombre_en_puente, "notas": c.notas, "created_by_user_id": user_id}
+            for c in payload.cables
+        ]
+        result = db.execute(
+            insert(Cable).returning(Cable.id, Cable.nombre_en_puente), rows
+        )
+        cable_ids = {name: cid for cid, name in result}
+        for cid in cable_ids.values():
+            log_action(db, "cable", cid, "create", user_id, notes="bulk import")
+
+    state_rows = []
+    for cable in payload.cables:
+        for idx, state in enumerate(cable.states):
+            row = state.dict(exclude={"strand_type_nombre"})
+            row.update(
+                cable_id=cable_ids[cable.nombre_en_puente],
+                strand_type_id=resolved["strand_types"][(cable.nombre_en_puente, idx)],
+                strands_inactive=row["strands_inactive"] or 0,
+                created_by_user_id=user_id,
+            )
+            state_rows.append(row)
+    if state_rows:
+        result = db.execute(insert(CableStateVersion).returning(CableStateVersion.id), state_rows)
+        for (sid,) in result:
+            log_action(db, "cable_state_version", sid, "create", user_id, notes="bulk import")
+
+    sensor_ids = dict(resolved["existing_sensors"])
+    if payload.sensors:
+        rows = [{**s.dict(), "created_by_user_id": user_id} for s in payload.sensors]
+        result = db.execute(
+            insert(Sensor).returning(Sensor.id, Sensor.serial_or_asset_id), rows
+        )
+        for sid, serial in result:
+            sensor_ids[serial] = sid
+            log_action(db, "sensor", sid, "create", user_id, notes="bulk import")
+
+    if payload.installations:
+        rows = [
+            {
+                "sensor_id": sensor_ids[inst.sensor_serial],
+                "cable_id": cable_ids[inst.cable_nombre],
+                "installed_from": inst.installed_from,
+                "installed_to": inst.installed_to,
+                "height_m": inst.height_m,
+                "mounting_details": inst.mounting_details,
+                "notes": inst.notes,
+                "created_by_user_id": user_id,
+            }
+            for inst in payload.installations
+        ]
+        result = db.execute(insert(SensorInstallation).returning(SensorInstallation.id), rows)
+        for (iid,) in result:
+            log_action(db, "sensor_installation", iid, "create", user_id, notes="bulk import")
+
+    return schemas.CatalogImportResult(
+        bridge_id=bridge_id,
+        cables=len(cable_ids),
+        states=len(state_rows),
+        sensors=len(payload.sensors),
+        installations=len(payload.installations),
+    )
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import Dict
+
+import numpy as np
+
+BUCKETS = ("day", "week", "month")
+AGG_FIELDS = ("tension_tf", "f0_hz")
+
+
+def bucket_starts(epoch: np.ndarray, bucket: str) -> np.ndarray:
+    """Floors epoch seconds (UTC) to the start of their day, ISO week (Monday) or month."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket debe ser uno de {', '.join(BUCKETS)}")
+    ts = np.floor(epoch).astype("int64").astype("datetime64[s]")
+    if bucket == "month":
+        return ts.astype("datetime64[M]").astype("datetime64[s]")
+    days = ts.astype("datetime64[D]")
+    if bucket == "week":
+        # 1970-01-01 fue jueves: desplazar para que la semana empiece en lunes
+        weekday = (days.astype("int64") + 3) % 7
+        days = days - weekday.astype("timedelta64[D]")
+    return days.astype("datetime64[s]")
+
+
+def aggregate_buckets(
+    cable_ids: np.ndarray, epoch: np.ndarray, values: Dict[str, np.ndarray], bucket: str
+) -> Dict[str, np.ndarray]:
+    """
+    Groups rows by (cable_id, bucket start) and returns min/mean/max for each series in `values`.
+    Output arrays are ordered by cable and bucket start; `count` holds rows per bucket.
+    """
+    if len(cable_ids) == 0:
+        out = {"cable_id": np.array([], dtype="int64"), "bucket_start": np.array([], dtype="datetime64[s]")}
+        out["count"] = np.array([], dtype="int64")
+        for name in values:
+            for stat in ("min", "mean", "max"):
+                out[f"{name}_{stat}"] = np.array([], dtype=float)
+        return out
+
+    starts = bucket_starts(epoch, bucket)
+    order = np.lexsort((starts, cable_ids))
+    cables_sorted = cable_ids[order]
+    starts_sorted = starts[order]
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (cables_sorted[1:] != cables_sorted[:-1]) | (starts_sorted[1:] != starts_sorted[:-1])
+    first = np.flatnonzero(new_group)
+    counts = np.diff(np.append(first, len(order)))
+
+    out = {"cable_id": cables_sorted[first], "bucket_start": starts_sorted[first], "count": counts}
+    for name, series in values.items():
+        data = series[order].astype(float)
+        out[f"{name}_min"] = np.minimum.reduceat(data, first)
+        out[f"{name}_mean"] = np.add.reduceat(data, first) / counts
+        out[f"{name}_max"] = np.maximum.reduceat(data, first)
+    return out
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of the `n_out` points that best keep the shape of y(x).
+    First and last points are always kept; x must be sorted.
+    """
+    n = len(x)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:n_out]
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype="int64")
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start = int(np.floor(i * every)) + 1
+        end = int(np.floor((i + 1) * every)) + 1
+        next_end = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def downsample_series(group_ids: np.ndarray, x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Applies LTTB independently to each group (e.g. each cable) and returns the kept row indices,
+    in their original order. Rows inside a group must already be sorted by x.
+    Groups are split with one stable sort, not one mask per group.
+    """
+    if len(group_ids) == 0:
+        return np.array([], dtype="int64")
+    order = np.argsort(group_ids, kind="stable")
+    sorted_ids = group_ids[order]
+    bounds = np.flatnonzero(sorted_ids[1:] != sorted_ids[:-1]) + 1
+    keep = [idx[lttb_indices(x[idx], y[idx], max_points)] for idx in np.split(order, bounds)]
+    return np.sort(np.concatenate(keep))
@@ -1,68 +1,135 @@
 from __future__ import annotations
 
 import io
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable, List, Tuple
+from typing import BinaryIO, Dict, Iterable, List, Optional, Set, Tuple
 
 import pandas as pd
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.models import Acquisition, AcquisitionChannel, Cable, RawFile, SensorInstallation
-from app.utils import save_upload
-
-
-def _read_csv_after_data_start(content: bytes) -> pd.DataFrame:
-    lines = content.decode("utf-8").splitlines()
-    data_start_idx = None
-    for idx, line in enumerate(lines):
-        if "DATA_START" in line:
-            data_start_idx = idx + 1
-            break
-    if data_start_idx is None:
-        raise ValueError("No se encontró la etiqueta DATA_START en el CSV")
-    headers = [h.strip() for h in lines[data_start_idx].split(",") if h.strip()]
-    if not headers:
-        raise ValueError("Encabezados vacíos después de DATA_START")
-    data_lines = lines[data_start_idx + 1 :]
-    df = pd.read_csv(io.StringIO("\n".join(data_lines)), names=headers)
+from app.services import pyramid, signals
+from app.storage import compression_for, open_stored, write_stored, write_stored_blocks
+
+
+def _read_csv_after_data_start(content: bytes | BinaryIO) -> pd.DataFrame:
+    """Parses the table after the DATA_START line; `content` may be bytes or a binary stream (read once)."""
+    stream = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        for line in text:
+            if "DATA_START" in line:
+                break
+        else:
+            raise ValueError("No se encontró la etiqueta DATA_START en el CSV")
+        headers = [h.strip() for h in text.readline().split(",") if h.strip()]
+        if not headers:
+            raise ValueError("Encabezados vacíos después de DATA_START")
+        # pandas lee directamente del stream (descomprimiendo al vuelo si viene de open_stored)
+        df = pd.read_csv(text, names=headers)
+    finally:
+        text.detach()
     return df
 
 
-def _status_for_installation(
-    db: Session, sensor_id: int, cable_id: int, acquired_at: datetime
-) -> str:
-    installs: List[SensorInstallation] = (
-        db.query(SensorInstallation)
-        .filter(
-            SensorInstallation.sensor_id == sensor_id,
-            SensorInstallation.installed_from <= acquired_at,
-            (SensorInstallation.installed_to.is_(None)) | (SensorInstallation.installed_to >= acquired_at),
-        )
-        .all()
-    )
-    if not installs:
+@dataclass
+class MappingPlan:
+    """
+    A normalize mapping validated once: rows checked, cables loaded and the installation
+    intervals of its sensors fetched, so it can be applied to many acquisitions without
+    querying again. CSV columns are still checked per file.
+    """
+
+    items: List[dict]
+    cables: Dict[int, Cable]
+    installations: Dict[int, List[Tuple[int, datetime, Optional[datetime]]]]
+
+    def installed_at(self, acquired_at: datetime) -> Dict[int, Set[int]]:
+        """Cables each mapped sensor was installed on at `acquired_at`."""
+        installed: Dict[int, Set[int]] = {}
+        for sensor_id, intervals in self.installations.items():
+            for cable_id, installed_from, installed_to in intervals:
+                if installed_from <= acquired_at and (installed_to is None or installed_to >= acquired_at):
+                    installed.setdefault(sensor_id, set()).add(cable_id)
+        return installed
+
+
+def plan_mapping(db: Session, mapping: Iterable[dict]) -> MappingPlan:
+    """Validates the mapping rows and loads cables and installations in one query each."""
+    items = list(mapping)
+    cables = {
+        c.id: c for c in db.query(Cable).filter(Cable.id.in_({item.get("cable_id") for item in items})).all()
+    }
+    installations: Dict[int, List[Tuple[int, datetime, Optional[datetime]]]] = {}
+    for sensor_id, cable_id, installed_from, installed_to in db.query(
+        SensorInstallation.sensor_id,
+        SensorInstallation.cable_id,
+        SensorInstallation.installed_from,
+        SensorInstallation.installed_to,
+    ).filter(SensorInstallation.sensor_id.in_({item.get("sensor_id") for item in items})):
+        installations.setdefault(sensor_id, []).append((cable_id, installed_from, installed_to))
+
+    seen_cable_names = set()
+    for item in items:
+        height_m = item.get("height_m")
+        if height_m is None or height_m <= 0:
+            raise ValueError("height_m debe ser > 0 en el mapeo")
+        cable: Cable | None = cables.get(item.get("cable_id"))
+        if not cable:
+            raise ValueError(f"Cable {item.get('cable_id')} no existe")
+        if cable.nombre_en_puente in seen_cable_names:
+            raise ValueError(f"Tirante repetido en mapeo: {cable.nombre_en_puente}")
+        seen_cable_names.add(cable.nombre_en_puente)
+    return MappingPlan(items, cables, installations)
+
+
+def _status_for_installation(installed: Dict[int, Set[int]], sensor_id: int, cable_id: int) -> str:
+    cables = installed.get(sensor_id)
+    if not cables:
         return "warning_no_installation"
-    cables = {inst.cable_id for inst in installs}
     return "ok" if cable_id in cables else "warning_mismatch_installation"
 
 
+def latest_raw_files(db: Session, acquisition_ids: Iterable[int]) -> Dict[int, RawFile]:
+    """Latest raw_csv of each acquisition, in one query."""
+    latest: Dict[int, RawFile] = {}
+    for record in (
+        db.query(RawFile)
+        .filter(RawFile.acquisition_id.in_(set(acquisition_ids)), RawFile.file_kind == "raw_csv")
+        .order_by(RawFile.created_at)
+    ):
+        latest[record.acquisition_id] = record
+    return latest
+
+
 def register_raw_file(
-    db: Session, acq: Acquisition, parser_version: str, file_name: str, data_root: Path, content: bytes
+    db: Session,
+    acq: Acquisition,
+    parser_version: str,
+    file_name: str,
+    data_root: Path,
+    content: bytes | BinaryIO,
+    stored_name: Optional[str] = None,
 ) -> RawFile:
-    path, digest = save_upload(data_root, "raw", file_name, content)
+    """
+    Stores the upload (bytes or a binary stream) and adds its RawFile row; the caller commits.
+    `stored_name` is the name under DATA_ROOT/raw when `file_name` is not unique (it stays as original_filename).
+    """
+    path, digest, size = write_stored(data_root, "raw", stored_name or file_name, content, compression_for("raw_csv"))
     record = RawFile(
         acquisition_id=acq.id,
         file_kind="raw_csv",
         storage_path=str(path),
         original_filename=file_name,
         sha256=digest,
-        file_size_bytes=len(content),
+        file_size_bytes=size,
         parser_version=parser_version,
     )
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    db.flush()
     return record
 
 
@@ -72,54 +139,52 @@ def normalize_from_raw(
     mapping: Iterable[dict],
     data_root: Path,
     parser_version: str,
-) -> Tuple[RawFile, List[AcquisitionChannel], str]:
-    raw_record: RawFile | None = (
-        db.query(RawFile)
-        .filter(RawFile.acquisition_id == acq.id, RawFile.file_kind == "raw_csv")
-        .order_by(RawFile.created_at.desc())
-        .first()
-    )
+    plan: Optional[MappingPlan] = None,
+    raw_record: Optional[RawFile] = None,
+) -> Tuple[RawFile, List[dict], str]:
+    """
+    Writes the normalized CSV and adds its RawFile and channel rows; the caller commits.
+    `plan` (from plan_mapping) and `raw_record` let bulk callers validate and look up once.
+    """
+    if raw_record is None:
+        raw_record = (
+            db.query(RawFile)
+            .filter(RawFile.acquisition_id == acq.id, RawFile.file_kind == "raw_csv")
+            .order_by(RawFile.created_at.desc())
+            .first()
+        )
     if not raw_record:
         raise ValueError("No hay raw_csv registrado para esta adquisición")
-    raw_bytes = Path(raw_record.storage_path).read_bytes()
-    df = _read_csv_after_data_start(raw_bytes)
+    if plan is None:
+        plan = plan_mapping(db, mapping)
+    with open_stored(raw_record.storage_path) as fh:
+        df = _read_csv_after_data_start(fh)
 
+    installed = plan.installed_at(acq.acquired_at)
     rename_map = {}
-    channel_rows: List[AcquisitionChannel] = []
-    seen_cable_names = set()
-    for item in mapping:
+    channel_rows: List[dict] = []
+    for item in plan.items:
         col = item.get("csv_column_name")
-        sensor_id = item.get("sensor_id")
-        cable_id = item.get("cable_id")
-        height_m = item.get("height_m")
-        if height_m is None or height_m <= 0:
-            raise ValueError("height_m debe ser > 0 en el mapeo")
         if col not in df.columns:
             raise ValueError(f"Columna {col} no existe en el CSV crudo")
-        cable: Cable | None = db.get(Cable, cable_id)
-        if not cable:
-            raise ValueError(f"Cable {cable_id} no existe")
-        cable_name = cable.nombre_en_puente
-        if cable_name in seen_cable_names:
-            raise ValueError(f"Tirante repetido en mapeo: {cable_name}")
-        seen_cable_names.add(cable_name)
-        rename_map[col] = cable_name
-        status_flag = _status_for_installation(db, sensor_id, cable_id, acq.acquired_at)
+        sensor_id = item.get("sensor_id")
+        cable_id = item.get("cable_id")
+        rename_map[col] = plan.cables[cable_id].nombre_en_puente
         channel_rows.append(
-            AcquisitionChannel(
+            dict(
                 acquisition_id=acq.id,
                 csv_column_name=col,
                 sensor_id=sensor_id,
                 cable_id=cable_id,
-                height_m=height_m,
-                status_flag=status_flag,
+                height_m=item.get("height_m"),
+                status_flag=_status_for_installation(installed, sensor_id, cable_id),
                 notes=None,
             )
         )
 
     df_norm = df.copy()
     df_norm = df_norm.rename(columns=rename_map)
-    cols_order = [df_norm.columns[0]] + sorted(seen_cable_names)
+    cols_order = [df_norm.columns[0]] + sorted(rename_map.values())
     df_norm = df_norm[cols_order]
     # Convertir a numérico salvo la primera columna (tiempo)
     for col in df_norm.columns[1:]:
@@ -127,19 +192,27 @@ def normalize_from_raw(
     # No se eliminan filas; NaN se preserva (policy conservadora)
 
     fname = f"normalized_{acq.bridge_id}_{acq.acquired_at.strftime('%Y%m%d_%H%M%S')}_acq{acq.id}.csv"
-    path, digest = save_upload(data_root, "normalized", fname, df_norm.to_csv(index=False).encode("utf-8"))
+    # Bloques comprimidos por separado + índice de filas: el visor de señal lee solo la ventana pedida
+    blocks = list(signals.csv_blocks(df_norm))
+    path, digest, size, offsets = write_stored_blocks(
+        data_root, "normalized", fname, (b[0] for b in blocks), compression_for("normalized_csv")
+    )
+    signals.write_row_index(
+        path, [str(c) for c in df_norm.columns], [b[1] for b in blocks[1:]], [b[2] for b in blocks[1:]], offsets[1:]
+    )
+    pyramid.write_pyramid(path, df_norm)
     norm_record = RawFile(
         acquisition_id=acq.id,
         file_kind="normalized_csv",
         storage_path=str(path),
         original_filename=fname,
         sha256=digest,
-        file_size_bytes=path.stat().st_size,
+        file_size_bytes=size,
         parser_version=parser_version,
     )
     db.add(norm_record)
-    for row in channel_rows:
-        db.add(row)
-    db.commit()
-    db.refresh(norm_record)
+    db.flush()
+    if channel_rows:
+        # executemany: una sentencia para todos los canales
+        db.execute(insert(AcquisitionChannel), channel_rows)
     return norm_record, channel_rows, str(path)
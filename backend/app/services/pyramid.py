@@ -0,0 +1,194 @@
+"""
+Multi-resolution min/max/mean summaries of a normalized CSV, stored next to it (<file>.pyr).
+
+Level k summarizes buckets of BASE_BUCKET·2^k consecutive rows per channel; each level is
+built from the previous one by pairing buckets, down to at most MIN_BUCKETS buckets. A view
+window is served from the finest level that still fits the point budget, so its cost depends
+on the screen width and not on the record length.
+
+File layout (uncompressed, so levels are read with np.memmap without loading the file):
+    8 bytes   little-endian header length H
+    H bytes   JSON header {"version", "stored_size", "rows", "columns", "levels": [{"bucket", "n", "t", "min", "max", "mean"}]}
+              where "t" is the offset of the float64 bucket start times and min/max/mean map
+              each column to the offset of its float32 array; stored_size is the size of the
+              CSV it summarizes, so a pyramid left over from a previous normalization is ignored
+    ...       the arrays, 8-byte aligned
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.storage import PYRAMID_SUFFIX, locate, sidecar_path, temp_path
+
+VERSION = 2
+BASE_BUCKET = 64
+MIN_BUCKETS = 64
+_LEN = struct.Struct("<Q")
+
+
+@dataclass
+class Level:
+    bucket: int
+    t: np.ndarray
+    min: np.ndarray  # (n_buckets, n_columns)
+    max: np.ndarray
+    sum: np.ndarray
+    count: np.ndarray
+
+
+def _levels(t: np.ndarray, values: np.ndarray) -> List[Level]:
+    finite = ~np.isnan(values)
+    starts = np.arange(0, len(t), BASE_BUCKET)
+    level = Level(
+        BASE_BUCKET,
+        t[starts],
+        # fmin/fmax ignoran NaN salvo que todo el tramo sea NaN
+        np.fmin.reduceat(values, starts, axis=0),
+        np.fmax.reduceat(values, starts, axis=0),
+        np.add.reduceat(np.where(finite, values, 0.0), starts, axis=0),
+        np.add.reduceat(finite, starts, axis=0),
+    )
+    levels = [level]
+    while len(level.t) > MIN_BUCKETS:
+        pairs = np.arange(0, len(level.t), 2)
+        level = Level(
+            level.bucket * 2,
+            level.t[pairs],
+            np.fmin.reduceat(level.min, pairs, axis=0),
+            np.fmax.reduceat(level.max, pairs, axis=0),
+            np.add.reduceat(level.sum, pairs, axis=0),
+            np.add.reduceat(level.count, pairs, axis=0),
+        )
+        levels.append(level)
+    return levels
+
+
+def write_pyramid(path: Path, df: pd.DataFrame) -> Optional[Path]:
+    """
+    Builds and stores the pyramid of a normalized frame (first column = time) next to `path`.
+    Skipped when the record fits in one base bucket level or the time column is not numeric/sorted;
+    then any pyramid of a previous normalization to the same path is deleted.
+    """
+    target = sidecar_path(path, PYRAMID_SUFFIX)
+    t = pd.to_numeric(df.iloc[:, 0], errors="coerce").to_numpy(dtype=float)
+    if len(t) <= BASE_BUCKET * MIN_BUCKETS or np.isnan(t).any() or (np.diff(t) < 0).any():
+        target.unlink(missing_ok=True)
+        return None
+    columns = [str(c) for c in df.columns[1:]]
+    values = df.iloc[:, 1:].to_numpy(dtype=float)
+    levels = _levels(t, values)
+
+    header = {"version": VERSION, "stored_size": path.stat().st_size, "rows": len(t), "columns": columns, "levels": []}
+    arrays: List[np.ndarray] = []
+    offset = 0
+
+    def place(array: np.ndarray) -> int:
+        nonlocal offset
+        start = offset
+        arrays.append(array)
+        offset += array.nbytes + (-array.nbytes) % 8
+        return start
+
+    for level in levels:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(level.count > 0, level.sum / np.maximum(level.count, 1), np.nan)
+        entry = {"bucket": level.bucket, "n": len(level.t), "t": place(level.t.astype("<f8"))}
+        entry.update(min={}, max={}, mean={})
+        for stat, data in (("min", level.min), ("max", level.max), ("mean", mean)):
+            for idx, column in enumerate(columns):
+                entry[stat][column] = place(np.ascontiguousarray(data[:, idx], dtype="<f4"))
+        header["levels"].append(entry)
+
+    raw_header = json.dumps(header).encode("utf-8")
+    data_start = _LEN.size + len(raw_header) + (-(_LEN.size + len(raw_header))) % 8
+    tmp = temp_path(target)
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(_LEN.pack(len(raw_header)))
+            fh.write(raw_header)
+            fh.write(b"\0" * (data_start - fh.tell()))
+            for array in arrays:
+                fh.write(array.tobytes())
+                fh.write(b"\0" * ((-array.nbytes) % 8))
+        os.replace(tmp, target)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return target
+
+
+@dataclass
+class PyramidWindow:
+    bucket: int  # filas por punto del nivel elegido
+    t: np.ndarray
+    min: np.ndarray
+    max: np.ndarray
+    mean: np.ndarray
+    rows_in_window: int  # aproximado al tamaño de bucket
+
+
+class Pyramid:
+    def __init__(self, path: Path, header: Dict, data_start: int):
+        self.path = path
+        self.header = header
+        self.data_start = data_start
+
+    @property
+    def columns(self) -> List[str]:
+        return self.header["columns"]
+
+    def _array(self, offset: int, n: int, dtype: str) -> np.ndarray:
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=self.data_start + offset, shape=(n,))
+
+    def window(
+        self, column: str, t_start: Optional[float], t_end: Optional[float], max_buckets: int
+    ) -> Optional[PyramidWindow]:
+        """
+        Buckets of the finest level with at most `max_buckets` buckets in [t_start, t_end].
+        None if even the base level fits (the raw rows are few enough to read directly).
+        Only the bucket times needed for the search and the chosen slice are read.
+        """
+        if column not in self.columns:
+            raise ValueError(f"Columna {column} no existe en el CSV normalizado")
+        for position, level in enumerate(self.header["levels"]):
+            t = self._array(level["t"], level["n"], "<f8")
+            lo = max(0, int(np.searchsorted(t, t_start, side="right")) - 1) if t_start is not None else 0
+            hi = int(np.searchsorted(t, t_end, side="right")) if t_end is not None else level["n"]
+            if hi - lo <= max_buckets:
+                if position == 0:
+                    return None
+                break
+        # Si ni el nivel más grueso cabe se devuelve ese y el llamador reduce
+        n = level["n"]
+        rows = min(hi * level["bucket"], self.header["rows"]) - lo * level["bucket"]
+        return PyramidWindow(
+            level["bucket"],
+            np.array(t[lo:hi]),
+            np.array(self._array(level["min"][column], n, "<f4")[lo:hi], dtype=float),
+            np.array(self._array(level["max"][column], n, "<f4")[lo:hi], dtype=float),
+            np.array(self._array(level["mean"][column], n, "<f4")[lo:hi], dtype=float),
+            max(rows, 0),
+        )
+
+
+def load_pyramid(path: Path | str) -> Optional[Pyramid]:
+    """The pyramid of a stored CSV, or None if missing, of another format or built for other bytes."""
+    target = sidecar_path(path, PYRAMID_SUFFIX)
+    try:
+        with open(target, "rb") as fh:
+            (length,) = _LEN.unpack(fh.read(_LEN.size))
+            header = json.loads(fh.read(length))
+        if header.get("version") != VERSION or locate(path).stat().st_size != header.get("stored_size"):
+            return None
+    except (OSError, ValueError, struct.error):
+        return None
+    data_start = _LEN.size + length + (-(_LEN.size + length)) % 8
+    return Pyramid(target, header, data_start)
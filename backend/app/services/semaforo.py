@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Sequence
+
+import numpy as np
+
+from app.services.business import ALERT_PCT_FU
+
+
+def epoch_seconds(values: Sequence[datetime | None], fill: float = np.inf) -> np.ndarray:
+    """
+    Converts datetimes to float epoch seconds.
+    Naive values are taken as UTC (SQLite drops tzinfo); None becomes `fill`.
+    """
+    out = np.empty(len(values), dtype=float)
+    for idx, value in enumerate(values):
+        if value is None:
+            out[idx] = fill
+        elif value.tzinfo is None:
+            out[idx] = value.replace(tzinfo=timezone.utc).timestamp()
+        else:
+            out[idx] = value.timestamp()
+    return out
+
+
+def select_state_indices(valid_from: np.ndarray, valid_to: np.ndarray, at: np.ndarray) -> np.ndarray:
+    """
+    Vectorized form of `select_cable_state_version` for one cable.
+    `valid_from`/`valid_to` are epoch seconds per state (open end = inf), `at` the timestamps to resolve.
+    Returns the selected state index per timestamp, -1 when no state starts before it.
+    Raises ValueError when more than one state covers a timestamp.
+    """
+    if len(valid_from) == 0:
+        return np.full(len(at), -1, dtype=int)
+    starts_before = valid_from[:, None] <= at[None, :]
+    covering = starts_before & (valid_to[:, None] >= at[None, :])
+    n_covering = covering.sum(axis=0)
+    if (n_covering > 1).any():
+        raise ValueError("Multiple cable_state_versions overlap for the given timestamp")
+
+    # Fallback: latest valid_from <= at
+    masked_from = np.where(starts_before, valid_from[:, None], -np.inf)
+    latest = np.where(starts_before.any(axis=0), masked_from.argmax(axis=0), -1)
+    return np.where(n_covering == 1, covering.argmax(axis=0), latest)
+
+
+def threshold_matrix(tension: np.ndarray, fu: np.ndarray, alert_pct: float = ALERT_PCT_FU):
+    """
+    Computes pct_fu and estado for a tension/Fu matrix in one pass.
+    NaN tension or Fu marks a cell without data; its pct is NaN and its estado None.
+    Fu == 0 yields pct 0.0, as in the per-acquisition semáforo.
+    """
+    valid = ~np.isnan(tension) & ~np.isnan(fu)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(fu != 0, tension / fu * 100.0, 0.0)
+    pct = np.where(valid, pct, np.nan)
+    estado = np.where(pct > alert_pct, "ALERTA", "OK").astype(object)
+    estado[~valid] = None
+    return pct, estado
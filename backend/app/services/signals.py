@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import io
+import json
+import math
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.history import lttb_indices
+from app.storage import ROW_INDEX_SUFFIX, locate, open_stored, open_stored_at, sidecar_path
+
+METHODS = ("minmax", "lttb")
+SCAN_CHUNK_ROWS = 200_000
+# Filas por bloque comprimido independiente del CSV normalizado (granularidad de lectura con índice)
+INDEX_BLOCK_ROWS = 16384
+
+
+@dataclass
+class SignalWindow:
+    time_column: str
+    t: np.ndarray
+    y: np.ndarray
+    rows_read: int
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min and max of each of n_out/2 equal buckets, in time order: keeps every peak, which
+    LTTB may drop, at the same point budget. NaN are ignored; all-NaN buckets are dropped.
+    """
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    buckets = max(1, n_out // 2)
+    edges = np.linspace(0, n, buckets + 1).astype("int64")
+    keep = []
+    for start, end in zip(edges[:-1], edges[1:]):
+        chunk = y[start:end]
+        if end <= start or np.isnan(chunk).all():
+            continue
+        lo, hi = int(np.nanargmin(chunk)), int(np.nanargmax(chunk))
+        keep.extend(sorted({start + lo, start + hi}))
+    return np.asarray(keep, dtype="int64")
+
+
+def downsample(t: np.ndarray, y: np.ndarray, points: int, method: str) -> np.ndarray:
+    if method not in METHODS:
+        raise ValueError(f"method debe ser uno de {', '.join(METHODS)}")
+    if method == "minmax":
+        return minmax_indices(y, points)
+    finite = np.flatnonzero(~np.isnan(y))
+    return finite[lttb_indices(t[finite], y[finite], points)]
+
+
+def csv_blocks(df: pd.DataFrame, block_rows: int = INDEX_BLOCK_ROWS) -> Iterator[Tuple[bytes, int, Optional[float]]]:
+    """
+    The CSV of `df` (same bytes as df.to_csv(index=False)) as (bytes, first row, first time) blocks:
+    the header alone, then `block_rows` rows each. The first column is the time.
+    """
+    yield df.iloc[:0].to_csv(index=False).encode("utf-8"), -1, None
+    times = pd.to_numeric(df.iloc[:, 0], errors="coerce").to_numpy(dtype=float)
+    for start in range(0, len(df), block_rows):
+        first = times[start]
+        yield (
+            df.iloc[start : start + block_rows].to_csv(index=False, header=False).encode("utf-8"),
+            start,
+            None if np.isnan(first) else float(first),
+        )
+
+
+def write_row_index(path: Path, columns: List[str], rows: List[int], times: List[Optional[float]], offsets: List[int]) -> None:
+    """Sidecar with the stored byte offset of each data block; not written if the time column is not numeric."""
+    if any(t is None for t in times) or any(b < a for a, b in zip(times, times[1:])):
+        return
+    index = {
+        "columns": columns,
+        "stored_size": path.stat().st_size,
+        "blocks": [[row, t, offset] for row, t, offset in zip(rows, times, offsets)],
+    }
+    sidecar_path(path, ROW_INDEX_SUFFIX).write_text(json.dumps(index))
+
+
+def load_row_index(path: Path) -> Optional[dict]:
+    """The row index of a stored file, or None if missing or written for other bytes (e.g. recompressed)."""
+    index_path = sidecar_path(path, ROW_INDEX_SUFFIX)
+    try:
+        index = json.loads(index_path.read_text())
+        return index if locate(path).stat().st_size == index["stored_size"] and index["blocks"] else None
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _header_and_start(path: Path) -> Tuple[List[str], Optional[float]]:
+    """Column names and first timestamp; only the first block of the file is read."""
+    with open_stored(path) as fh:
+        text = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+        columns = [c.strip() for c in text.readline().strip().split(",")]
+        first = text.readline().split(",", 1)[0].strip()
+        text.detach()
+    try:
+        return columns, float(first)
+    except ValueError:
+        return columns, None
+
+
+def read_window(
+    path: Path | str,
+    column: str,
+    t_start: Optional[float] = None,
+    t_end: Optional[float] = None,
+    fs_hz: Optional[float] = None,
+) -> SignalWindow:
+    """
+    Time column and `column` of a normalized CSV between t_start and t_end (seconds, inclusive).
+    With a row index (written by normalize) only the blocks that overlap the window are
+    decompressed and parsed, whatever the record length. Otherwise, with the sampling rate the row range is computed from the first timestamp and only the
+    two columns of those rows are parsed; reading stops at the window end, so
+    a compressed file is only decompressed up to there. If the file turns out not to be evenly
+    sampled, it is scanned in chunks instead.
+    """
+    path = Path(path)
+    index = load_row_index(path)
+    if index is not None:
+        return _read_indexed(path, index, column, t_start, t_end)
+    columns, t0 = _header_and_start(path)
+    if column not in columns[1:]:
+        raise ValueError(f"Columna {column} no existe en el CSV normalizado")
+    time_col = columns[0]
+    usecols = [time_col, column]
+    if t0 is not None and fs_hz:
+        start_row = max(0, math.floor(((t_start if t_start is not None else t0) - t0) * fs_hz) - 1)
+        nrows = None
+        if t_end is not None:
+            nrows = max(0, math.ceil((t_end - t0) * fs_hz) + 2 - start_row)
+        with open_stored(path) as fh:
+            text = io.TextIOWrapper(fh, encoding="utf-8", newline="")
+            # Saltar encabezado y filas previas sin parsearlas (más barato que skiprows con millones de filas)
+            deque(islice(text, start_row + 1), maxlen=0)
+            df = pd.read_csv(text, names=columns, header=None, usecols=usecols, nrows=nrows)
+            text.detach()
+        t = df[time_col].to_numpy(dtype=float)
+        covered = (len(t) == 0 and start_row == 0) or (
+            len(t) > 0
+            and (start_row == 0 or t_start is None or t[0] <= t_start)
+            and (t_end is None or nrows is None or len(t) < nrows or t[-1] >= t_end)
+        )
+        if covered:
+            mask = _mask(t, t_start, t_end)
+            return SignalWindow(time_col, t[mask], df[column].to_numpy(dtype=float)[mask], len(t))
+    return _scan(path, time_col, column, t_start, t_end)
+
+
+def _read_indexed(
+    path: Path, index: dict, column: str, t_start: Optional[float], t_end: Optional[float]
+) -> SignalWindow:
+    columns = index["columns"]
+    if column not in columns[1:]:
+        raise ValueError(f"Columna {column} no existe en el CSV normalizado")
+    blocks = index["blocks"]
+    firsts = [b[1] for b in blocks]
+    first = max(0, bisect_right(firsts, t_start) - 1) if t_start is not None else 0
+    last = bisect_right(firsts, t_end) if t_end is not None else len(blocks)
+    if last <= first:
+        return SignalWindow(columns[0], np.array([], dtype=float), np.array([], dtype=float), 0)
+    nrows = blocks[last][0] - blocks[first][0] if last < len(blocks) else None
+    with open_stored_at(path, blocks[first][2]) as fh:
+        df = pd.read_csv(fh, names=columns, header=None, usecols=[columns[0], column], nrows=nrows)
+    t = df[columns[0]].to_numpy(dtype=float)
+    mask = _mask(t, t_start, t_end)
+    return SignalWindow(columns[0], t[mask], df[column].to_numpy(dtype=float)[mask], len(t))
+
+
+def _mask(t: np.ndarray, t_start: Optional[float], t_end: Optional[float]) -> np.ndarray:
+    mask = np.ones(len(t), dtype=bool)
+    if t_start is not None:
+        mask &= t >= t_start
+    if t_end is not None:
+        mask &= t <= t_end
+    return mask
+
+
+def _scan(path: Path, time_col: str, column: str, t_start: Optional[float], t_end: Optional[float]) -> SignalWindow:
+    ts, ys, rows = [], [], 0
+    with open_stored(path) as fh:
+        for chunk in pd.read_csv(fh, usecols=[time_col, column], chunksize=SCAN_CHUNK_ROWS):
+            rows += len(chunk)
+            t = chunk[time_col].to_numpy(dtype=float)
+            mask = _mask(t, t_start, t_end)
+            ts.append(t[mask])
+            ys.append(chunk[column].to_numpy(dtype=float)[mask])
+            if t_end is not None and len(t) and t.min() > t_end:
+                break
+    t = np.concatenate(ts) if ts else np.array([], dtype=float)
+    y = np.concatenate(ys) if ys else np.array([], dtype=float)
+    return SignalWindow(time_col, t, y, rows)
@@ -0,0 +1,60 @@
+"""
+Startup timing: how long the worker took to boot and which modules it paid for.
+
+Heavy modules (pandas, NumPy and the services built on them) are loaded with
+`lazy_import` on first use instead of at import time; every such load, and the
+boot phases recorded by `app.main`, show up in `report()` (GET /startup).
+"""
+from __future__ import annotations
+
+import importlib
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Dict, List
+
+BOOT_START = time.perf_counter()
+
+_lock = threading.Lock()
+_phases: Dict[str, float] = {}
+_boot_imports: Dict[str, float] = {}
+_lazy: List[Dict] = []
+
+
+def record_phase(name: str, seconds: float) -> None:
+    with _lock:
+        _phases[name] = seconds
+
+
+def timed_import(name: str) -> ModuleType:
+    """Boot-time import; the time reported is what `name` added on top of the modules already loaded."""
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        _boot_imports.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Imports `name` on first use and records how long the first import took."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    with _lock:
+        _lazy.append(
+            {"module": name, "seconds": time.perf_counter() - start, "after_boot_seconds": start - BOOT_START}
+        )
+    return module
+
+
+def report() -> Dict:
+    with _lock:
+        return {
+            "phases": dict(_phases),
+            "boot_imports": dict(_boot_imports),
+            "lazy_imports": list(_lazy),
+            "heavy_modules_loaded": sorted(m for m in ("numpy", "pandas", "pyarrow") if m in sys.modules),
+        }
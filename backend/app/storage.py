@@ -0,0 +1,352 @@
+"""
+Stored files under DATA_ROOT with optional transparent compression.
+
+Files are written through a streaming compressor chosen per file kind (STORAGE_COMPRESSION_RAW,
+STORAGE_COMPRESSION_NORMALIZED: none | gzip | zstd) and get the codec suffix (.gz, .zst).
+The sha256 and size recorded for a file always describe the original, uncompressed content.
+Readers go through `open_stored` / `read_stored`, which take the codec from that suffix, never
+from the content: an uncompressed upload that happens to be a .gz (e.g. photos.tar.gz) is
+stored as `photos.tar.gz.plain` and served byte for byte. Files written before compression
+was enabled have no suffix and keep working.
+zstd needs the optional `zstandard` package.
+
+Files moved to the archive tier (app.tiering) are read through `locate`: an archived file
+is served from a local LRU copy (HotCache; files larger than the whole cache are read in
+place), and a primary path that no longer exists falls through to its mirror under
+ARCHIVE_ROOT, so a reader holding a stale storage_path still works.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+from .config import get_settings
+
+try:  # opcional: solo se necesita con STORAGE_COMPRESSION_*=zstd
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+CODECS = ("none", "gzip", "zstd")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# Marca de "sin comprimir" para archivos cuyo propio nombre termina en .gz/.zst
+PLAIN_SUFFIX = ".plain"
+# Archivos auxiliares junto a un archivo guardado (índice de filas, pirámide); viajan con él al archivo frío
+ROW_INDEX_SUFFIX = ".idx.json"
+PYRAMID_SUFFIX = ".pyr"
+SIDECAR_SUFFIXES = (ROW_INDEX_SUFFIX, PYRAMID_SUFFIX)
+
+
+def temp_path(path: Path) -> Path:
+    """Hidden temporary name next to `path`, unique per process and thread, for write-then-rename."""
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def compression_for(file_kind: str) -> str:
+    """Configured codec for a file kind ("raw_csv", "normalized_csv"); anything else is stored as is."""
+    settings = get_settings()
+    codec = {
+        "raw_csv": settings.storage_compression_raw,
+        "normalized_csv": settings.storage_compression_normalized,
+    }.get(file_kind, "none")
+    return (codec or "none").lower()
+
+
+def stored_name(filename: str, codec: str) -> str:
+    """Name on disk for `filename` stored with `codec`; codec_for_path reads the codec back from it."""
+    if codec == "none" and strip_codec_suffix(filename) != filename:
+        return filename + PLAIN_SUFFIX
+    return filename + SUFFIXES.get(codec, "")
+
+
+def codec_for_path(path: Path | str) -> str:
+    """Codec of a stored file, from the suffix write_stored gave it."""
+    name = Path(path).name
+    return next((codec for codec, suffix in SUFFIXES.items() if name.endswith(suffix)), "none")
+
+
+def _compressor(codec: str, fh: BinaryIO) -> BinaryIO:
+    if codec == "gzip":
+        # mtime=0: el mismo contenido produce los mismos bytes comprimidos
+        return gzip.GzipFile(fileobj=fh, mode="wb", compresslevel=get_settings().storage_gzip_level, mtime=0)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("STORAGE_COMPRESSION=zstd requiere el paquete zstandard")
+        return zstandard.ZstdCompressor(level=get_settings().storage_zstd_level).stream_writer(fh, closefd=False)
+    raise ValueError(f"Compresión no soportada: {codec} (usar {', '.join(CODECS)})")
+
+
+def write_stored(
+    base_dir: Path, subdir: str, filename: str, data: bytes | BinaryIO, compression: Optional[str] = None
+) -> Tuple[Path, str, int]:
+    """
+    Streams `data` (bytes or a binary file object) to base_dir/subdir/filename[+suffix],
+    compressing on the way. Returns (path, sha256 of the original content, original size).
+    The file is written to a temporary name and renamed, so readers never see half a file.
+    """
+    codec = (compression or "none").lower()
+    target_dir = base_dir / subdir
+    target_dir.mkdir(parents=True, exist_ok=True)
+    path = target_dir / stored_name(filename, codec)
+    tmp = temp_path(path)
+    source = io.BytesIO(data) if isinstance(data, (bytes, bytearray, memoryview)) else data
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp, "wb") as fh:
+            sink = fh if codec == "none" else _compressor(codec, fh)
+            try:
+                while True:
+                    chunk = source.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    sink.write(chunk)
+            finally:
+                if sink is not fh:
+                    sink.close()
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path, hasher.hexdigest(), size
+
+
+def write_stored_blocks(
+    base_dir: Path, subdir: str, filename: str, blocks: Iterable[bytes], compression: Optional[str] = None
+) -> Tuple[Path, str, int, List[int]]:
+    """
+    Like write_stored, but each block is compressed on its own (a gzip member / zstd frame),
+    so a reader can start decompressing at any block. The file is still a single valid
+    stream for open_stored. Also returns the byte offset in the stored file of every block.
+    """
+    codec = (compression or "none").lower()
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError("STORAGE_COMPRESSION=zstd requiere el paquete zstandard")
+    if codec not in CODECS:
+        raise ValueError(f"Compresión no soportada: {codec} (usar {', '.join(CODECS)})")
+    target_dir = base_dir / subdir
+    target_dir.mkdir(parents=True, exist_ok=True)
+    path = target_dir / stored_name(filename, codec)
+    tmp = temp_path(path)
+    settings = get_settings()
+    zstd = zstandard.ZstdCompressor(level=settings.storage_zstd_level) if codec == "zstd" else None
+    hasher = hashlib.sha256()
+    size = 0
+    offsets: List[int] = []
+    try:
+        with open(tmp, "wb") as fh:
+            for block in blocks:
+                offsets.append(fh.tell())
+                hasher.update(block)
+                size += len(block)
+                if codec == "gzip":
+                    block = gzip.compress(block, compresslevel=settings.storage_gzip_level, mtime=0)
+                elif zstd is not None:
+                    block = zstd.compress(block)
+                fh.write(block)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return path, hasher.hexdigest(), size, offsets
+
+
+def sidecar_path(path: Path | str, suffix: str) -> Path:
+    return Path(f"{path}{suffix}")
+
+
+def strip_codec_suffix(name: str) -> str:
+    """Original file name of a stored name (inverse of stored_name)."""
+    for suffix in (*SUFFIXES.values(), PLAIN_SUFFIX):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def archive_root() -> Path:
+    settings = get_settings()
+    return Path(settings.archive_root or Path(settings.data_root) / "archive")
+
+
+def _relative_to(path: Path, root: Path) -> Optional[Path]:
+    try:
+        return path.resolve().relative_to(root.resolve())
+    except ValueError:
+        return None
+
+
+def archive_path_for(path: Path | str, compression: str) -> Optional[Path]:
+    """Mirror of a DATA_ROOT file under ARCHIVE_ROOT with the archive codec suffix; None if outside DATA_ROOT."""
+    rel = _relative_to(Path(path), Path(get_settings().data_root))
+    if rel is None:
+        return None
+    return archive_root() / rel.parent / stored_name(strip_codec_suffix(rel.name), compression)
+
+
+class HotCache:
+    """
+    Local copies of recently read archived files, evicted least-recently-used first once
+    they exceed `max_bytes`. The state is the directory itself (mtime = last use), so every
+    worker process shares it; entries are keyed by source path, size and mtime.
+    """
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _key(self, source: Path) -> str:
+        st = source.stat()
+        ident = f"{source.resolve()}:{st.st_size}:{st.st_mtime_ns}"
+        return hashlib.sha256(ident.encode()).hexdigest()[:32] + "_" + source.name
+
+    def fetch(self, source: Path) -> Path:
+        """Path to read `source` from: its cached copy, or `source` itself if it exceeds the budget."""
+        if source.stat().st_size > self.max_bytes:
+            return source
+        cached = self.root / self._key(source)
+        try:
+            os.utime(cached)
+            return cached
+        except FileNotFoundError:  # no está, o lo desalojó otro proceso
+            pass
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = temp_path(cached)
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, cached)
+        self.evict(keep=cached)
+        return cached
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Deletes least-recently-used entries until under budget; `keep` (just fetched) is never deleted."""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.is_file() and not entry.name.startswith("."):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and path == str(keep):
+                    continue
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_hot_cache: Optional[HotCache] = None
+
+
+def hot_cache() -> Optional[HotCache]:
+    global _hot_cache
+    settings = get_settings()
+    if settings.archive_cache_max_mb <= 0:
+        return None
+    root = Path(settings.archive_cache_dir or Path(settings.data_root) / ".hot_cache")
+    max_bytes = int(settings.archive_cache_max_mb * 1024 * 1024)
+    if _hot_cache is None or _hot_cache.root != root or _hot_cache.max_bytes != max_bytes:
+        _hot_cache = HotCache(root, max_bytes)
+    return _hot_cache
+
+
+def locate(path: Path | str) -> Path:
+    """Where to read a stored file from: the hot cache for archived files, the archive for moved ones."""
+    path = Path(path)
+    if not path.exists():
+        rel = _relative_to(path, Path(get_settings().data_root))
+        if rel is None:
+            return path
+        original = strip_codec_suffix(rel.name)
+        candidates = (archive_root() / rel.parent / stored_name(original, codec) for codec in CODECS)
+        moved = next((c for c in candidates if c.exists()), None)
+        if moved is None:
+            return path
+        path = moved
+    cache = hot_cache()
+    if cache is not None and _relative_to(path, archive_root()) is not None:
+        return cache.fetch(path)
+    return path
+
+
+def open_stored(path: Path | str, fileobj: Optional[BinaryIO] = None) -> BinaryIO:
+    """
+    Binary stream of the original content of a stored file, decompressing as it is read.
+    `fileobj` replaces the plain file handle as source (e.g. a throttled reader); the caller closes it.
+    """
+    path = Path(path) if fileobj is not None else locate(path)
+    codec = codec_for_path(path)
+    if codec == "zstd" and zstandard is None:
+        raise RuntimeError(f"{path} está comprimido con zstd y falta el paquete zstandard")
+    if fileobj is None:
+        if codec == "gzip":
+            return gzip.open(path, "rb")
+        if codec == "zstd":
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True, read_across_frames=True)
+        return open(path, "rb")
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False, read_across_frames=True)
+    return fileobj
+
+
+def open_stored_at(path: Path | str, offset: int) -> BinaryIO:
+    """Original content from the block that starts at stored byte `offset` (see write_stored_blocks)."""
+    path = locate(path)
+    codec = codec_for_path(path)
+    fh = open(path, "rb")
+    fh.seek(offset)
+    if codec == "gzip":
+        return _Closing(gzip.GzipFile(fileobj=fh, mode="rb"), fh)
+    if codec == "zstd":
+        if zstandard is None:
+            fh.close()
+            raise RuntimeError(f"{path} está comprimido con zstd y falta el paquete zstandard")
+        # read_across_frames: los bloques son frames independientes
+        return zstandard.ZstdDecompressor().stream_reader(fh, closefd=True, read_across_frames=True)
+    return fh
+
+
+class _Closing(io.BufferedIOBase):
+    """Decompressing stream that also closes the underlying file."""
+
+    def __init__(self, stream: BinaryIO, fh: BinaryIO):
+        self._stream = stream
+        self._fh = fh
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self._stream.read1(size)
+
+    def readinto(self, b) -> int:
+        return self._stream.readinto(b)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stream.close()
+            self._fh.close()
+        super().close()
+
+
+def read_stored(path: Path | str) -> bytes:
+    with open_stored(path) as fh:
+        return fh.read()
+
@@ -0,0 +1,642 @@
+"""
+Synthetic scale dataset: bridges, cables, multi-year state versions, K calibrations,
+sensor installations, acquisitions, analysis results and raw CSVs.
+
+Usage (against DATABASE_URL / DATA_ROOT):
+    python -m app.synthetic --bridges 20 --cables 40 --years 5 --acq-per-month 8 --seed 7
+
+Everything derives from the seed; bridge b draws from its own generator seeded
+with (seed, b), so its data does not depend on how many bridges are generated.
+Each bridge is one transaction and bridges that already exist (by name) are
+skipped, so an interrupted run can be resumed with the same arguments.
+
+Primary keys are allocated client-side from the current max(id), so rows go in
+as plain executemany batches without RETURNING round trips: run it against a
+database nobody else is writing to.
+
+The physics is a taut string: T[N] = 4·mu·L²·f0², so K = 4·mu·L²/(g·1000) in
+tf/Hz² and tension_tf = K·f0². Raw CSVs carry the same f0 per cable as a sum of
+decaying harmonics n·f0 plus noise, sampled at Fs_Hz.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import secrets
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from . import catalog_cache
+from .models import (
+    Acquisition,
+    AnalysisResult,
+    AnalysisRun,
+    Bridge,
+    Cable,
+    CableConfigSnapshot,
+    CableStateVersion,
+    KCalibration,
+    RawFile,
+    Sensor,
+    SensorInstallation,
+    StrandType,
+    User,
+    WeighingCampaign,
+    WeighingMeasurement,
+)
+from .security import hash_password
+from .storage import compression_for
+from .utils import add_months, save_upload
+
+G = 9.80665
+ALGORITHM_VERSION = "synthetic-v1"
+PARSER_VERSION = "synthetic-v1"
+SYNTHETIC_USERNAME = "synthetic"
+
+# nombre, diametro_mm, area_mm2, E_MPa, Fu por torón (tf), mu por torón (kg/m)
+STRAND_TYPES = (
+    ("SYN 0.5in", 12.7, 98.7, 195000.0, 18.7, 0.775),
+    ("SYN 0.6in", 15.2, 140.0, 195000.0, 26.6, 1.102),
+)
+STRAND_COUNTS = (19, 27, 31, 37, 43, 55, 61)
+
+# Orden de inserción (respeta las FK); también son las tablas cuyo max(id) se consulta
+TABLES = (
+    Bridge,
+    Cable,
+    CableStateVersion,
+    WeighingCampaign,
+    WeighingMeasurement,
+    CableConfigSnapshot,
+    KCalibration,
+    Sensor,
+    SensorInstallation,
+    Acquisition,
+    RawFile,
+    AnalysisRun,
+    AnalysisResult,
+)
+
+
+@dataclass(frozen=True)
+class SyntheticConfig:
+    bridges: int = 3
+    cables_per_bridge: int = 20
+    years: int = 3
+    acquisitions_per_month: int = 4
+    start: datetime = datetime(2020, 1, 1)
+    state_every_years: int = 2
+    fs_hz: float = 128.0
+    raw_seconds: float = 60.0
+    raw_every: int = 0  # CSV crudo para 1 de cada n adquisiciones; 0 = ninguno
+    harmonics: int = 5
+    seed: int = 0
+    batch_size: int = 5000
+
+    def bridge_name(self, b: int) -> str:
+        return f"SYN-{self.seed}-{b + 1:03d}"
+
+
+@dataclass
+class SyntheticSummary:
+    rows: Dict[str, int] = field(default_factory=dict)
+    skipped_bridges: List[str] = field(default_factory=list)
+    raw_bytes: int = 0
+    seconds: float = 0.0
+
+    def add(self, table: str, n: int) -> None:
+        self.rows[table] = self.rows.get(table, 0) + n
+
+
+def add_years(dt: datetime, years: int) -> datetime:
+    try:
+        return dt.replace(year=dt.year + years)
+    except ValueError:  # 29 de febrero
+        return dt.replace(year=dt.year + years, day=28)
+
+
+def harmonic_signals(
+    f0_hz: np.ndarray, fs_hz: float, seconds: float, rng: np.random.Generator, harmonics: int = 5, noise: float = 0.05
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Ambient-vibration-like signals, one column per f0: harmonics n·f0 (n < Nyquist)
+    with amplitudes ~1/n, random phases and a slowly varying envelope, plus white noise.
+    Returns (t, signals) with shapes (N,) and (N, len(f0_hz)).
+    """
+    f0_hz = np.asarray(f0_hz, dtype=float)
+    t = np.arange(int(round(seconds * fs_hz))) / fs_hz
+    signals = noise * rng.standard_normal((t.size, f0_hz.size))
+    for n in range(1, harmonics + 1):
+        freq = n * f0_hz
+        amp = np.where(freq < fs_hz / 2, rng.uniform(0.6, 1.0, f0_hz.size) / n, 0.0)
+        phase = rng.uniform(0, 2 * np.pi, f0_hz.size)
+        signals += amp * np.sin(2 * np.pi * np.outer(t, freq) + phase)
+    envelope = 1.0 + 0.3 * np.sin(2 * np.pi * t / max(seconds, 1.0) + rng.uniform(0, 2 * np.pi))
+    signals *= envelope[:, None]
+    return t, signals
+
+
+def raw_csv_bytes(t: np.ndarray, signals: np.ndarray, columns: Sequence[str], metadata: Dict[str, object]) -> bytes:
+    """Acquisition-system-style CSV: metadata lines, DATA_START, header row, then samples."""
+    buf = io.StringIO()
+    for key, value in metadata.items():
+        buf.write(f"{key},{value}\n")
+    buf.write("DATA_START\n")
+    buf.write(",".join(["time_s", *columns]) + "\n")
+    np.savetxt(buf, np.column_stack([t, signals]), delimiter=",", fmt="%.5f")
+    return buf.getvalue().encode("utf-8")
+
+
+class _Ids:
+    """Client-side primary key allocation, starting after the current max(id) of each table."""
+
+    def __init__(self, db: Session):
+        self._next = {t.__table__.name: (db.execute(select(func.max(t.id))).scalar() or 0) + 1 for t in TABLES}
+
+    def take(self, model, n: int) -> np.ndarray:
+        name = model.__table__.name
+        start = self._next[name]
+        self._next[name] = start + n
+        return np.arange(start, start + n)
+
+
+def _insert(db: Session, model, rows: List[dict], batch_size: int, summary: SyntheticSummary) -> None:
+    for offset in range(0, len(rows), batch_size):
+        db.execute(insert(model), rows[offset : offset + batch_size])
+    summary.add(model.__table__.name, len(rows))
+
+
+def _rows(keys: Sequence[str], *columns: Iterable) -> List[dict]:
+    return [dict(zip(keys, values)) for values in zip(*columns)]
+
+
+def _py(values: np.ndarray) -> list:
+    return values.tolist()
+
+
+def acquisition_times(cfg: SyntheticConfig, rng: np.random.Generator, not_before: datetime) -> List[datetime]:
+    """`acquisitions_per_month` per month at random days, from 10:00 on, so they never hit a validity boundary."""
+    times = []
+    for m in range(cfg.years * 12):
+        month_start = add_months(cfg.start, m)
+        days = rng.integers(0, 28, cfg.acquisitions_per_month)
+        minutes = rng.integers(0, 8 * 60, cfg.acquisitions_per_month)
+        for d, mi in zip(days, minutes):
+            at = month_start + timedelta(days=int(d), hours=10, minutes=int(mi))
+            if at > not_before:
+                times.append(at)
+    return sorted(times)
+
+
+def _setup(db: Session) -> Tuple[int, Dict[str, Tuple[int, tuple]]]:
+    user_id = db.execute(select(User.id).where(User.username == SYNTHETIC_USERNAME)).scalar()
+    if user_id is None:
+        user = User(
+            username=SYNTHETIC_USERNAME,
+            full_name="Synthetic dataset generator",
+            role="analyst",
+            password_hash=hash_password(secrets.token_hex(16)),
+        )
+        db.add(user)
+        db.flush()
+        user_id = user.id
+    strand_types = {}
+    for spec in STRAND_TYPES:
+        name, diam, area, e_mpa, fu_strand, mu_strand = spec
+        st_id = db.execute(select(StrandType.id).where(StrandType.nombre == name)).scalar()
+        if st_id is None:
+            st = StrandType(
+                nombre=name,
+                diametro_mm=diam,
+                area_mm2=area,
+                E_MPa=e_mpa,
+                Fu_default=fu_strand,
+                mu_por_toron_kg_m=mu_strand,
+                notas="Fu_default por torón; los estados sintéticos llevan Fu_override del cable",
+                created_by_user_id=user_id,
+            )
+            db.add(st)
+            db.flush()
+            st_id = st.id
+        strand_types[name] = (st_id, spec)
+    db.commit()
+    return user_id, strand_types
+
+
+def generate_bridge(
+    db: Session,
+    cfg: SyntheticConfig,
+    b: int,
+    ids: _Ids,
+    user_id: int,
+    strand_types: Dict[str, Tuple[int, tuple]],
+    data_root: Optional[Path],
+    summary: SyntheticSummary,
+) -> None:
+    rng = np.random.default_rng([cfg.seed, b])
+    n_cables = cfg.cables_per_bridge
+    bs = cfg.batch_size
+    name = cfg.bridge_name(b)
+    end = add_years(cfg.start, cfg.years)
+
+    bridge_id = int(ids.take(Bridge, 1)[0])
+    _insert(
+        db,
+        Bridge,
+        [
+            {
+                "id": bridge_id,
+                "nombre": name,
+                "clave_interna": f"SYN{cfg.seed}-{b + 1}",
+                "num_tirantes": n_cables,
+                "notas": "Puente sintético",
+                "created_by_user_id": user_id,
+            }
+        ],
+        bs,
+        summary,
+    )
+
+    # --- Cables y sus propiedades fijas ---
+    cable_ids = ids.take(Cable, n_cables)
+    cable_names = [f"T-{c + 1:02d}" for c in range(n_cables)]
+    length = np.round(rng.uniform(40.0, 220.0, n_cables), 2)
+    strands_total = rng.choice(STRAND_COUNTS, n_cables)
+    type_idx = rng.integers(0, len(STRAND_TYPES), n_cables)
+    type_names = [STRAND_TYPES[i][0] for i in type_idx]
+    diam, area, e_mpa, fu_strand, mu_strand = (
+        np.array([STRAND_TYPES[i][k] for i in type_idx]) for k in range(1, 6)
+    )
+    design_tension = np.round(0.40 * strands_total * fu_strand, 2)
+    _insert(
+        db,
+        Cable,
+        _rows(
+            ("id", "bridge_id", "nombre_en_puente", "created_by_user_id"),
+            _py(cable_ids),
+            [bridge_id] * n_cables,
+            cable_names,
+            [user_id] * n_cables,
+        ),
+        bs,
+        summary,
+    )
+
+    # --- Versiones de estado: una cada state_every_years, consecutivas [from, to) ---
+    state_starts = []
+    at = cfg.start
+    while at < end:
+        state_starts.append(at)
+        at = add_years(at, max(1, cfg.state_every_years))
+    n_states = len(state_starts)
+    lost = np.cumsum(rng.choice([0, 0, 0, 1, 2], (n_cables, n_states)), axis=1)
+    lost[:, 0] = 0
+    strands_active = strands_total[:, None] - np.minimum(lost, 6)
+    state_ids = ids.take(CableStateVersion, n_cables * n_states).reshape(n_cables, n_states)
+    state_rows = []
+    for c in range(n_cables):
+        for s in range(n_states):
+            active = int(strands_active[c, s])
+            state_rows.append(
+                {
+                    "id": int(state_ids[c, s]),
+                    "cable_id": int(cable_ids[c]),
+                    "valid_from": state_starts[s],
+                    "valid_to": state_starts[s + 1] if s + 1 < n_states else None,
+                    "length_effective_m": float(length[c]),
+                    "length_total_m": round(float(length[c]) * 1.04, 2),
+                    "strands_total": int(strands_total[c]),
+                    "strands_active": active,
+                    "strands_inactive": int(strands_total[c]) - active,
+                    "strand_type_id": strand_types[type_names[c]][0],
+                    "diametro_mm": float(diam[c]),
+                    "area_mm2": float(area[c]) * active,
+                    "E_MPa": float(e_mpa[c]),
+                    "mu_total_kg_m": round(float(mu_strand[c]) * int(strands_total[c]), 4),
+                    "mu_active_basis_kg_m": round(float(mu_strand[c]) * active, 4),
+                    "design_tension_tf": float(design_tension[c]),
+                    "Fu_override": round(float(fu_strand[c]) * active, 2),
+                    "source": "synthetic",
+                    "created_by_user_id": user_id,
+                }
+            )
+    _insert(db, CableStateVersion, state_rows, bs, summary)
+
+    # --- Campañas de pesaje anuales -> mediciones -> snapshots -> K con vigencia consecutiva ---
+    camp_times = [add_years(cfg.start, y) + timedelta(days=14, hours=8) for y in range(cfg.years)]
+    n_camps = len(camp_times)
+    camp_ids = ids.take(WeighingCampaign, n_camps)
+    _insert(
+        db,
+        WeighingCampaign,
+        _rows(
+            ("id", "bridge_id", "performed_at", "performed_by", "method", "equipment", "temperature_C", "created_by_user_id"),
+            _py(camp_ids),
+            [bridge_id] * n_camps,
+            camp_times,
+            ["Synthetic crew"] * n_camps,
+            ["lift-off"] * n_camps,
+            ["hydraulic jack"] * n_camps,
+            _py(np.round(rng.uniform(12.0, 32.0, n_camps), 1)),
+            [user_id] * n_camps,
+        ),
+        bs,
+        summary,
+    )
+    camp_state = np.searchsorted(np.array(state_starts, dtype="datetime64[us]"), np.array(camp_times, dtype="datetime64[us]"), "right") - 1
+    mu_at_camp = mu_strand[:, None] * strands_active[:, camp_state]
+    k_value = np.round(4.0 * mu_at_camp * length[:, None] ** 2 / (G * 1000.0) * rng.normal(1.0, 0.02, (n_cables, n_camps)), 4)
+    measured = np.round(design_tension[:, None] * rng.normal(1.0, 0.04, (n_cables, n_camps)), 2)
+    meas_ids = ids.take(WeighingMeasurement, n_cables * n_camps).reshape(n_cables, n_camps)
+    snap_ids = ids.take(CableConfigSnapshot, n_cables * n_camps).reshape(n_cables, n_camps)
+    k_ids = ids.take(KCalibration, n_cables * n_camps).reshape(n_cables, n_camps)
+    meas_rows, snap_rows, k_rows = [], [], []
+    for c in range(n_cables):
+        for y in range(n_camps):
+            s = int(camp_state[y])
+            meas_rows.append(
+                {
+                    "id": int(meas_ids[c, y]),
+                    "weighing_campaign_id": int(camp_ids[y]),
+                    "cable_id": int(cable_ids[c]),
+                    "measured_tension_tf": float(measured[c, y]),
+                }
+            )
+            snap_rows.append(
+                {
+                    "id": int(snap_ids[c, y]),
+                    "cable_id": int(cable_ids[c]),
+                    "source_state_version_id": int(state_ids[c, s]),
+                    "effective_length_m": float(length[c]),
+                    "mu_basis": "active",
+                    "mu_value_kg_m": round(float(mu_at_camp[c, y]), 4),
+                    "strands_active": int(strands_active[c, s]),
+                    "strands_total": int(strands_total[c]),
+                    "strand_type_id": strand_types[type_names[c]][0],
+                    "created_by_user_id": user_id,
+                }
+            )
+            k_rows.append(
+                {
+                    "id": int(k_ids[c, y]),
+                    "cable_id": int(cable_ids[c]),
+                    "derived_from_weighing_measurement_id": int(meas_ids[c, y]),
+                    "config_snapshot_id": int(snap_ids[c, y]),
+                    "k_value": float(k_value[c, y]),
+                    "valid_from": camp_times[y],
+                    "valid_to": camp_times[y + 1] if y + 1 < n_camps else None,
+                    "algorithm_version": ALGORITHM_VERSION,
+                    "computed_by_user_id": user_id,
+                }
+            )
+    _insert(db, WeighingMeasurement, meas_rows, bs, summary)
+    _insert(db, CableConfigSnapshot, snap_rows, bs, summary)
+    _insert(db, KCalibration, k_rows, bs, summary)
+
+    # --- Un sensor por cable, instalado desde el inicio ---
+    sensor_ids = ids.take(Sensor, n_cables)
+    serials = [f"SYN{cfg.seed}-B{b + 1:03d}-{cn}" for cn in cable_names]
+    _insert(
+        db,
+        Sensor,
+        _rows(
+            ("id", "sensor_type", "serial_or_asset_id", "unit", "created_by_user_id"),
+            _py(sensor_ids),
+            ["acc"] * n_cables,
+            serials,
+            ["g"] * n_cables,
+            [user_id] * n_cables,
+        ),
+        bs,
+        summary,
+    )
+    _insert(
+        db,
+        SensorInstallation,
+        _rows(
+            ("id", "sensor_id", "cable_id", "installed_from", "height_m", "created_by_user_id"),
+            _py(ids.take(SensorInstallation, n_cables)),
+            _py(sensor_ids),
+            _py(cable_ids),
+            [cfg.start] * n_cables,
+            _py(np.round(rng.uniform(1.5, 3.5, n_cables), 2)),
+            [user_id] * n_cables,
+        ),
+        bs,
+        summary,
+    )
+
+    # --- Adquisiciones, corridas y resultados ---
+    acq_times = acquisition_times(cfg, rng, not_before=camp_times[0])
+    n_acq = len(acq_times)
+    if not n_acq:
+        return
+    acq_ids = ids.take(Acquisition, n_acq)
+    _insert(
+        db,
+        Acquisition,
+        _rows(
+            ("id", "bridge_id", "acquired_at", "operator_user_id", "Fs_Hz", "created_by_user_id"),
+            _py(acq_ids),
+            [bridge_id] * n_acq,
+            acq_times,
+            [user_id] * n_acq,
+            [cfg.fs_hz] * n_acq,
+            [user_id] * n_acq,
+        ),
+        bs,
+        summary,
+    )
+    run_ids = ids.take(AnalysisRun, n_acq)
+    _insert(
+        db,
+        AnalysisRun,
+        _rows(
+            ("id", "acquisition_id", "created_by_user_id", "algorithm_version", "created_at"),
+            _py(run_ids),
+            _py(acq_ids),
+            [user_id] * n_acq,
+            [ALGORITHM_VERSION] * n_acq,
+            [t + timedelta(hours=1) for t in acq_times],
+        ),
+        bs,
+        summary,
+    )
+
+    acq_np = np.array(acq_times, dtype="datetime64[us]")
+    k_idx = np.searchsorted(np.array(camp_times, dtype="datetime64[us]"), acq_np, "right") - 1
+    years_in = (acq_np - np.datetime64(cfg.start, "us")) / np.timedelta64(1, "D") / 365.25
+    season_phase = rng.uniform(0, 2 * np.pi, n_cables)
+    drift = rng.normal(0.0, 0.01, n_cables)  # pérdida/ganancia relativa de tensión por año
+    # Tensión (adquisición x cable): diseño con variación estacional, deriva y ruido
+    tension = design_tension[None, :] * (
+        1.0
+        + 0.03 * np.sin(2 * np.pi * years_in[:, None] + season_phase[None, :])
+        + drift[None, :] * years_in[:, None]
+        + rng.normal(0.0, 0.015, (n_acq, n_cables))
+    )
+    k_used = k_value[:, k_idx].T
+    f0 = np.round(np.sqrt(tension / k_used), 4)
+    tension = np.round(k_used * f0**2, 3)
+    snr = np.round(rng.gamma(6.0, 4.0, (n_acq, n_cables)), 2)
+    quality = np.where(snr < 8, "bad", np.where(snr < 14, "doubtful", "ok"))
+    k_used_ids = k_ids[:, k_idx].T
+    df_hz = cfg.fs_hz / 4096
+    result_ids = ids.take(AnalysisResult, n_acq * n_cables).reshape(n_acq, n_cables)
+
+    keys = (
+        "id", "analysis_run_id", "cable_id", "f0_hz", "harmonics_json", "k_used_value",
+        "k_used_calibration_id", "tension_tf", "df_hz", "snr_metric", "quality_flag", "created_at",
+    )  # fmt: skip
+    cable_id_list = _py(cable_ids)
+    rows_per_chunk = max(1, bs // n_cables)
+    for lo in range(0, n_acq, rows_per_chunk):
+        hi = min(n_acq, lo + rows_per_chunk)
+        rows = []
+        for a in range(lo, hi):
+            f0_a = _py(f0[a])
+            created = acq_times[a] + timedelta(hours=1)
+            rows += _rows(
+                keys,
+                _py(result_ids[a]),
+                [int(run_ids[a])] * n_cables,
+                cable_id_list,
+                f0_a,
+                [[round(f * n, 4) for n in (1, 2, 3)] for f in f0_a],
+                _py(k_used[a]),
+                _py(k_used_ids[a]),
+                _py(tension[a]),
+                [df_hz] * n_cables,
+                _py(snr[a]),
+                _py(quality[a]),
+                [created] * n_cables,
+            )
+        _insert(db, AnalysisResult, rows, bs, summary)
+
+    # --- CSV crudos con la misma f0 por cable ---
+    if not cfg.raw_every or data_root is None:
+        return
+    raw_rows = []
+    raw_acqs = range(0, n_acq, cfg.raw_every)
+    raw_ids = ids.take(RawFile, len(raw_acqs))
+    for raw_id, a in zip(_py(raw_ids), raw_acqs):
+        t, signals = harmonic_signals(f0[a], cfg.fs_hz, cfg.raw_seconds, rng, cfg.harmonics)
+        content = raw_csv_bytes(
+            t,
+            signals,
+            serials,
+            {"bridge": name, "acquired_at": acq_times[a].isoformat(), "Fs_Hz": cfg.fs_hz, "generator": ALGORITHM_VERSION},
+        )
+        file_name = f"{name}_{int(acq_ids[a])}.csv"
+        path, digest = save_upload(data_root, "raw", file_name, content, compression_for("raw_csv"))
+        summary.raw_bytes += len(content)
+        raw_rows.append(
+            {
+                "id": raw_id,
+                "acquisition_id": int(acq_ids[a]),
+                "file_kind": "raw_csv",
+                "storage_path": str(path),
+                "original_filename": file_name,
+                "sha256": digest,
+                "file_size_bytes": len(content),
+                "parser_version": PARSER_VERSION,
+            }
+        )
+    _insert(db, RawFile, raw_rows, bs, summary)
+
+
+def _sync_sequences(db: Session) -> None:
+    # Con ids explícitos las secuencias de Postgres no avanzan; se alinean con max(id)
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for model in TABLES:
+        table = model.__table__.name
+        db.execute(
+            text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT COALESCE(MAX(id), 1) FROM {table}))")
+        )
+    db.commit()
+
+
+def generate(db: Session, cfg: SyntheticConfig, data_root: Optional[Path] = None) -> SyntheticSummary:
+    """Generates `cfg.bridges` bridges, committing after each one; existing bridges are skipped."""
+    start = time.perf_counter()
+    summary = SyntheticSummary()
+    user_id, strand_types = _setup(db)
+    existing = set(db.execute(select(Bridge.nombre).where(Bridge.nombre.like(f"SYN-{cfg.seed}-%"))).scalars())
+    try:
+        for b in range(cfg.bridges):
+            if cfg.bridge_name(b) in existing:
+                summary.skipped_bridges.append(cfg.bridge_name(b))
+                continue
+            ids = _Ids(db)
+            try:
+                generate_bridge(db, cfg, b, ids, user_id, strand_types, data_root, summary)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            # Los catálogos cambiaron fuera de la API: invalidar las respuestas cacheadas
+            catalog_cache.bump()
+    finally:
+        # También si un puente falla: los ya confirmados usaron ids explícitos
+        _sync_sequences(db)
+    summary.seconds = time.perf_counter() - start
+    return summary
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera un dataset sintético a escala en DATABASE_URL / DATA_ROOT.")
+    parser.add_argument("--bridges", type=int, default=3)
+    parser.add_argument("--cables", type=int, default=20, help="Tirantes por puente")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--acq-per-month", type=int, default=4)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=datetime(2020, 1, 1))
+    parser.add_argument("--state-every-years", type=int, default=2)
+    parser.add_argument("--fs-hz", type=float, default=128.0)
+    parser.add_argument("--raw-seconds", type=float, default=60.0)
+    parser.add_argument("--raw-every", type=int, default=0, help="CSV crudo para 1 de cada n adquisiciones (0: ninguno)")
+    parser.add_argument("--harmonics", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    from .config import get_settings
+    from .db import BatchSessionLocal, init_db
+
+    cfg = SyntheticConfig(
+        bridges=args.bridges,
+        cables_per_bridge=args.cables,
+        years=args.years,
+        acquisitions_per_month=args.acq_per_month,
+        start=args.start,
+        state_every_years=args.state_every_years,
+        fs_hz=args.fs_hz,
+        raw_seconds=args.raw_seconds,
+        raw_every=args.raw_every,
+        harmonics=args.harmonics,
+        seed=args.seed,
+        batch_size=args.batch_size,
+    )
+    init_db()
+    with BatchSessionLocal() as db:
+        summary = generate(db, cfg, Path(get_settings().data_root))
+    for table, n in summary.rows.items():
+        print(f"{table:<26} {n:>12,}")
+    if summary.skipped_bridges:
+        print(f"Puentes ya existentes (omitidos): {', '.join(summary.skipped_bridges)}")
+    if summary.raw_bytes:
+        print(f"CSV crudos: {summary.raw_bytes / 1e6:.1f} MB")
+    print(f"Listo en {summary.seconds:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,67 @@
+import gzip
+import hashlib
+import io
+import json
 import os
-from datetime import datetime, timezone
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
 
+import numpy as np
+import pandas as pd
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event, text
 
 os.environ["DATABASE_URL"] = "sqlite:///./test_api.db"
+os.environ.setdefault("DATA_ROOT", tempfile.mkdtemp(prefix="cempei_test_"))
 
+from app.api import catalog_cache  # noqa: E402
+from app.auth_cache import token_cache, user_cache  # noqa: E402
+from app.config import get_settings  # noqa: E402
+from app.benchmarks import api as api_bench  # noqa: E402
+from app.benchmarks import micro  # noqa: E402
+from app.benchmarks.report import compare, print_table  # noqa: E402
+from app.batch_ingest import hash_file, ingest, load_manifest  # noqa: E402
+from app.audit import audit_writer, log_action, use_async_audit  # noqa: E402
 from app.db import Base, SessionLocal, engine, get_db  # noqa: E402
+from app.index_advisor import advise, sequential_scans  # noqa: E402
 from app.main import app  # noqa: E402
+from app.metrics import DBStats, RequestMetrics, _db_stats, request_metrics  # noqa: E402
+from app.query_budget import QueryBudgetExceeded, count_queries, query_budget, statement_shape  # noqa: E402
 from app.models import (  # noqa: E402
+    Acquisition,
+    AcquisitionChannel,
+    AuditLog,
+    AnalysisResult,
+    AnalysisRun,
+    Bridge,
+    Cable,
     CableConfigSnapshot,
     CableStateVersion,
     KCalibration,
+    RawFile,
+    Sensor,
+    SensorInstallation,
+    StorageScrubRun,
+    StrandType,
+    User,
+    WeighingAttachment,
     WeighingCampaign,
     WeighingMeasurement,
 )
+from app.security import create_access_token, hash_password  # noqa: E402
+from app.services import pyramid, signals  # noqa: E402
+from app.services.ingestion import _read_csv_after_data_start  # noqa: E402
+from app.scrub import RateLimiter, record_scrub, scrub  # noqa: E402
+from app import tiering  # noqa: E402
+from app.storage import HotCache, archive_root, codec_for_path, read_stored, write_stored  # noqa: E402
+from app.synthetic import SyntheticConfig, generate  # noqa: E402
+from app.utils import add_months, save_upload  # noqa: E402
 
 
 def override_get_db():
@@ -32,6 +79,9 @@ app.dependency_overrides[get_db] = override_get_db
 def clean_db():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    catalog_cache.clear()
+    token_cache.clear()
+    user_cache.clear()
     yield
     Base.metadata.drop_all(bind=engine)
 
@@ -39,6 +89,15 @@ def clean_db():
 client = TestClient(app)
 
 
+def admin_headers(username: str = "root") -> dict:
+    with SessionLocal() as db:
+        user = User(username=username, full_name="Root", role="admin", password_hash=hash_password("secret"))
+        db.add(user)
+        db.commit()
+        token = create_access_token({"sub": str(user.id)})
+    return {"Authorization": f"Bearer {token}"}
+
+
 def test_full_flow_semáforo_alerta():
     # 1) Crear usuario
     user_resp = client.post(
@@ -169,3 +228,1200 @@ def test_full_flow_semáforo_alerta():
     assert data["total"] == 1
     assert data["exceden"] == 1
     assert data["items"][0]["estado"] == "ALERTA"
+
+
+def seed_bridge_history(n_cables: int = 2, acquisitions: list[tuple[datetime, list[float]]] | None = None):
+    """Creates a bridge with cables, one open state (Fu 100), one K and one run/result per acquisition."""
+    acquisitions = acquisitions or []
+    with SessionLocal() as db:
+        user = User(username="seed", role="admin", password_hash="x")
+        st = StrandType(
+            nombre="7-0.6", diametro_mm=15.0, area_mm2=140.0, E_MPa=195000, Fu_default=100.0, mu_por_toron_kg_m=1.0
+        )
+        db.add_all([user, st])
+        db.flush()
+        bridge = Bridge(nombre="Puente seed", created_by_user_id=user.id)
+        db.add(bridge)
+        db.flush()
+        wc = WeighingCampaign(
+            bridge_id=bridge.id, performed_at=datetime(2023, 1, 1), performed_by="team", method="jack", equipment="j"
+        )
+        db.add(wc)
+        db.flush()
+        cables, ks = [], []
+        for idx in range(n_cables):
+            cable = Cable(bridge_id=bridge.id, nombre_en_puente=f"T-{idx + 1:02d}")
+            db.add(cable)
+            db.flush()
+            db.add(
+                CableStateVersion(
+                    cable_id=cable.id,
+                    valid_from=datetime(2023, 1, 1),
+                    valid_to=None,
+                    length_effective_m=100.0,
+                    strands_total=7,
+                    strands_active=7,
+                    strand_type_id=st.id,
+                    diametro_mm=15.0,
+                    area_mm2=140.0,
+                    E_MPa=195000,
+                    mu_total_kg_m=12.0,
+                    mu_active_basis_kg_m=12.0,
+                    design_tension_tf=80.0,
+                )
+            )
+            meas = WeighingMeasurement(weighing_campaign_id=wc.id, cable_id=cable.id, measured_tension_tf=50.0)
+            db.add(meas)
+            db.flush()
+            snap = CableConfigSnapshot(
+                cable_id=cable.id, effective_length_m=100.0, mu_basis="active", mu_value_kg_m=12.0,
+                strands_active=7, strands_total=7,
+            )
+            db.add(snap)
+            db.flush()
+            kc = KCalibration(
+                cable_id=cable.id, derived_from_weighing_measurement_id=meas.id, config_snapshot_id=snap.id,
+                k_value=1.0, valid_from=datetime(2023, 1, 1), algorithm_version="v1.0",
+            )
+            db.add(kc)
+            db.flush()
+            cables.append(cable.id)
+            ks.append(kc.id)
+        acq_ids = []
+        for acquired_at, tensions in acquisitions:
+            acq = Acquisition(bridge_id=bridge.id, acquired_at=acquired_at, Fs_Hz=128.0)
+            db.add(acq)
+            db.flush()
+            run = AnalysisRun(acquisition_id=acq.id, algorithm_version="v1.0")
+            db.add(run)
+            db.flush()
+            for cable_id, kc_id, tension in zip(cables, ks, tensions):
+                if tension is None:
+                    continue
+                db.add(
+                    AnalysisResult(
+                        analysis_run_id=run.id, cable_id=cable_id, f0_hz=tension ** 0.5, k_used_value=1.0,
+                        k_used_calibration_id=kc_id, tension_tf=tension, quality_flag="ok",
+                    )
+                )
+            acq_ids.append(acq.id)
+        db.commit()
+        return {"user_id": user.id, "bridge_id": bridge.id, "cable_ids": cables, "acquisition_ids": acq_ids}
+
+
+def test_semaforo_timeline_matrix():
+    seed = seed_bridge_history(
+        n_cables=2,
+        acquisitions=[
+            (datetime(2024, 1, 1), [40.0, 50.0]),
+            (datetime(2024, 2, 1), [60.0, None]),
+            (datetime(2025, 1, 1), [10.0, 10.0]),
+        ],
+    )
+    resp = client.get(
+        f"/bridges/{seed['bridge_id']}/semaforo/timeline", params={"date_to": "2024-12-31T00:00:00"}
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert [a["id"] for a in data["acquisitions"]] == seed["acquisition_ids"][:2]
+    assert [c["nombre_en_puente"] for c in data["cables"]] == ["T-01", "T-02"]
+    assert data["pct_fu"] == [[40.0, 50.0], [60.0, None]]
+    assert data["estado"] == [["OK", "ALERTA"], ["ALERTA", None]]
+    assert data["exceden"] == [1, 1]
+
+
+def test_semaforo_async_read_path():
+    seed = seed_bridge_history(n_cables=3, acquisitions=[(datetime(2024, 1, 1), [40.0, 70.0, 50.0])])
+    resp = client.get(
+        f"/bridges/{seed['bridge_id']}/semaforo",
+        params={"acquisition_id": seed["acquisition_ids"][0], "top_n": 2},
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert (data["total"], data["exceden"]) == (3, 2)
+    assert [(i["nombre_en_puente"], i["fu"], i["estado"]) for i in data["items"]] == [
+        ("T-02", 100.0, "ALERTA"),
+        ("T-03", 100.0, "ALERTA"),
+    ]
+    assert client.get(f"/bridges/{seed['bridge_id']}/semaforo", params={"acquisition_id": 999}).status_code == 404
+
+
+def test_history_keyset_pagination_and_streaming():
+    seed = seed_bridge_history(
+        n_cables=2,
+        acquisitions=[(datetime(2024, 1, d), [10.0 + d, 20.0 + d]) for d in range(1, 4)],
+    )
+    params = {"bridge_id": seed["bridge_id"], "limit": 4}
+    first = client.get("/history", params=params).json()
+    assert len(first["results"]) == 4
+    cursor = first["next_cursor"]
+    assert cursor is not None
+    second = client.get("/history", params={**params, **cursor}).json()
+    assert len(second["results"]) == 2
+    assert second["next_cursor"] is None
+    tensions = [r["tension_tf"] for r in first["results"] + second["results"]]
+    assert tensions == [11.0, 21.0, 12.0, 22.0, 13.0, 23.0]
+
+    ndjson = client.get("/history", params={"bridge_id": seed["bridge_id"], "format": "ndjson"})
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert [row["tension_tf"] for row in lines] == tensions
+
+    csv_resp = client.get("/history", params={"bridge_id": seed["bridge_id"], "format": "csv", "limit": 2})
+    rows = csv_resp.text.strip().splitlines()
+    assert rows[0].startswith("cable_id,nombre_en_puente,acquired_at")
+    assert len(rows) == 3
+
+
+def test_history_bucket_aggregation():
+    seed = seed_bridge_history(
+        n_cables=1,
+        acquisitions=[(datetime(2024, 1, 1), [10.0]), (datetime(2024, 1, 15), [30.0]), (datetime(2024, 2, 1), [40.0])],
+    )
+    data = client.get("/history", params={"bridge_id": seed["bridge_id"], "bucket": "month"}).json()
+    assert data["results"] == []
+    assert [b["count"] for b in data["buckets"]] == [2, 1]
+    assert data["buckets"][0]["tension_tf_mean"] == 20.0
+    assert data["buckets"][0]["tension_tf_max"] == 30.0
+
+    bad = client.get("/history", params={"bucket": "month", "format": "csv"})
+    assert bad.status_code == 400
+
+
+def test_history_max_points_keeps_shape_per_cable():
+    values = [10.0, 12.0, 50.0, 11.0, 13.0, 12.0]
+    seed = seed_bridge_history(
+        n_cables=2,
+        acquisitions=[(datetime(2024, 1, day + 1), [v, v + 100.0]) for day, v in enumerate(values)],
+    )
+    data = client.get("/history", params={"bridge_id": seed["bridge_id"], "max_points": 3}).json()
+    by_cable = {}
+    for item in data["results"]:
+        by_cable.setdefault(item["cable_id"], []).append(item["tension_tf"])
+    # LTTB conserva extremos y el pico; el orden temporal global se mantiene
+    assert by_cable == {seed["cable_ids"][0]: [10.0, 50.0, 12.0], seed["cable_ids"][1]: [110.0, 150.0, 112.0]}
+    assert [r["acquired_at"] for r in data["results"]] == sorted(r["acquired_at"] for r in data["results"])
+
+
+def test_columnar_json_for_bulk_reads():
+    seed = seed_bridge_history(n_cables=2, acquisitions=[(datetime(2024, 1, 1), [10.0, 20.0])])
+    headers = {"Accept": "application/vnd.cempei.columnar+json"}
+
+    cables = client.get("/cables", headers=headers)
+    assert cables.headers["content-type"] == "application/vnd.cempei.columnar+json"
+    assert cables.json()["nombre_en_puente"] == ["T-01", "T-02"]
+    assert set(cables.json()) == {"bridge_id", "nombre_en_puente", "notas", "id"}
+
+    hist = client.get("/history", params={"bridge_id": seed["bridge_id"], "limit": 1}, headers=headers)
+    assert hist.json()["tension_tf"] == [10.0]
+    assert hist.headers["X-Next-After-Id"]
+
+    kcal = client.get("/k-calibrations", params={"cable_id": seed["cable_ids"][0]}, headers=headers).json()
+    assert kcal["k_value"] == [1.0]
+
+    # Sin Accept columnar se conserva la lista de objetos
+    assert isinstance(client.get("/cables").json(), list)
+
+
+def test_catalog_cache_etag_and_invalidation():
+    headers = admin_headers()
+    client.post("/bridges", json={"nombre": "Puente A", "num_tirantes": 2}, headers=headers)
+
+    first = client.get("/bridges")
+    etag = first.headers["ETag"]
+    assert [b["nombre"] for b in first.json()] == ["Puente A"]
+    assert client.get("/bridges", headers={"If-None-Match": etag}).status_code == 304
+    assert len(client.get("/cables").json()) == 2
+
+    client.post("/bridges", json={"nombre": "Puente B"}, headers=headers)
+    after = client.get("/bridges", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert [b["nombre"] for b in after.json()] == ["Puente A", "Puente B"]
+
+
+STRAND_TYPE = {"diametro_mm": 15.0, "area_mm2": 140.0, "E_MPa": 195000, "Fu_default": 100.0, "mu_por_toron_kg_m": 1.0}
+
+
+def test_authentication_is_cached_and_invalidated_on_user_change():
+    headers = admin_headers()
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.post("/strand-types", json={**STRAND_TYPE, "nombre": "A"}, headers=headers).status_code == 200
+        assert client.post("/strand-types", json={**STRAND_TYPE, "nombre": "B"}, headers=headers).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert sum("FROM users" in sql for sql in statements) == 1
+
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == "root").one()
+        user.role = "viewer"
+        db.commit()
+    assert client.post("/strand-types", json={**STRAND_TYPE, "nombre": "C"}, headers=headers).status_code == 403
+
+
+def test_token_cache_rejects_expired_tokens():
+    token = create_access_token({"sub": "1"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(Exception):
+        token_cache.decode(token)
+    valid = create_access_token({"sub": "1"})
+    assert token_cache.decode(valid) is token_cache.decode(valid)
+
+
+def test_cold_import_skips_heavy_modules_and_ddl(tmp_path):
+    db_path = tmp_path / "cold.db"
+    script = (
+        "import sys, app.main; from sqlalchemy import inspect; from app.db import engine; "
+        "assert not {'numpy', 'pandas'} & set(sys.modules), sorted({'numpy', 'pandas'} & set(sys.modules)); "
+        "assert inspect(engine).get_table_names() == []"
+    )
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}"}
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    proc = subprocess.run([sys.executable, "-c", script], env=env, cwd=backend_dir, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+
+    report = client.get("/startup", headers=admin_headers()).json()
+    assert "app.api" in report["boot_imports"]
+    assert report["phases"]["import"] > 0
+
+
+def test_metrics_endpoint_reports_route_latency_and_sql():
+    request_metrics.reset()
+    headers = admin_headers()
+    bridge_id = client.post("/bridges", json={"nombre": "Puente M", "num_tirantes": 2}, headers=headers).json()["id"]
+    client.get(f"/bridges/{bridge_id}/semaforo", params={"acquisition_id": 998})
+    client.get("/bridges/999/semaforo", params={"acquisition_id": 999})
+    client.get("/history", params={"bridge_id": bridge_id, "format": "csv"})
+
+    resp = client.get("/metrics", headers=headers)
+    assert resp.headers["content-type"].startswith("text/plain")
+    lines = {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in resp.text.splitlines() if not line.startswith("#")}
+    route = 'method="GET",route="/bridges/{bridge_id}/semaforo"'
+    assert lines[f"http_request_duration_seconds_count{{{route}}}"] == 2
+    assert lines[f'http_requests_total{{{route},status="404"}}'] == 2
+    assert lines[f'http_request_db_statements_count{{method="POST",route="/bridges"}}'] == 1
+    assert lines[f'http_request_db_statements_sum{{method="POST",route="/bridges"}}'] >= 3
+    assert lines['http_request_db_statements_sum{method="GET",route="/history"}'] == 1
+    assert lines['http_response_size_bytes_sum{method="GET",route="/history"}'] > 0
+    assert lines['http_requests_in_flight{method="GET"}'] == 1  # la propia petición a /metrics
+
+
+def test_metrics_failed_statement_leaves_no_state_on_connection():
+    stats = DBStats()
+    token = _db_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM tabla_inexistente"))
+            conn.execute(text("SELECT 1"))
+            assert "metrics_query_start" not in conn.info
+    finally:
+        _db_stats.reset(token)
+    assert stats.statements == 1 and stats.by_statement == {"SELECT 1": 1}
+
+
+def test_profiling_hook_is_admin_only_and_stores_profiles():
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=2, acquisitions=[(datetime(2024, 1, 1), [40.0, 50.0])])
+    assert client.get("/history", params={"bridge_id": seed["bridge_id"]}).headers.get("X-Profile-Id") is None
+    assert client.get("/history", headers={"X-Profile": "1"}).status_code == 403
+
+    resp = client.get("/history", params={"bridge_id": seed["bridge_id"], "profile": "1"}, headers=headers)
+    assert resp.status_code == 200 and len(resp.json()["results"]) == 2
+    async_id = resp.headers["X-Profile-Id"]
+    resp = client.post("/bridges", json={"nombre": "Puente P", "num_tirantes": 3}, headers={**headers, "X-Profile": "1"})
+    sync_id = resp.headers["X-Profile-Id"]
+
+    listed = [p["profile_id"] for p in client.get("/profiles", headers=headers).json()]
+    assert {async_id, sync_id} <= set(listed)
+    profile = client.get(f"/profiles/{sync_id}", headers=headers).json()
+    assert profile["path"] == "/bridges" and profile["status"] == 200
+    assert any("create_bridge" in f["function"] for f in profile["top_functions"])
+    assert any(q["statement"].startswith("INSERT INTO bridges") for q in profile["sql_statements"])
+    assert client.get(f"/profiles/{async_id}", headers=headers).json()["sql_by_statement"]
+    assert client.get(f"/profiles/{sync_id}/pstats", headers=headers).content
+    assert client.get("/profiles/../../etc", headers=headers).status_code == 404
+
+
+def test_index_advisor_hot_queries_are_index_driven():
+    with SessionLocal() as db:
+        report = advise(db)
+    assert report and all(tables == [] for tables in report.values()), report
+    assert sequential_scans(["Seq Scan on analysis_results  (cost=0.00..1.00 rows=1 width=8)"]) == ["analysis_results"]
+    assert sequential_scans(["SCAN acquisitions"]) == ["acquisitions"]
+
+
+def test_pool_stats_reports_checkouts(monkeypatch):
+    headers = admin_headers()
+    client.get("/bridges")
+    stats = client.get("/pool-stats", headers=headers).json()
+    interactive = stats["interactive"]
+    assert interactive["pool_class"] == "InstrumentedQueuePool"
+    assert interactive["checkouts"] >= 1
+    assert sum(interactive["wait_histogram"].values()) == interactive["checkouts"]
+    assert "batch" in stats
+
+    # Las lecturas async usan su propio pool, también instrumentado
+    client.get("/history")
+    async_pool = client.get("/pool-stats", headers=headers).json()["async"]
+    assert async_pool["pool_class"] == "InstrumentedNullPool" and async_pool["checkouts"] >= 1
+
+    # Endpoints operativos: sin token o con token inválido 401, con OPS_TOKEN (scraper) 200
+    monkeypatch.setattr(get_settings(), "ops_token", "scraper-secret")
+    for path in ("/pool-stats", "/metrics", "/startup"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer otro"}).status_code == 401
+        assert client.get(path, headers={"Authorization": "Bearer scraper-secret"}).status_code == 200
+
+
+def test_create_bridge_audits_in_single_commit():
+    headers = admin_headers()
+    commits = []
+    listener = lambda conn: commits.append(conn)  # noqa: E731
+    event.listen(engine, "commit", listener)
+    try:
+        resp = client.post("/bridges", json={"nombre": "Puente grande", "num_tirantes": 200}, headers=headers)
+    finally:
+        event.remove(engine, "commit", listener)
+    assert resp.status_code == 200
+    assert len(commits) == 1
+    with SessionLocal() as db:
+        actions = [a for (a,) in db.query(AuditLog.action).all()]
+    assert actions.count("create_placeholder") == 200
+    assert actions.count("create") == 1
+
+
+def test_audit_entries_discarded_on_rollback():
+    with SessionLocal() as db:
+        db.add(Bridge(nombre="Puente descartado"))
+        db.flush()
+        log_action(db, "bridge", 1, "create", None)
+        db.rollback()
+        db.commit()
+        assert db.query(AuditLog).count() == 0
+
+
+def test_async_audit_writer_drains_queue():
+    with SessionLocal() as db:
+        use_async_audit(db)
+        db.add(Bridge(nombre="Puente import"))
+        db.flush()
+        for idx in range(10):
+            log_action(db, "cable", idx, "import", None)
+        db.commit()
+    audit_writer.flush()
+    with SessionLocal() as db:
+        assert db.query(AuditLog).filter(AuditLog.action == "import").count() == 10
+
+
+def catalog_payload(n_cables: int, strand_type: str = "7-0.6") -> dict:
+    state = {
+        "valid_from": "2024-01-01T00:00:00",
+        "valid_to": None,
+        "length_effective_m": 100.0,
+        "strands_total": 7,
+        "strands_active": 7,
+        "strand_type_nombre": strand_type,
+        "diametro_mm": 15.0,
+        "area_mm2": 140.0,
+        "E_MPa": 195000,
+        "mu_total_kg_m": 12.0,
+        "mu_active_basis_kg_m": 12.0,
+        "design_tension_tf": 80.0,
+    }
+    return {
+        "bridge": {"nombre": "Puente importado"},
+        "cables": [{"nombre_en_puente": f"T-{i:03d}", "states": [state]} for i in range(1, n_cables + 1)],
+        "sensors": [{"sensor_type": "acc", "serial_or_asset_id": f"S-{i}", "unit": "g"} for i in range(1, n_cables + 1)],
+        "installations": [
+            {"sensor_serial": f"S-{i}", "cable_nombre": f"T-{i:03d}", "installed_from": "2024-01-01T00:00:00", "height_m": 2.0}
+            for i in range(1, n_cables + 1)
+        ],
+    }
+
+
+def test_catalog_bulk_import_json_and_validation():
+    headers = admin_headers()
+    with SessionLocal() as db:
+        db.add(StrandType(nombre="7-0.6", diametro_mm=15.0, area_mm2=140.0, E_MPa=195000, Fu_default=100.0, mu_por_toron_kg_m=1.0))
+        db.commit()
+
+    bad = catalog_payload(3)
+    bad["cables"][0]["states"].append(dict(bad["cables"][0]["states"][0], valid_from="2024-06-01T00:00:00"))
+    bad["installations"].append(dict(bad["installations"][0], cable_nombre="T-002"))
+    resp = client.post("/catalog/import", json=bad, headers=headers)
+    assert resp.status_code == 400
+    assert len(resp.json()["detail"]) == 2
+    with SessionLocal() as db:
+        assert db.query(Cable).count() == 0
+
+    resp = client.post("/catalog/import", json=catalog_payload(150), headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["cables"] == 150 and resp.json()["installations"] == 150
+    with SessionLocal() as db:
+        assert db.query(CableStateVersion).count() == 150
+        assert db.query(AuditLog).count() == 1 + 150 * 4
+
+
+def test_catalog_bulk_import_csv_bundle():
+    headers = admin_headers()
+    with SessionLocal() as db:
+        db.add(StrandType(nombre="7-0.6", diametro_mm=15.0, area_mm2=140.0, E_MPa=195000, Fu_default=100.0, mu_por_toron_kg_m=1.0))
+        db.commit()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as bundle:
+        bundle.writestr("bridge.csv", "nombre,clave_interna\nPuente CSV,PC\n")
+        bundle.writestr("cables.csv", "nombre_en_puente,notas\nT-01,\nT-02,\n")
+        bundle.writestr(
+            "states.csv",
+            "cable_nombre,valid_from,valid_to,length_effective_m,strands_total,strands_active,strand_type_nombre,"
+            "diametro_mm,area_mm2,E_MPa,mu_total_kg_m,mu_active_basis_kg_m,design_tension_tf\n"
+            "T-01,2024-01-01T00:00:00,,100,7,7,7-0.6,15,140,195000,12,12,80\n",
+        )
+        bundle.writestr("sensors.csv", "sensor_type,serial_or_asset_id,unit\nacc,S-9,g\n")
+        bundle.writestr("installations.csv", "sensor_serial,cable_nombre,installed_from,height_m\nS-9,T-02,2024-01-01T00:00:00,3\n")
+    resp = client.post(
+        "/catalog/import/csv", files={"file": ("catalog.zip", buffer.getvalue(), "application/zip")}, headers=headers
+    )
+    assert resp.status_code == 200, resp.text
+    assert resp.json() == {"bridge_id": resp.json()["bridge_id"], "cables": 2, "states": 1, "sensors": 1, "installations": 1}
+
+    duplicated = io.BytesIO()
+    with zipfile.ZipFile(duplicated, "w") as bundle:
+        bundle.writestr("bridge.csv", "nombre\nPuente CSV dup\n")
+        bundle.writestr("cables.csv", "nombre_en_puente,notas\nT-01,a\nT-02,\nT-01,b\n")
+    resp = client.post(
+        "/catalog/import/csv", files={"file": ("catalog.zip", duplicated.getvalue(), "application/zip")}, headers=headers
+    )
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == ["cables.csv línea 4: tirante T-01 repetido (ya en línea 2)"]
+
+
+def test_query_counter_flags_repeated_statement_shapes():
+    assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?) AND x = 'a'") == statement_shape(
+        "SELECT *  FROM t\nWHERE id IN (?) AND x = 'b'"
+    )
+    seed = seed_bridge_history(n_cables=5)
+    with count_queries() as log:
+        with SessionLocal() as db:
+            for cable_id in seed["cable_ids"]:
+                db.query(CableStateVersion).filter(CableStateVersion.cable_id == cable_id).all()
+    assert log.count == 5
+    assert list(log.repeated().values()) == [5]
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(10, max_repeats=1):
+            with SessionLocal() as db:
+                for cable_id in seed["cable_ids"]:
+                    db.get(Cable, cable_id)
+
+    metrics = RequestMetrics(n_plus_one_threshold=5)
+    metrics.start("GET")
+    metrics.finish("GET", "/x", 200, 0.1, 10, DBStats(statements=5, by_statement={"SELECT 1": 5}), False)
+    assert 'http_request_n_plus_one_total{method="GET",route="/x"} 1' in metrics.render()
+
+
+def test_semaforo_query_budget_for_100_cables():
+    seed = seed_bridge_history(n_cables=100, acquisitions=[(datetime(2024, 1, 1), [float(i) for i in range(100)])])
+    with query_budget(3):
+        resp = client.get(f"/bridges/{seed['bridge_id']}/semaforo", params={"acquisition_id": seed["acquisition_ids"][0]})
+    assert resp.json()["total"] == 100
+
+
+def test_history_with_k_calibrations_query_budget():
+    seed = seed_bridge_history(n_cables=3, acquisitions=[(datetime(2024, 1, d), [1.0, 2.0, 3.0]) for d in range(1, 30)])
+    with query_budget(2):
+        resp = client.get("/history", params={"cable_id": seed["cable_ids"][0]})
+    assert len(resp.json()["results"]) == 29 and len(resp.json()["k_calibrations"]) == 1
+
+
+def test_create_bridge_query_budget_is_independent_of_cable_count():
+    headers = admin_headers()
+    client.post("/bridges", json={"nombre": "Calentamiento"}, headers=headers)
+    for n, name in ((10, "Puente 10"), (300, "Puente 300")):
+        with query_budget(5, max_repeats=1):
+            assert client.post("/bridges", json={"nombre": name, "num_tirantes": n}, headers=headers).status_code == 200
+
+
+def test_normalize_query_budget_is_independent_of_channel_count():
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=40)
+    with SessionLocal() as db:
+        sensors = [Sensor(sensor_type="acc", serial_or_asset_id=f"S-{i}", unit="g") for i in range(40)]
+        db.add_all(sensors)
+        db.flush()
+        db.add_all(
+            SensorInstallation(sensor_id=s.id, cable_id=c, installed_from=datetime(2023, 1, 1), height_m=2.0)
+            for s, c in zip(sensors, seed["cable_ids"])
+        )
+        db.commit()
+        sensor_ids = [s.id for s in sensors]
+    acq_id = client.post(
+        "/acquisitions",
+        json={"bridge_id": seed["bridge_id"], "acquired_at": "2024-01-01T00:00:00", "Fs_Hz": 128.0},
+        headers=headers,
+    ).json()["id"]
+    columns = [f"ch{i}" for i in range(40)]
+    csv_text = "meta\nDATA_START\n" + ",".join(["t"] + columns) + "\n" + ",".join(["0"] + ["1.0"] * 40) + "\n"
+    resp = client.post(
+        f"/acquisitions/{acq_id}/raw-upload",
+        params={"parser_version": "v1"},
+        files={"file": ("raw.csv", csv_text.encode(), "text/csv")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    mapping = [
+        {"csv_column_name": col, "sensor_id": sid, "cable_id": cid, "height_m": 2.0}
+        for col, sid, cid in zip(columns, sensor_ids, seed["cable_ids"])
+    ]
+    with query_budget(7, max_repeats=1):
+        resp = client.post(f"/acquisitions/{acq_id}/normalize", params={"parser_version": "v1"}, json=mapping, headers=headers)
+    assert resp.status_code == 200 and resp.json()["channels_created"] == 40
+
+
+def test_synthetic_dataset_is_deterministic_and_consistent(tmp_path):
+    cfg = SyntheticConfig(
+        bridges=2, cables_per_bridge=3, years=2, acquisitions_per_month=2, raw_every=10, raw_seconds=32, seed=11
+    )
+
+    def snapshot():
+        with SessionLocal() as db:
+            return (
+                db.query(Bridge.nombre, Cable.nombre_en_puente, Acquisition.acquired_at, AnalysisResult.f0_hz)
+                .join(Cable, Cable.bridge_id == Bridge.id)
+                .join(AnalysisResult, AnalysisResult.cable_id == Cable.id)
+                .join(AnalysisRun, AnalysisRun.id == AnalysisResult.analysis_run_id)
+                .join(Acquisition, Acquisition.id == AnalysisRun.acquisition_id)
+                .order_by(Bridge.nombre, Cable.nombre_en_puente, Acquisition.acquired_at)
+                .all()
+            )
+
+    etag = client.get("/bridges").headers["ETag"]
+    with SessionLocal() as db:
+        summary = generate(db, cfg, tmp_path)
+    # Escrituras fuera de la API también invalidan la caché de catálogos
+    bridges = client.get("/bridges", headers={"If-None-Match": etag})
+    assert bridges.status_code == 200 and {"SYN-11-001", "SYN-11-002"} <= {b["nombre"] for b in bridges.json()}
+    assert summary.rows["analysis_results"] == summary.rows["acquisitions"] * 3
+    assert summary.rows["k_calibrations"] == 2 * 3 * 2
+    first = snapshot()
+    assert len(first) == summary.rows["analysis_results"]
+
+    with SessionLocal() as db:
+        assert generate(db, cfg, tmp_path).skipped_bridges == ["SYN-11-001", "SYN-11-002"]
+        result, acq, k = (
+            db.query(AnalysisResult, Acquisition, KCalibration)
+            .join(AnalysisRun, AnalysisRun.id == AnalysisResult.analysis_run_id)
+            .join(Acquisition, Acquisition.id == AnalysisRun.acquisition_id)
+            .join(KCalibration, KCalibration.id == AnalysisResult.k_used_calibration_id)
+            .order_by(Acquisition.acquired_at)
+            .first()
+        )
+        assert k.valid_from <= acq.acquired_at and (k.valid_to is None or acq.acquired_at < k.valid_to)
+        assert result.tension_tf == pytest.approx(k.k_value * result.f0_hz**2, rel=1e-3)
+        raw = db.query(RawFile).filter(RawFile.acquisition_id == acq.id).one()
+        f0_by_serial = dict(
+            db.query(Sensor.serial_or_asset_id, AnalysisResult.f0_hz)
+            .join(SensorInstallation, SensorInstallation.sensor_id == Sensor.id)
+            .join(AnalysisResult, AnalysisResult.cable_id == SensorInstallation.cable_id)
+            .filter(AnalysisResult.analysis_run_id == result.analysis_run_id)
+            .all()
+        )
+
+    df = _read_csv_after_data_start(read_stored(raw.storage_path))
+    assert len(df) == 32 * 128 and set(f0_by_serial) == set(df.columns[1:])
+    for serial, f0 in f0_by_serial.items():
+        spectrum = np.abs(np.fft.rfft(df[serial].to_numpy()))
+        freqs = np.fft.rfftfreq(len(df), 1 / 128)
+        assert freqs[np.argmax(spectrum[1:]) + 1] == pytest.approx(f0, abs=2 / 32)
+
+    resp = client.get(f"/bridges/{acq.bridge_id}/semaforo", params={"acquisition_id": acq.id})
+    assert resp.status_code == 200 and resp.json()["total"] == 3
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        generate(db, cfg, tmp_path)
+    assert snapshot() == first
+
+
+def test_api_benchmark_reports_percentiles_and_flags_regressions(tmp_path):
+    with SessionLocal() as db:
+        generate(db, SyntheticConfig(bridges=1, cables_per_bridge=4, years=1, raw_every=5, raw_seconds=4, seed=3), tmp_path)
+        api_bench.ensure_bench_user(db)
+        targets = api_bench.discover_targets(db)
+    assert targets.raw_acquisition_ids and len(targets.mapping) == 4
+
+    normalized_dir = Path(get_settings().data_root, "normalized")
+    files_before = set(normalized_dir.glob("*"))
+    results = api_bench.run(client, targets, iterations=3, warmup=0)
+    assert set(results["benchmarks"]) == {s.name for s in api_bench.SCENARIOS}
+    semaforo = results["benchmarks"]["semaforo"]
+    assert semaforo["latency_p50_ms"] <= semaforo["latency_p95_ms"] <= semaforo["latency_p99_ms"]
+    assert semaforo["queries_max"] == 3
+    assert 0 < semaforo["scenario_peak_rss_mb"] <= semaforo["process_peak_rss_mb"]
+    assert results["benchmarks"]["normalize"]["queries_max"] > 0
+    # normalize deshace sus escrituras: una segunda corrida mide el mismo dataset
+    with SessionLocal() as db:
+        acq_ids = targets.raw_acquisition_ids
+        assert not db.query(RawFile).filter(RawFile.file_kind == "normalized_csv", RawFile.acquisition_id.in_(acq_ids)).count()
+        assert not db.query(AcquisitionChannel).filter(AcquisitionChannel.acquisition_id.in_(acq_ids)).count()
+    assert set(normalized_dir.glob("*")) == files_before
+
+    assert compare(results, results, api_bench.RULES) == []
+    baseline = json.loads(json.dumps(results))
+    baseline["benchmarks"]["semaforo"]["queries_max"] = 2
+    baseline["benchmarks"]["history_cable"]["latency_p95_ms"] /= 10
+    baseline["benchmarks"]["history_cable"]["latency_p95_ms"] -= 10
+    regressions = compare(results, baseline, api_bench.RULES)
+    assert [r.split(":")[0] for r in regressions] == ["history_cable latency_p95_ms", "semaforo queries_max"]
+
+    out = io.StringIO()
+    print_table(results, api_bench.TABLE_COLUMNS, out)
+    assert out.getvalue().splitlines()[0].split()[1:] == list(api_bench.TABLE_COLUMNS)
+
+
+def test_micro_benchmarks_sweep_sizes_and_flag_superlinear_scaling():
+    from contextlib import contextmanager
+
+    @contextmanager
+    def quadratic(n, rng):
+        values = list(range(n))
+        yield lambda: sum(1 for a in values for b in values if a < b)
+
+    benchmarks = [
+        next(b for b in micro.BENCHMARKS if b.name.startswith("select_k_for_timestamp")),
+        next(b for b in micro.BENCHMARKS if b.name.startswith("normalize_from_raw[channels]")),
+        micro.MicroBenchmark("quadratic", quadratic, (100, 200, 400), (100, 200, 400), 1.3),
+    ]
+    results = micro.run(benchmarks, quick=True, repeats=1, min_time=0.005)
+    select_k = results["benchmarks"]["select_k_for_timestamp[calibrations]"]
+    assert {"time_us@50", "peak_kib@200", "time_exponent", "memory_exponent"} <= set(select_k)
+    assert results["benchmarks"]["quadratic"]["time_exponent"] > 1.6
+    assert any(v.startswith("quadratic ") for v in micro.exponent_violations(results, benchmarks))
+    assert compare(results, results, micro.RULES) == []
+
+
+def test_batch_ingest_registers_normalizes_and_resumes(tmp_path):
+    from concurrent.futures import ProcessPoolExecutor
+
+    seed = seed_bridge_history(n_cables=2, acquisitions=[(datetime(2024, 1, 1), [40.0, 50.0])])
+    with SessionLocal() as db:
+        sensors = [Sensor(sensor_type="acc", serial_or_asset_id=f"S-{i}", unit="g") for i in range(2)]
+        db.add_all(sensors)
+        db.flush()
+        db.add_all(
+            SensorInstallation(sensor_id=s.id, cable_id=c, installed_from=datetime(2023, 1, 1), height_m=2.0)
+            for s, c in zip(sensors, seed["cable_ids"])
+        )
+        db.commit()
+        mapping = [
+            {"csv_column_name": f"ch{i}", "sensor_id": s.id, "cable_id": c, "height_m": 2.0}
+            for i, (s, c) in enumerate(zip(sensors, seed["cable_ids"]))
+        ]
+    folder = tmp_path / "campo"
+    (folder / "nuevo").mkdir(parents=True)
+    csv_text = "meta\nDATA_START\nt,ch0,ch1\n0,1.0,2.0\n1,1.5,2.5\n"
+    (folder / "a.csv").write_text(csv_text)
+    (folder / "a_copia.csv").write_text(csv_text)
+    (folder / "nuevo" / "b1.csv").write_text(csv_text.replace("2.5", "3.5"))
+    (folder / "suelto.csv").write_text(csv_text.replace("2.5", "4.5"))
+    (folder / "mapping.json").write_text(json.dumps(mapping))
+    (folder / "manifest.csv").write_text(
+        "file,acquisition_id,bridge_id,acquired_at,fs_hz,mapping\n"
+        f"a.csv,{seed['acquisition_ids'][0]},,,,mapping.json\n"
+        f"a_copia.csv,{seed['acquisition_ids'][0]},,,,\n"
+        f"nuevo/*.csv,,{seed['bridge_id']},2024-02-01T10:00:00,128,mapping.json\n"
+    )
+    entries = load_manifest(folder / "manifest.csv", folder)
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        hashed = list(pool.map(hash_file, [str(e.path) for e in entries]))
+    assert hashed[0][1] == hashed[1][1] != hashed[2][1]
+
+    with SessionLocal() as db:
+        report = ingest(db, folder, entries, seed["user_id"], tmp_path / "data", exclude=[folder / "manifest.csv"])
+    assert [f.status for f in report.files] == ["registered", "skipped_duplicate", "registered"]
+    assert report.unmatched == [str(folder / "suelto.csv")] and len(report.created_acquisitions) == 1
+    assert [(a.status, a.channels_created) for a in report.acquisitions] == [("ok", 2), ("ok", 2)]
+
+    with SessionLocal() as db:
+        again = ingest(db, folder, entries, seed["user_id"], tmp_path / "data")
+        assert [f.status for f in again.files] == ["skipped_registered", "skipped_registered", "skipped_registered"]
+        assert {a.status for a in again.acquisitions} == {"skipped"} and again.created_acquisitions == []
+        assert db.query(RawFile).filter(RawFile.file_kind == "raw_csv").count() == 2
+        assert db.query(RawFile).filter(RawFile.file_kind == "normalized_csv").count() == 2
+
+
+def test_batch_ingest_keeps_same_named_files_apart(tmp_path):
+    seed = seed_bridge_history(n_cables=1)
+    folder = tmp_path / "campo"
+    for day in (1, 2):
+        (folder / f"acq_{day}").mkdir(parents=True)
+        (folder / f"acq_{day}" / "data.csv").write_text(f"meta\nDATA_START\nt,ch0\n0,{day}.0\n")
+    (folder / "manifest.csv").write_text(
+        "file,bridge_id,acquired_at,fs_hz\n"
+        f"acq_1/*.csv,{seed['bridge_id']},2024-03-01T00:00:00,128\n"
+        f"acq_2/*.csv,{seed['bridge_id']},2024-03-02T00:00:00,128\n"
+    )
+    with SessionLocal() as db:
+        entries = load_manifest(folder / "manifest.csv", folder)
+        report = ingest(db, folder, entries, seed["user_id"], tmp_path / "data", exclude=[folder / "manifest.csv"])
+        assert [f.status for f in report.files] == ["registered", "registered"]
+        records = db.query(RawFile).filter(RawFile.file_kind == "raw_csv").order_by(RawFile.id).all()
+    assert len({r.storage_path for r in records}) == 2
+    for record, day in zip(records, (1, 2)):
+        assert record.original_filename == "data.csv"
+        content = read_stored(record.storage_path)
+        assert content.endswith(f"0,{day}.0\n".encode()) and hashlib.sha256(content).hexdigest() == record.sha256
+
+
+def test_mapping_template_bulk_apply_validates_once():
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=2)
+    with SessionLocal() as db:
+        sensors = [Sensor(sensor_type="acc", serial_or_asset_id=f"S-{i}", unit="g") for i in range(2)]
+        db.add_all(sensors)
+        db.flush()
+        db.add_all(
+            SensorInstallation(sensor_id=s.id, cable_id=c, installed_from=datetime(2023, 1, 1), height_m=2.0)
+            for s, c in zip(sensors, seed["cable_ids"])
+        )
+        db.commit()
+        mapping = [
+            {"csv_column_name": f"ch{i}", "sensor_id": s.id, "cable_id": c, "height_m": 2.0}
+            for i, (s, c) in enumerate(zip(sensors, seed["cable_ids"]))
+        ]
+    url = f"/bridges/{seed['bridge_id']}/mapping-templates"
+    resp = client.post(url, json={"nombre": "campaña 2024", "mapping": mapping}, headers=headers)
+    assert resp.status_code == 200
+    template_id = resp.json()["id"]
+    assert client.post(url, json={"nombre": "campaña 2024", "mapping": mapping}, headers=headers).status_code == 400
+    assert client.post(url, json={"nombre": "otra", "mapping": mapping * 2}, headers=headers).status_code == 400
+    assert [t["nombre"] for t in client.get(url).json()] == ["campaña 2024"]
+
+    acq_ids = []
+    for day in range(1, 5):
+        acq_ids.append(
+            client.post(
+                "/acquisitions",
+                json={"bridge_id": seed["bridge_id"], "acquired_at": f"2024-01-0{day}T00:00:00", "Fs_Hz": 128.0},
+                headers=headers,
+            ).json()["id"]
+        )
+    for acq_id in acq_ids[:3]:
+        csv_text = f"meta\nDATA_START\nt,ch0,ch1\n0,1.0,{acq_id}.0\n1,1.5,2.5\n"
+        client.post(
+            f"/acquisitions/{acq_id}/raw-upload",
+            params={"parser_version": "v1"},
+            files={"file": ("raw.csv", csv_text.encode(), "text/csv")},
+            headers=headers,
+        )
+    with count_queries(all_threads=True) as log:
+        resp = client.post(
+            f"{url}/{template_id}/apply",
+            json={"acquisition_ids": acq_ids + [999999], "parser_version": "v1"},
+            headers=headers,
+        )
+    assert resp.status_code == 200
+    data = resp.json()
+    assert (data["normalized"], data["errors"]) == (3, 2)
+    assert [r["status"] for r in data["results"]] == ["ok", "ok", "ok", "error", "error"]
+    assert all(r["channels_created"] == 2 for r in data["results"][:3])
+    validation = {s: n for s, n in log.shapes().items() if "FROM cables" in s or "FROM sensor_installations" in s}
+    assert validation and all(n == 1 for n in validation.values())
+
+    # Un crudo faltante se reporta como error de esa adquisición; el resto del lote se confirma
+    with SessionLocal() as db:
+        raw = db.query(RawFile).filter(RawFile.acquisition_id == acq_ids[0], RawFile.file_kind == "raw_csv").one()
+        raw.storage_path = str(Path(get_settings().data_root) / "raw" / "no_existe.csv")
+        db.commit()
+    data = client.post(
+        f"{url}/{template_id}/apply", json={"acquisition_ids": acq_ids[:2], "parser_version": "v2"}, headers=headers
+    ).json()
+    assert [r["status"] for r in data["results"]] == ["error", "ok"] and "no_existe.csv" in data["results"][0]["detail"]
+    with SessionLocal() as db:
+        assert db.query(RawFile).filter(RawFile.parser_version == "v2").count() == 1
+
+    assert client.delete(f"{url}/{template_id}", headers=headers).status_code == 204
+    assert client.get(url).json() == []
+
+
+def test_raw_and_normalized_files_are_stored_compressed(monkeypatch):
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=1)
+    with SessionLocal() as db:
+        sensor = Sensor(sensor_type="acc", serial_or_asset_id="S-0", unit="g")
+        db.add(sensor)
+        db.flush()
+        db.add(SensorInstallation(sensor_id=sensor.id, cable_id=seed["cable_ids"][0], installed_from=datetime(2023, 1, 1), height_m=2.0))
+        db.commit()
+        sensor_id = sensor.id
+    mapping = [{"csv_column_name": "ch0", "sensor_id": sensor_id, "cable_id": seed["cable_ids"][0], "height_m": 2.0}]
+    csv_bytes = ("meta\nDATA_START\nt,ch0\n" + "".join(f"{i / 128:.6f},{(i % 17) / 10:.3f}\n" for i in range(5000))).encode()
+
+    def upload_and_normalize(acquired_at):
+        acq_id = client.post(
+            "/acquisitions", json={"bridge_id": seed["bridge_id"], "acquired_at": acquired_at, "Fs_Hz": 128.0}, headers=headers
+        ).json()["id"]
+        raw = client.post(
+            f"/acquisitions/{acq_id}/raw-upload",
+            params={"parser_version": "v1"},
+            files={"file": (f"raw_{acq_id}.csv", csv_bytes, "text/csv")},
+            headers=headers,
+        ).json()
+        resp = client.post(f"/acquisitions/{acq_id}/normalize", params={"parser_version": "v1"}, json=mapping, headers=headers)
+        assert resp.status_code == 200 and resp.json()["channels_created"] == 1
+        with SessionLocal() as db:
+            norm = db.query(RawFile).filter(RawFile.acquisition_id == acq_id, RawFile.file_kind == "normalized_csv").one()
+            return raw, norm
+
+    raw, norm = upload_and_normalize("2024-01-01T00:00:00")
+    raw_path = Path(raw["path"])
+    assert raw_path.suffix == ".gz" and codec_for_path(raw_path) == "gzip" and raw_path.read_bytes()[:2] == b"\x1f\x8b"
+    assert raw_path.stat().st_size * 4 < len(csv_bytes)
+    # sha256 y tamaño siguen describiendo el contenido original
+    assert raw["sha256"] == hashlib.sha256(csv_bytes).hexdigest() == hashlib.sha256(read_stored(raw_path)).hexdigest()
+    assert Path(norm.storage_path).suffix == ".gz"
+    assert hashlib.sha256(read_stored(norm.storage_path)).hexdigest() == norm.sha256
+    assert len(read_stored(norm.storage_path)) == norm.file_size_bytes
+
+    # Archivos sin comprimir (anteriores o con compresión desactivada) se leen igual
+    monkeypatch.setattr(get_settings(), "storage_compression_raw", "none")
+    raw, norm = upload_and_normalize("2024-01-02T00:00:00")
+    assert codec_for_path(Path(raw["path"])) == "none" and Path(raw["path"]).read_bytes() == csv_bytes
+    assert codec_for_path(Path(norm.storage_path)) == "gzip"
+
+    # Un .gz subido sin compresión se guarda con la marca .plain y se sirve tal cual, sin descomprimir
+    payload = gzip.compress(csv_bytes)
+    with SessionLocal() as db:
+        acq_id = db.get(RawFile, raw["id"]).acquisition_id
+    resp = client.post(
+        f"/acquisitions/{acq_id}/file",
+        params={"file_kind": "attachment", "parser_version": "v1"},
+        files={"file": ("export.csv.gz", payload, "application/gzip")},
+        headers=headers,
+    )
+    assert resp.status_code == 200
+    with SessionLocal() as db:
+        stored = db.query(RawFile).filter(RawFile.original_filename == "export.csv.gz").one()
+    assert stored.storage_path.endswith("export.csv.gz.plain") and codec_for_path(stored.storage_path) == "none"
+    assert read_stored(stored.storage_path) == payload and stored.sha256 == hashlib.sha256(payload).hexdigest()
+
+
+def test_concurrent_writes_to_the_same_stored_file(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Hilos del mismo proceso (endpoints sync en el threadpool) no comparten el archivo temporal
+    contents = [bytes([i]) * (4 * 1024 * 1024) for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        written = list(pool.map(lambda data: write_stored(tmp_path, "raw", "data.csv", data, "gzip"), contents))
+    assert {path for path, _, _ in written} == {tmp_path / "raw" / "data.csv.gz"}
+    assert read_stored(tmp_path / "raw" / "data.csv.gz") in contents
+    assert list((tmp_path / "raw").iterdir()) == [tmp_path / "raw" / "data.csv.gz"]
+
+
+def test_storage_scrub_reports_missing_corrupt_and_orphaned(tmp_path):
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=1)
+    acq_id = client.post(
+        "/acquisitions", json={"bridge_id": seed["bridge_id"], "acquired_at": "2024-01-01T00:00:00", "Fs_Hz": 128.0},
+        headers=headers,
+    ).json()["id"]
+    paths = []
+    for i in range(4):
+        csv_bytes = f"meta\nDATA_START\nt,ch0\n0,{i}\n1,{i + 1}\n".encode()
+        paths.append(
+            Path(
+                client.post(
+                    f"/acquisitions/{acq_id}/raw-upload",
+                    params={"parser_version": "v1"},
+                    files={"file": (f"scrub_{acq_id}_{i}.csv", csv_bytes, "text/csv")},
+                    headers=headers,
+                ).json()["path"]
+            )
+        )
+    paths[1].unlink()
+    paths[2].write_bytes(paths[2].read_bytes()[:-6] + b"\x00" * 6)  # CRC/longitud de gzip rotos
+    with SessionLocal() as db:
+        raw = db.query(RawFile).filter(RawFile.storage_path == str(paths[3])).one()
+        raw.sha256 = "0" * 64
+        db.commit()
+    orphan = Path(get_settings().data_root) / "raw" / f"huerfano_{acq_id}.csv"
+    orphan.write_text("x")
+    # Copia en el archivo frío sin fila (tiering interrumpido antes del commit)
+    archived_orphan = archive_root() / "raw" / f"huerfano_{acq_id}.csv.gz"
+    archived_orphan.parent.mkdir(parents=True, exist_ok=True)
+    archived_orphan.write_bytes(b"x")
+
+    started = datetime.utcnow()
+    with SessionLocal() as db:
+        report = scrub(db, Path(get_settings().data_root), workers=3, max_bytes_per_second=50 * 1024 * 1024)
+        run = record_scrub(db, report, started)
+        run_id = run.id
+    by_path = {f.path: f for f in report.findings}
+    assert str(paths[0]) not in by_path
+    assert by_path[str(paths[1])].kind == "missing" and by_path[str(paths[1])].entity == "raw_file"
+    assert by_path[str(paths[2])].kind == by_path[str(paths[3])].kind == "corrupt"
+    assert "sha256" in by_path[str(paths[3])].detail
+    assert by_path[str(orphan)].kind == "orphaned" and by_path[str(archived_orphan)].kind == "orphaned"
+    assert report.files_checked >= 4 and report.bytes_read > 0
+
+    resp = client.get(f"/storage/scrubs/{run_id}", headers=headers)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["status"] == "issues" and data["missing"] >= 1 and data["corrupt"] >= 2 and data["orphaned"] >= 1
+    assert {f["path"] for f in data["findings"]} >= {str(paths[1]), str(paths[2]), str(orphan)}
+    assert client.get("/storage/scrubs", headers=headers).json()[0]["id"] == run_id
+    orphan.unlink()
+    archived_orphan.unlink()
+
+
+def test_add_months_clamps_to_the_last_day_of_the_month():
+    assert add_months(datetime(2024, 10, 31), -1) == datetime(2024, 9, 30)
+    assert add_months(datetime(2024, 1, 31), 1) == datetime(2024, 2, 29)
+    assert add_months(datetime(2023, 1, 29), 1) == datetime(2023, 2, 28)
+    for day in (29, 30, 31):
+        assert add_months(datetime(2024, 3, day, 12, 30), 12) == datetime(2025, 3, day, 12, 30)
+        assert add_months(datetime(2024, 5, day), -2) == datetime(2024, 3, day)
+    assert add_months(datetime(2024, 1, 15), -13) == datetime(2022, 12, 15)
+
+
+def test_scrub_hashes_gzip_attachments_as_stored(tmp_path):
+    seed = seed_bridge_history(n_cables=1)
+    data_root = Path(get_settings().data_root)
+    payload = gzip.compress(b"fotos de la campa\xc3\xb1a" * 100)
+    path, digest = save_upload(data_root, "attachments", f"fotos_{seed['bridge_id']}.tar.gz", payload)
+    # Adjunto anterior a la marca .plain: mismo nombre en disco que el subido
+    legacy = data_root / "attachments" / f"legacy_{seed['bridge_id']}.tar.gz"
+    legacy.write_bytes(payload)
+    with SessionLocal() as db:
+        wc_id = db.query(WeighingCampaign).filter(WeighingCampaign.bridge_id == seed["bridge_id"]).one().id
+        for stored in (path, legacy):
+            db.add(WeighingAttachment(weighing_campaign_id=wc_id, storage_path=str(stored), filename=stored.name, sha256=digest))
+        db.commit()
+        report = scrub(db, data_root, workers=2, check_orphans=False)
+    assert digest == hashlib.sha256(payload).hexdigest()
+    assert report.files_checked == 2 and report.findings == []
+    legacy.unlink()
+
+
+def test_scrub_cli_records_run_and_writes_report(tmp_path, capsys):
+    from app import scrub as scrub_cli
+
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=1)
+    acq_id = client.post(
+        "/acquisitions", json={"bridge_id": seed["bridge_id"], "acquired_at": "2024-01-01T00:00:00", "Fs_Hz": 128.0},
+        headers=headers,
+    ).json()["id"]
+    path = Path(
+        client.post(
+            f"/acquisitions/{acq_id}/raw-upload",
+            params={"parser_version": "v1"},
+            files={"file": (f"cli_{acq_id}.csv", b"meta\nDATA_START\nt,ch0\n0,1\n", "text/csv")},
+            headers=headers,
+        ).json()["path"]
+    )
+    path.unlink()
+
+    report_path = tmp_path / "scrub.json"
+    assert scrub_cli.main(["--workers", "2", "--no-orphans", "--nice", "0", "--report", str(report_path)]) == 1
+    summary = capsys.readouterr().out.strip().splitlines()
+    assert summary[0].startswith("missing") and str(path) in summary[0]
+    assert "1 faltantes, 0 corruptos, 0 huérfanos" in summary[-1]
+    report = json.loads(report_path.read_text())
+    assert report["missing"] == 1 and report["findings"][0]["path"] == str(path)
+    with SessionLocal() as db:
+        run = db.query(StorageScrubRun).order_by(StorageScrubRun.id.desc()).first()
+        assert summary[-1].startswith(f"Corrida {run.id}:") and run.status == "issues" and run.missing == 1
+
+
+def test_scrub_rate_limiter_throttles_reads():
+    limiter = RateLimiter(bytes_per_second=4 * 1024 * 1024, burst_seconds=0.25)
+    start = time.perf_counter()
+    for _ in range(3):
+        limiter.acquire(1024 * 1024)
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_tiering_archives_old_files_and_reads_fall_through(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "archive_root", str(tmp_path / "archive"))
+    monkeypatch.setattr(settings, "archive_cache_dir", str(tmp_path / "hot"))
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=1)
+    with SessionLocal() as db:
+        sensor = Sensor(sensor_type="acc", serial_or_asset_id="S-0", unit="g")
+        db.add(sensor)
+        db.flush()
+        db.add(SensorInstallation(sensor_id=sensor.id, cable_id=seed["cable_ids"][0], installed_from=datetime(2019, 1, 1), height_m=2.0))
+        db.commit()
+        mapping = [{"csv_column_name": "ch0", "sensor_id": sensor.id, "cable_id": seed["cable_ids"][0], "height_m": 2.0}]
+    acq_ids = {}
+    for acquired_at in ("2020-03-01T00:00:00", "2026-09-01T00:00:00"):
+        acq_id = client.post(
+            "/acquisitions", json={"bridge_id": seed["bridge_id"], "acquired_at": acquired_at, "Fs_Hz": 128.0}, headers=headers
+        ).json()["id"]
+        client.post(
+            f"/acquisitions/{acq_id}/raw-upload",
+            params={"parser_version": "v1"},
+            files={"file": (f"tier_{acq_id}.csv", f"m\nDATA_START\nt,ch0\n0,{acq_id}\n1,2\n".encode(), "text/csv")},
+            headers=headers,
+        )
+        assert client.post(f"/acquisitions/{acq_id}/normalize", params={"parser_version": "v1"}, json=mapping, headers=headers).status_code == 200
+        acq_ids[acquired_at[:4]] = acq_id
+    with SessionLocal() as db:
+        before = {r.id: (r.storage_path, r.sha256) for r in db.query(RawFile)}
+
+    with SessionLocal() as db:
+        dry = tiering.run(db, older_than_months=24, dry_run=True, now=datetime(2026, 10, 1))
+        assert len(dry.files) == 2 and all(f.status == "pending" for f in dry.files)
+        report = tiering.run(db, older_than_months=24, now=datetime(2026, 10, 1))
+    assert report.archived == 2 and report.errors == 0
+    with SessionLocal() as db:
+        rows = {r.id: r for r in db.query(RawFile)}
+        for raw_id, (old_path, sha) in before.items():
+            row = rows[raw_id]
+            assert row.sha256 == sha
+            if row.acquisition_id == acq_ids["2020"]:
+                assert Path(row.storage_path).is_relative_to(tmp_path / "archive") and not Path(old_path).exists()
+                assert hashlib.sha256(read_stored(row.storage_path)).hexdigest() == sha
+                # Una ruta vieja (lectura concurrente) cae al archivo
+                assert hashlib.sha256(read_stored(old_path)).hexdigest() == sha
+                if row.file_kind == "normalized_csv":
+                    assert Path(row.storage_path + ".idx.json").exists() and not Path(old_path + ".idx.json").exists()
+            else:
+                assert row.storage_path == old_path
+        assert db.query(AuditLog).filter(AuditLog.action == "archive").count() == 2
+
+    # Releer una adquisición archivada pasa por la caché caliente
+    for cached in (tmp_path / "hot").iterdir():
+        cached.unlink()
+    resp = client.post(f"/acquisitions/{acq_ids['2020']}/normalize", params={"parser_version": "v1"}, json=mapping, headers=headers)
+    assert resp.status_code == 200
+    assert [p.name.split("_", 1)[1] for p in (tmp_path / "hot").iterdir()] == [f"tier_{acq_ids['2020']}.csv.gz"]
+    with SessionLocal() as db:
+        assert tiering.run(db, older_than_months=24, now=datetime(2026, 10, 1)).archived == 1  # el nuevo normalizado
+
+
+def test_hot_cache_evicts_least_recently_used(tmp_path):
+    cache = HotCache(tmp_path / "hot", max_bytes=2500)
+    sources = []
+    for i in range(3):
+        src = tmp_path / f"src{i}.gz"
+        src.write_bytes(bytes([i]) * 1000)
+        sources.append(src)
+    first = cache.fetch(sources[0])
+    cache.fetch(sources[1])
+    os.utime(first, (time.time() + 5, time.time() + 5))  # src0 usado más recientemente
+    cache.fetch(sources[2])
+    cached = sorted(p.name.split("_", 1)[1] for p in (tmp_path / "hot").iterdir())
+    assert cached == ["src0.gz", "src2.gz"]
+    assert cache.fetch(sources[0]) == first and first.read_bytes() == sources[0].read_bytes()
+    # Más grande que toda la caché: se lee en su lugar, sin copiar ni desalojar
+    big = tmp_path / "big.gz"
+    big.write_bytes(b"x" * 3000)
+    assert cache.fetch(big) == big and len(list((tmp_path / "hot").iterdir())) == 2
+
+
+def seed_signal_acquisition(fs: float = 128.0, seconds: int = 600):
+    """Acquisition with a normalized two-channel sine record (a 9.0 spike at 150.25 s on T-01)."""
+    headers = admin_headers()
+    seed = seed_bridge_history(n_cables=2)
+    with SessionLocal() as db:
+        sensors = [Sensor(sensor_type="acc", serial_or_asset_id=f"S-{i}", unit="g") for i in range(2)]
+        db.add_all(sensors)
+        db.flush()
+        mapping = [
+            {"csv_column_name": f"ch{i}", "sensor_id": s.id, "cable_id": c, "height_m": 2.0}
+            for i, (s, c) in enumerate(zip(sensors, seed["cable_ids"]))
+        ]
+        db.commit()
+    t = np.arange(int(fs * seconds)) / fs
+    y = np.sin(2 * np.pi * 1.3 * t)
+    y[int(150.25 * fs)] = 9.0  # pico aislado
+    body = "".join(f"{a:.6f},{b:.5f},{-b:.5f}\n" for a, b in zip(t, y))
+    acq_id = client.post(
+        "/acquisitions", json={"bridge_id": seed["bridge_id"], "acquired_at": "2024-01-01T00:00:00", "Fs_Hz": fs},
+        headers=headers,
+    ).json()["id"]
+    client.post(
+        f"/acquisitions/{acq_id}/raw-upload",
+        params={"parser_version": "v1"},
+        files={"file": ("signal.csv", ("m\nDATA_START\nt,ch0,ch1\n" + body).encode(), "text/csv")},
+        headers=headers,
+    )
+    resp = client.post(f"/acquisitions/{acq_id}/normalize", params={"parser_version": "v1"}, json=mapping, headers=headers)
+    assert resp.status_code == 200
+    return acq_id, seed["cable_ids"], t, y
+
+
+def test_signal_window_is_downsampled_and_reads_only_the_window(tmp_path):
+    fs = 128.0
+    acq_id, cable_ids, t, y = seed_signal_acquisition(fs)
+    # 500 puntos: la ventana cabe en el nivel base de la pirámide, así que se leen filas del CSV
+    params = {"cable_id": cable_ids[0], "t_start": 100, "t_end": 200, "points": 500}
+    data = client.get(f"/acquisitions/{acq_id}/signal", params=params).json()
+    assert data["column"] == "T-01" and data["points_in_window"] == int(100 * fs) + 1
+    # Con índice de filas solo se leen los bloques que cubren la ventana
+    assert data["rows_read"] <= data["points_in_window"] + 2 * signals.INDEX_BLOCK_ROWS < len(t)
+    assert data["rows_per_point"] == 1
+    assert len(data["t"]) <= 500 and 100 <= min(data["t"]) and max(data["t"]) <= 200
+    assert max(data["y"]) == 9.0 and data["t"] == sorted(data["t"])
+    lttb = client.get(f"/acquisitions/{acq_id}/signal", params={**params, "method": "lttb"}).json()
+    assert len(lttb["t"]) == 500 and max(lttb["y"]) == 9.0
+    assert client.get(f"/acquisitions/{acq_id}/signal", params={"cable_id": 999999}).status_code == 404
+
+    # Sin índice (archivos anteriores) el rango de filas se estima con Fs
+    with SessionLocal() as db:
+        norm_path = db.get(RawFile, data["normalized_file_id"]).storage_path
+    Path(norm_path + ".idx.json").unlink()
+    plain = client.get(f"/acquisitions/{acq_id}/signal", params=params).json()
+    assert plain["rows_read"] < plain["points_in_window"] + 10
+    assert (plain["t"], plain["y"]) == (data["t"], data["y"])
+
+    # Muestreo irregular: se recorre el archivo por bloques y el resultado es el mismo
+    irregular = tmp_path / "irregular.csv"
+    irregular.write_text("t,T-01\n0,1\n0.5,2\n3,3\n3.2,4\n10,5\n")
+    window = signals.read_window(irregular, "T-01", 1.0, 3.5, fs_hz=10.0)
+    assert window.t.tolist() == [3.0, 3.2] and window.y.tolist() == [3.0, 4.0]
+
+
+def test_signal_pyramid_serves_wide_windows_from_summaries():
+    fs = 128.0
+    acq_id, cable_ids, t, y = seed_signal_acquisition(fs)
+    with SessionLocal() as db:
+        norm_path = db.query(RawFile).filter(RawFile.acquisition_id == acq_id, RawFile.file_kind == "normalized_csv").one().storage_path
+    pyr = pyramid.load_pyramid(norm_path)
+    buckets = [level["bucket"] for level in pyr.header["levels"]]
+    assert buckets[0] == pyramid.BASE_BUCKET and all(b == 2 * a for a, b in zip(buckets, buckets[1:]))
+    assert pyr.header["levels"][-1]["n"] <= pyramid.MIN_BUCKETS
+
+    # Cada nivel resume exactamente sus filas
+    summary = pyr.window("T-01", 0, 600, max_buckets=300)
+    rows = summary.bucket
+    assert summary.bucket > pyramid.BASE_BUCKET and len(summary.t) <= 300
+    assert len(y) % rows == 0
+    expected = y.reshape(-1, rows)
+    assert np.allclose(summary.max, expected.max(axis=1), atol=1e-4)
+    assert np.allclose(summary.min, expected.min(axis=1), atol=1e-4)
+    assert np.allclose(summary.mean, expected.mean(axis=1), atol=1e-4)
+
+    # Todo el registro con 200 puntos: se sirve de la pirámide y el pico sobrevive
+    data = client.get(f"/acquisitions/{acq_id}/signal", params={"cable_id": cable_ids[0], "points": 200}).json()
+    assert data["rows_per_point"] > 1 and data["rows_read"] <= 100 and len(data["t"]) <= 200
+    assert max(data["y"]) == 9.0 and data["points_in_window"] == len(t)
+    lttb = client.get(
+        f"/acquisitions/{acq_id}/signal", params={"cable_id": cable_ids[1], "points": 200, "method": "lttb", "t_start": 60}
+    ).json()
+    assert lttb["rows_per_point"] > 1 and min(lttb["t"]) >= 60 and len(lttb["t"]) <= 200
+
+    # Una pirámide de otros bytes (p. ej. de una normalización anterior) se ignora
+    with open(norm_path, "ab") as fh:
+        fh.write(gzip.compress(b""))
+    assert pyramid.load_pyramid(norm_path) is None
+    # Y si el nuevo registro no lleva pirámide, la anterior se borra
+    short = pd.DataFrame({"t": [0.0, 1.0], "T-01": [1.0, 2.0]})
+    assert pyramid.write_pyramid(Path(norm_path), short) is None
+    assert not Path(f"{norm_path}{pyramid.PYRAMID_SUFFIX}").exists()
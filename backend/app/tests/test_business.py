@@ -10,7 +10,9 @@ from app.services.business import (
     select_cable_state_version,
     select_k_for_timestamp,
     validate_installations_no_overlap,
+    validate_states_no_overlap,
 )
+from app.services.semaforo import epoch_seconds, select_state_indices
 
 
 def ts(hours: int) -> datetime:
@@ -96,3 +98,40 @@ def test_effective_fu_uses_override_when_present():
 def test_effective_fu_defaults_to_strand_fu():
     state = CableStateVersion(1, ts(0), None, 10.0, 7, 7, None, 100.0)
     assert effective_fu(state) == 100.0
+
+
+def test_select_state_indices_matches_scalar_rule():
+    states = [
+        CableStateVersion(1, ts(0), ts(10), 10.0, 7, 7, None, 100.0),
+        CableStateVersion(1, ts(20), None, 10.0, 7, 7, None, 100.0),
+    ]
+    at = [ts(-1), ts(5), ts(15), ts(25)]
+    idx = select_state_indices(
+        epoch_seconds([s.valid_from for s in states]), epoch_seconds([s.valid_to for s in states]), epoch_seconds(at)
+    )
+    assert idx.tolist() == [-1, 0, 0, 1]
+    for i, when in zip(idx[1:], at[1:]):
+        assert states[i] == select_cable_state_version(states, when)
+
+
+def test_select_state_indices_raises_on_overlap():
+    vf = epoch_seconds([ts(0), ts(10)])
+    vt = epoch_seconds([ts(20), None])
+    with pytest.raises(ValueError):
+        select_state_indices(vf, vt, epoch_seconds([ts(12)]))
+
+
+def test_validate_states_no_overlap_detects_overlap():
+    validate_states_no_overlap(
+        [
+            CableStateVersion(1, ts(0), ts(10), 10.0, 7, 7, None, 100.0),
+            CableStateVersion(1, ts(10), None, 10.0, 7, 7, None, 100.0),
+        ]
+    )
+    with pytest.raises(ValueError):
+        validate_states_no_overlap(
+            [
+                CableStateVersion(1, ts(0), None, 10.0, 7, 7, None, 100.0),
+                CableStateVersion(1, ts(10), None, 10.0, 7, 7, None, 100.0),
+            ]
+        )
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.services.history import aggregate_buckets, bucket_starts, downsample_series, lttb_indices
+
+
+def epoch(*args) -> float:
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def test_bucket_starts_week_begins_on_monday():
+    # 2024-01-03 es miércoles; la semana arranca el lunes 2024-01-01
+    starts = bucket_starts(np.array([epoch(2024, 1, 3, 15), epoch(2024, 1, 8)]), "week")
+    assert starts.astype("datetime64[D]").tolist() == [datetime(2024, 1, 1).date(), datetime(2024, 1, 8).date()]
+
+
+def test_aggregate_buckets_min_mean_max_per_cable():
+    cable_ids = np.array([1, 2, 1, 1])
+    ts = np.array([epoch(2024, 1, 1), epoch(2024, 1, 1), epoch(2024, 1, 20), epoch(2024, 2, 1)])
+    tension = np.array([10.0, 5.0, 20.0, 7.0])
+    agg = aggregate_buckets(cable_ids, ts, {"tension_tf": tension}, "month")
+    assert agg["cable_id"].tolist() == [1, 1, 2]
+    assert agg["count"].tolist() == [2, 1, 1]
+    assert agg["tension_tf_min"].tolist() == [10.0, 7.0, 5.0]
+    assert agg["tension_tf_mean"].tolist() == [15.0, 7.0, 5.0]
+    assert agg["tension_tf_max"].tolist() == [20.0, 7.0, 5.0]
+
+
+def test_lttb_keeps_endpoints_and_peak():
+    x = np.arange(100, dtype=float)
+    y = np.zeros(100)
+    y[37] = 50.0
+    idx = lttb_indices(x, y, 10)
+    assert len(idx) == 10
+    assert idx[0] == 0 and idx[-1] == 99
+    assert 37 in idx
+
+
+def test_downsample_series_budget_applies_per_group():
+    groups = np.repeat([1, 2], 50)
+    x = np.tile(np.arange(50, dtype=float), 2)
+    y = np.sin(x)
+    keep = downsample_series(groups, x, y, 5)
+    assert len(keep) == 10
+    assert (np.diff(keep) > 0).all()
@@ -0,0 +1,209 @@
+"""
+Cold-storage tiering: moves raw and normalized files of old acquisitions to ARCHIVE_ROOT.
+
+Usage (against DATABASE_URL / DATA_ROOT / ARCHIVE_ROOT):
+    python -m app.tiering --older-than-months 24 --limit 5000 --dry-run
+
+A stored file is archived when every raw_files row that points to it belongs to an
+acquisition acquired more than N months ago. For each file:
+    1. it is copied to the mirror path under ARCHIVE_ROOT through a temporary name: verbatim
+       if already compressed with ARCHIVE_COMPRESSION, otherwise recompressed while streaming,
+    2. the copy's sha256 is checked against the recorded one,
+    3. storage_path of all its rows is updated and audited in one commit,
+    4. its sidecars (row index) are moved along and the primary copy is deleted.
+A crash before 3 leaves an unused archive copy (overwritten on the next run); after 3,
+a leftover primary copy that app.scrub reports as orphaned. Readers holding the old path
+fall through to the archive (see app.storage.locate); archived files that are read again
+are served from the hot cache.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .audit import log_action
+from .models import Acquisition, RawFile
+from .storage import (
+    CHUNK_SIZE,
+    SIDECAR_SUFFIXES,
+    archive_path_for,
+    archive_root,
+    codec_for_path,
+    open_stored,
+    sidecar_path,
+    strip_codec_suffix,
+    temp_path,
+    write_stored,
+)
+from .utils import add_months, sha256_for_fileobj
+
+
+@dataclass
+class ArchiveResult:
+    path: str
+    raw_file_ids: List[int]
+    archive_path: Optional[str] = None
+    bytes_before: int = 0
+    bytes_after: int = 0
+    status: str = "pending"  # archived | pending (dry-run) | error
+    detail: Optional[str] = None
+
+
+@dataclass
+class TieringReport:
+    cutoff: datetime
+    files: List[ArchiveResult] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def archived(self) -> int:
+        return sum(f.status == "archived" for f in self.files)
+
+    @property
+    def errors(self) -> int:
+        return sum(f.status == "error" for f in self.files)
+
+    @property
+    def bytes_freed(self) -> int:
+        return sum(f.bytes_before for f in self.files if f.status == "archived")
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "archived": self.archived, "errors": self.errors, "bytes_freed": self.bytes_freed}
+
+
+def archive_candidates(db: Session, cutoff: datetime, limit: Optional[int] = None) -> Dict[str, List[RawFile]]:
+    """Rows grouped by storage_path for paths whose rows all belong to acquisitions older than `cutoff`."""
+    newest = (
+        select(RawFile.storage_path)
+        .join(Acquisition, Acquisition.id == RawFile.acquisition_id)
+        .group_by(RawFile.storage_path)
+        .having(func.max(Acquisition.acquired_at) < cutoff)
+        .order_by(func.max(Acquisition.acquired_at))
+    )
+    root = archive_root().resolve()
+    paths = [p for p in db.scalars(newest) if not Path(p).resolve().is_relative_to(root)]
+    if limit is not None:
+        paths = paths[:limit]
+    grouped: Dict[str, List[RawFile]] = {p: [] for p in paths}
+    if paths:
+        for row in db.scalars(select(RawFile).where(RawFile.storage_path.in_(paths)).order_by(RawFile.id)):
+            grouped[row.storage_path].append(row)
+    return grouped
+
+
+def _copy_verbatim(source: Path, target: Path) -> Path:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = temp_path(target)
+    try:
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return target
+
+
+def archive_file(db: Session, path: str, rows: List[RawFile], compression: str) -> ArchiveResult:
+    """Copies, verifies, repoints the rows (one commit) and deletes the primary copy."""
+    result = ArchiveResult(path, [r.id for r in rows])
+    source = Path(path)
+    target = archive_path_for(source, compression)
+    if target is None:
+        result.status, result.detail = "error", "fuera de DATA_ROOT"
+        return result
+    if not source.is_file():
+        result.status, result.detail = "error", "archivo faltante (ver app.scrub)"
+        return result
+    result.bytes_before = source.stat().st_size
+    if codec_for_path(source) == compression:
+        # Ya comprimido con el mismo códec: copia byte a byte (conserva bloques e índice de filas)
+        written = _copy_verbatim(source, target)
+        with open(written, "rb") as raw, open_stored(written, raw) as src:
+            digest = sha256_for_fileobj(src, chunk_size=CHUNK_SIZE)
+    else:
+        with open_stored(source) as src:
+            written, digest, _ = write_stored(target.parent, "", strip_codec_suffix(target.name), src, compression)
+    wrong = sorted({r.sha256 for r in rows} - {digest})
+    if wrong:
+        written.unlink()
+        result.status, result.detail = "error", f"sha256 {digest} no coincide con {', '.join(wrong)} (ver app.scrub)"
+        return result
+    result.archive_path = str(written)
+    result.bytes_after = written.stat().st_size
+    db.execute(update(RawFile).where(RawFile.storage_path == path).values(storage_path=str(written)))
+    for row in rows:
+        log_action(db, "raw_file", row.id, "archive", None, notes=f"{path} -> {written}")
+    db.commit()
+    for suffix in SIDECAR_SUFFIXES:
+        if sidecar_path(source, suffix).exists():
+            shutil.move(sidecar_path(source, suffix), sidecar_path(written, suffix))
+    source.unlink()
+    result.status = "archived"
+    return result
+
+
+def run(
+    db: Session,
+    older_than_months: int,
+    compression: str = "gzip",
+    limit: Optional[int] = None,
+    dry_run: bool = False,
+    now: Optional[datetime] = None,
+) -> TieringReport:
+    start = time.perf_counter()
+    report = TieringReport(cutoff=add_months(now or datetime.utcnow(), -older_than_months))
+    candidates = archive_candidates(db, report.cutoff, limit)
+    for path, rows in candidates.items():
+        if dry_run:
+            target = archive_path_for(path, compression)
+            report.files.append(ArchiveResult(path, [r.id for r in rows], str(target) if target else None))
+            continue
+        try:
+            report.files.append(archive_file(db, path, rows, compression))
+        except OSError as exc:
+            db.rollback()
+            report.files.append(ArchiveResult(path, [r.id for r in rows], status="error", detail=str(exc)))
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from .config import get_settings
+    from .db import BatchSessionLocal
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Mueve archivos de adquisiciones antiguas al archivo frío.")
+    parser.add_argument("--older-than-months", type=int, default=settings.archive_after_months)
+    parser.add_argument("--compression", default=settings.archive_compression, help="none | gzip | zstd")
+    parser.add_argument("--limit", type=int, help="Máximo de archivos por corrida")
+    parser.add_argument("--dry-run", action="store_true", help="Solo listar lo que se movería")
+    parser.add_argument("--report", type=Path, help="Guardar el reporte JSON")
+    args = parser.parse_args(argv)
+
+    with BatchSessionLocal() as db:
+        report = run(db, args.older_than_months, args.compression, args.limit, args.dry_run)
+
+    for f in report.files:
+        print(f"{f.status:<9} {f.path} -> {f.archive_path or '-'}" + (f"  ({f.detail})" if f.detail else ""))
+    print(
+        f"Corte {report.cutoff:%Y-%m-%d}: {report.archived} archivados, {report.errors} errores, "
+        f"{report.bytes_freed / (1024 * 1024):.1f} MB liberados en {report.seconds:.1f}s"
+    )
+    if args.report:
+        args.report.write_text(json.dumps(report.to_dict(), indent=2, default=str))
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
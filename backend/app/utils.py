@@ -1,6 +1,10 @@
+import calendar
 import hashlib
+from datetime import datetime
 from pathlib import Path
-from typing import BinaryIO, Tuple
+from typing import BinaryIO, Optional, Tuple
+
+from .storage import write_stored
 
 
 def sha256_for_fileobj(fobj: BinaryIO, chunk_size: int = 8192) -> str:
@@ -13,10 +17,16 @@ def sha256_for_fileobj(fobj: BinaryIO, chunk_size: int = 8192) -> str:
     return hasher.hexdigest()
 
 
-def save_upload(base_dir: Path, subdir: str, filename: str, data: bytes) -> Tuple[Path, str]:
-    target_dir = base_dir / subdir
-    target_dir.mkdir(parents=True, exist_ok=True)
-    path = target_dir / filename
-    path.write_bytes(data)
-    digest = hashlib.sha256(data).hexdigest()
+def save_upload(
+    base_dir: Path, subdir: str, filename: str, data: bytes, compression: Optional[str] = None
+) -> Tuple[Path, str]:
+    """Stores `data` (optionally compressed, see app.storage); the sha256 is of the original bytes."""
+    path, digest, _ = write_stored(base_dir, subdir, filename, data, compression)
     return path, digest
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    """Same day `months` later (or earlier), clamped to the last day of the target month."""
+    year, month = divmod(dt.month - 1 + months, 12)
+    year, month = dt.year + year, month + 1
+    return dt.replace(year=year, month=month, day=min(dt.day, calendar.monthrange(year, month)[1]))